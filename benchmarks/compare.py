@@ -0,0 +1,58 @@
+"""
+Compare two benchmark result files, e.g. the last run on main and a branch:
+
+    python -m benchmarks.compare benchmarks/results/base.json benchmarks/results/head.json
+"""
+import argparse
+import json
+from typing import Dict
+
+# Metrics where a higher value is the better one; everything else is a latency or a duration.
+HIGHER_IS_BETTER = ("docs_per_second", "requests_per_second")
+
+
+def flatten(results: dict, prefix: str = "") -> Dict[str, float]:
+    metrics = {}
+    for key, value in results.items():
+        if key in ("params", "injected_latency_ms"):
+            continue
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            metrics.update(flatten(value, name + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            metrics[name] = value
+    return metrics
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Diff two benchmark result files.")
+    parser.add_argument("base")
+    parser.add_argument("head")
+    parser.add_argument("--threshold", type=float, default=10.0,
+                        help="flag changes for the worse above this many percent")
+    args = parser.parse_args()
+
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.head) as f:
+        head = json.load(f)
+    if base.get("params") != head.get("params") or base.get("injected_latency_ms") != head.get("injected_latency_ms"):
+        print("warning: runs used different parameters or injected latencies\n")
+
+    base_metrics, head_metrics = flatten(base), flatten(head)
+    print(f"{'metric':<45}{base.get('commit', 'base'):>12}{head.get('commit', 'head'):>12}{'change':>10}")
+    regressions = 0
+    for name in sorted(set(base_metrics) & set(head_metrics)):
+        before, after = base_metrics[name], head_metrics[name]
+        change = (after - before) / before * 100 if before else 0.0
+        worse = -change if name.endswith(HIGHER_IS_BETTER) else change
+        flag = ""
+        if not name.endswith("count") and worse > args.threshold:
+            flag = "  <- regression"
+            regressions += 1
+        print(f"{name:<45}{before:>12.2f}{after:>12.2f}{change:>9.1f}%{flag}")
+    print(f"\n{regressions} metrics regressed by more than {args.threshold:.0f}%")
+
+
+if __name__ == "__main__":
+    main()
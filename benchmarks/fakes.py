@@ -0,0 +1,137 @@
+import asyncio
+import hashlib
+import itertools
+import time
+from typing import Any, AsyncIterator, Iterator, List, Optional
+
+import numpy as np
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, HumanMessage, SystemMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from rag.prompts.prompt import RETRIEVER_PROMPT
+from rag.retriever.bm25 import tokenize
+from rag.vector_store.local_store import LocalVectorStore
+
+# Settings the harness changes before the app is built; the fakes read them
+# at call time because the app constructs its own instances.
+LATENCY = {
+    "llm_first_token_ms": 300.0,
+    "llm_token_ms": 10.0,
+    # Every llm_tail_every-th LLM call (0: never) waits llm_tail_ms longer
+    # for its first token, like a provider hiccup.
+    "llm_tail_ms": 0.0,
+    "llm_tail_every": 0,
+    "embed_query_ms": 5.0,
+    "embed_document_ms": 0.5,
+    "vector_query_ms": 40.0,
+    "vector_upsert_ms": 30.0,
+}
+ANSWER_WORDS = 60
+_CALLS = itertools.count(1)
+
+
+def _hash(text: str) -> int:
+    return int.from_bytes(hashlib.md5(text.encode("utf-8")).digest()[:8], "little")
+
+
+class FakeEmbeddings(Embeddings):
+    """
+    Deterministic bag-of-words embeddings with injected latency. Each token
+    hashes to a few signed dimensions, so reviews sharing words stay close
+    and retrieval results look like those of a real encoder.
+    """
+
+    def __init__(self, model_name: str = "fake", dimension: int = 384, **kwargs: Any):
+        self.model_name = model_name
+        self.dimension = dimension
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        for token in tokenize(text):
+            value = _hash(token)
+            for shift in (0, 16, 32):
+                vector[(value >> shift) % self.dimension] += 1.0 if (value >> (shift + 12)) & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        time.sleep(LATENCY["embed_document_ms"] * len(texts) / 1000)
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        time.sleep(LATENCY["embed_query_ms"] / 1000)
+        return self._embed(text)
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Stand-in for ChatGroq with a time-to-first-token and a per-token delay.
+    Rewrite prompts get the question echoed back; every other prompt gets a
+    fixed-length answer derived from the prompt, so runs are repeatable.
+    """
+
+    model: str = "fake"
+    api_key: Optional[str] = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def _first_token_seconds(self) -> float:
+        delay = LATENCY["llm_first_token_ms"]
+        every = int(LATENCY["llm_tail_every"])
+        if every and next(_CALLS) % every == 0:
+            delay += LATENCY["llm_tail_ms"]
+        return delay / 1000
+
+    @staticmethod
+    def _answer(messages: List[BaseMessage]) -> List[str]:
+        question = next((m.content for m in reversed(messages) if isinstance(m, HumanMessage)), "")
+        system = next((m.content for m in messages if isinstance(m, SystemMessage)), "")
+        if system.startswith(RETRIEVER_PROMPT):
+            return question.split(" ")
+        seed = _hash(system + question)
+        vocabulary = tokenize(system)[-400:] or ["ok"]
+        return [vocabulary[(seed + i * 7919) % len(vocabulary)] for i in range(ANSWER_WORDS)]
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        words = self._answer(messages)
+        time.sleep(self._first_token_seconds() + LATENCY["llm_token_ms"] * len(words) / 1000)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=" ".join(words)))])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Optional[AsyncCallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        words = self._answer(messages)
+        await asyncio.sleep(self._first_token_seconds() + LATENCY["llm_token_ms"] * len(words) / 1000)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=" ".join(words)))])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self._first_token_seconds())
+        for i, word in enumerate(self._answer(messages)):
+            time.sleep(LATENCY["llm_token_ms"] / 1000)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=word if i == 0 else " " + word))
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+                       **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self._first_token_seconds())
+        for i, word in enumerate(self._answer(messages)):
+            await asyncio.sleep(LATENCY["llm_token_ms"] / 1000)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=word if i == 0 else " " + word))
+
+
+class RemoteLatencyVectorStore(LocalVectorStore):
+    """The local vector store with a network round trip added to each query and upsert, like Pinecone."""
+
+    def similarity_search_by_vector_with_score(self, embedding: List[float], k: int = 4, **kwargs: Any):
+        time.sleep(LATENCY["vector_query_ms"] / 1000)
+        return super().similarity_search_by_vector_with_score(embedding, k, **kwargs)
+
+    def add_embeddings(self, texts, vectors, metadatas=None, ids=None):
+        time.sleep(LATENCY["vector_upsert_ms"] / 1000)
+        return super().add_embeddings(texts, vectors, metadatas=metadatas, ids=ids)
@@ -0,0 +1,256 @@
+"""
+Offline end-to-end benchmarks.
+
+Runs ingestion, chat turns and the /get endpoint against the real code
+paths with the Groq LLM, the Hugging Face encoder and the Pinecone round
+trips replaced by the deterministic fakes in benchmarks/fakes.py, then
+writes one JSON result file that benchmarks/compare.py can diff.
+
+    python -m benchmarks.run --rows 20000 --turns 200 --concurrency 16
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Dict, List
+
+import numpy as np
+import yaml
+
+from benchmarks import fakes
+from benchmarks.synthetic_data import generate_rows, write_csv
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FIRST_QUESTIONS = [
+    "How is the battery backup of {title}?",
+    "Is the {title} good for bass lovers?",
+    "What do people say about the mic quality of {title}?",
+    "Show me reviews of {title} with 1 star",
+    "Which headphones have the best sound quality under 1500?",
+    "Suggest a good budget neckband for gym",
+    "What is the highest rated earbuds?",
+]
+FOLLOW_UPS = [
+    "What about its build quality?",
+    "And the connectivity?",
+    "Is it worth the money?",
+    "Any complaints about it?",
+]
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    values = np.asarray(samples, dtype=np.float64) * 1000
+    return {
+        "count": len(samples),
+        "mean_ms": round(float(values.mean()), 2),
+        "p50_ms": round(float(np.percentile(values, 50)), 2),
+        "p90_ms": round(float(np.percentile(values, 90)), 2),
+        "p99_ms": round(float(np.percentile(values, 99)), 2),
+        "max_ms": round(float(values.max()), 2),
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+def prepare_workspace(args) -> str:
+    """
+    Temporary working directory laid out like the repo, with the synthetic
+    CSV and a config pointing every backend at local, offline storage.
+    """
+    workspace = tempfile.mkdtemp(prefix="rag-bench-")
+    with open(os.path.join(REPO_ROOT, "config", "config.yaml")) as f:
+        config = yaml.safe_load(f)
+    config["data_ingestion"].update({"vector_backend": "local", "embedding_workers": 0})
+    for section, overrides in (args.set or {}).items():
+        config.setdefault(section, {}).update(overrides)
+    os.makedirs(os.path.join(workspace, "config"))
+    with open(os.path.join(workspace, "config", "config.yaml"), "w") as f:
+        yaml.safe_dump(config, f)
+
+    write_csv(os.path.join(workspace, "data", "flipkart_product_review.csv"),
+              args.rows, args.products, args.duplicate_rate, args.seed)
+    for directory in ("static", "templates"):
+        os.symlink(os.path.join(REPO_ROOT, directory), os.path.join(workspace, directory))
+    return workspace
+
+
+def install_fakes():
+    """Swap the network-bound models and stores for the fakes before the app builds them."""
+    os.environ.setdefault("GROQ_API_KEY", "benchmark")
+    import langchain_groq
+    import langchain_huggingface
+    from rag.vector_store import store_loader
+
+    # ModelLoader imports these on first use, so patching the modules is enough.
+    langchain_huggingface.HuggingFaceEmbeddings = fakes.FakeEmbeddings
+    langchain_groq.ChatGroq = fakes.FakeChatModel
+    store_loader.LocalVectorStore = fakes.RemoteLatencyVectorStore
+
+
+def questions(count: int, sessions: int, seed: int, products: int) -> List[tuple]:
+    """(session id, question) pairs: each session opens with a product question, then mixes in follow-ups."""
+    rng = random.Random(seed)
+    titles = sorted({row[1] for row in generate_rows(products * 20, products, 0.0, seed)})
+    turns, started = [], set()
+    for i in range(count):
+        session = f"bench-{i % sessions}"
+        if session in started and rng.random() < 0.4:
+            turns.append((session, rng.choice(FOLLOW_UPS)))
+        else:
+            turns.append((session, rng.choice(FIRST_QUESTIONS).format(title=rng.choice(titles))))
+        started.add(session)
+    return turns
+
+
+def bench_ingestion() -> dict:
+    from rag.data_ingestion.data_ingestion import DataIngestion
+
+    results = {}
+    for run in ("initial", "rerun"):
+        ingestion = DataIngestion()
+        started = time.perf_counter()
+        _, inserted_ids = ingestion.vector_store(ingestion.transform_data())
+        elapsed = time.perf_counter() - started
+        results[run] = {
+            "seconds": round(elapsed, 3),
+            "upserted": len(inserted_ids),
+            "skipped": ingestion.skipped,
+            "docs_per_second": round((len(inserted_ids) + ingestion.skipped) / elapsed, 1),
+        }
+    return results
+
+
+async def bench_turns(turns: List[tuple]) -> dict:
+    from rag.model_with_memory.memory import ChatHistory
+
+    chat_history = ChatHistory()
+    latencies, first_tokens = [], []
+    for i, (session, question) in enumerate(turns):
+        started = time.perf_counter()
+        if i % 2:
+            async for event, _ in chat_history.astream_response(question, session + "-stream"):
+                if event == "token" and len(first_tokens) < (i + 1) // 2:
+                    first_tokens.append(time.perf_counter() - started)
+        else:
+            await chat_history.aget_response(question, session)
+        latencies.append(time.perf_counter() - started)
+    return {"turn": percentiles(latencies), "stream_first_token": percentiles(first_tokens)}
+
+
+async def bench_http(turns: List[tuple], concurrency: int) -> dict:
+    import httpx
+    import main
+
+    by_session: Dict[str, List[str]] = {}
+    for session, question in turns:
+        by_session.setdefault(session, []).append(question)
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run_session(session_questions: List[str]):
+        async with semaphore:
+            # One client per session keeps its own session cookie.
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app),
+                                         base_url="http://benchmark") as client:
+                for question in session_questions:
+                    started = time.perf_counter()
+                    response = await client.post("/get", data={"msg": question})
+                    response.raise_for_status()
+                    latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(run_session(session_questions) for session_questions in by_session.values()))
+    elapsed = time.perf_counter() - started
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "requests_per_second": round(len(latencies) / elapsed, 2),
+        "latency": percentiles(latencies),
+    }
+
+
+def parse_overrides(values: List[str]) -> dict:
+    """--set section.key=value pairs, with YAML parsing of the value."""
+    overrides: Dict[str, dict] = {}
+    for value in values or []:
+        path, raw = value.split("=", 1)
+        section, key = path.split(".", 1)
+        overrides.setdefault(section, {})[key] = yaml.safe_load(raw)
+    return overrides
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline RAG benchmarks with fake LLM, encoder and vector store.")
+    parser.add_argument("--rows", type=int, default=5000, help="synthetic reviews to ingest")
+    parser.add_argument("--products", type=int, default=50)
+    parser.add_argument("--duplicate-rate", type=float, default=0.15)
+    parser.add_argument("--turns", type=int, default=100, help="chat turns for the per-turn latency run")
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=8, help="concurrent sessions against /get")
+    parser.add_argument("--http-turns", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--skip", nargs="*", default=[], choices=["ingestion", "turns", "http"])
+    parser.add_argument("--set", action="append", metavar="SECTION.KEY=VALUE",
+                        help="override a config value, e.g. --set answer_cache.enabled=false")
+    parser.add_argument("--latency", action="append", metavar="NAME=MS",
+                        help=f"override an injected latency: {', '.join(fakes.LATENCY)}")
+    parser.add_argument("--output", help="result file (default: benchmarks/results/<timestamp>_<commit>.json)")
+    parser.add_argument("--keep-workspace", action="store_true")
+    args = parser.parse_args()
+    args.set = parse_overrides(args.set)
+    for value in args.latency or []:
+        name, ms = value.split("=", 1)
+        if name not in fakes.LATENCY:
+            parser.error(f"Unknown latency {name}")
+        fakes.LATENCY[name] = float(ms)
+
+    commit = git_commit()
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    output = os.path.abspath(args.output or os.path.join(REPO_ROOT, "benchmarks", "results", f"{stamp}_{commit}.json"))
+
+    workspace = prepare_workspace(args)
+    os.chdir(workspace)
+    install_fakes()
+    results = {
+        "commit": commit,
+        "timestamp": stamp,
+        "params": {key: value for key, value in vars(args).items() if key not in ("output", "keep_workspace")},
+        "injected_latency_ms": dict(fakes.LATENCY),
+    }
+    try:
+        # Chat and HTTP runs need an index, so ingestion always runs; --skip only drops its timings.
+        ingestion = bench_ingestion()
+        if "ingestion" not in args.skip:
+            results["ingestion"] = ingestion
+        if "turns" not in args.skip:
+            results["turns"] = asyncio.run(bench_turns(questions(args.turns, args.sessions, args.seed, args.products)))
+        if "http" not in args.skip:
+            results["http"] = asyncio.run(bench_http(
+                questions(args.http_turns, args.http_turns // 4 or 1, args.seed + 1, args.products), args.concurrency
+            ))
+    finally:
+        os.chdir(REPO_ROOT)
+        if not args.keep_workspace:
+            shutil.rmtree(workspace, ignore_errors=True)
+
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(json.dumps(results, indent=2))
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+import argparse
+import csv
+import os
+import random
+from typing import List, Tuple
+
+BRANDS = ["BoAt", "realme", "OnePlus", "JBL", "Sony", "boult", "Noise", "pTron", "Mivi", "Zebronics"]
+LINES = ["Rockerz", "Airdopes", "BassHeads", "Buds", "Bullets", "Tune", "Wave", "ProBass", "Duopods", "Thunder"]
+KINDS = ["Bluetooth Headset", "Wired Headset", "Wireless Earbuds", "Bluetooth Neckband"]
+
+ASPECTS = {
+    "sound": ["sound quality is {adj}", "the sound is {adj} for the price", "music sounds {adj}"],
+    "bass": ["bass is {adj}", "the bass boost is {adj}", "{adj} bass for movies and songs"],
+    "battery": ["battery backup is {adj}, around {hours} hours", "battery lasts {hours} hours which is {adj}",
+                "charging is fast and backup is {adj}"],
+    "build": ["build quality is {adj}", "feels {adj} in hand and fits well", "the material looks {adj}"],
+    "mic": ["mic quality on calls is {adj}", "people hear me {adj} on calls"],
+    "connectivity": ["pairing is {adj}", "bluetooth connection is {adj} and stable"],
+    "value": ["{adj} value for money", "at this price it is {adj}"],
+}
+POSITIVE = ["awesome", "very good", "excellent", "superb", "great", "decent", "impressive"]
+NEGATIVE = ["poor", "bad", "average", "disappointing", "weak", "not good"]
+SUMMARIES = {
+    5: ["Terrific purchase", "Just wow!", "Brilliant", "Simply awesome", "Must buy!", "Perfect product!"],
+    4: ["Very Good", "Good choice", "Worth the money", "Really Nice", "Value-for-money"],
+    3: ["Fair", "Decent product", "Good", "Nice"],
+    2: ["Not recommended at all", "Bad quality", "Could be way better"],
+    1: ["Worst experience ever!", "Useless product", "Utterly Disappointed", "Hated it!"],
+}
+SHORT_REVIEWS = ["Nice product", "Super sound", "Good", "Awesome", "Value for money", "Very nice", "Worst product"]
+RATING_WEIGHTS = [(5, 45), (4, 25), (3, 12), (2, 7), (1, 11)]
+COLUMNS = ["product_id", "product_title", "rating", "summary", "review"]
+
+
+def make_products(count: int, rng: random.Random) -> List[Tuple[str, str]]:
+    products = []
+    for i in range(count):
+        title = f"{rng.choice(BRANDS)} {rng.choice(LINES)} {rng.randint(100, 999)}{rng.choice(['', 'v2', ' Pro', ' Lite'])} {rng.choice(KINDS)}"
+        product_id = "ACC" + "".join(rng.choice("ABCDEFGHJKLMNPQRSTUVWXYZ0123456789") for _ in range(13))
+        products.append((product_id, title))
+    return products
+
+
+def make_review(rating: int, rng: random.Random) -> str:
+    words = POSITIVE if rating >= 4 else NEGATIVE if rating <= 2 else POSITIVE + NEGATIVE
+    sentences = []
+    for aspect in rng.sample(list(ASPECTS), rng.randint(1, 5)):
+        template = rng.choice(ASPECTS[aspect])
+        sentences.append(template.format(adj=rng.choice(words), hours=rng.randint(4, 30)).capitalize())
+    review = ". ".join(sentences) + "."
+    # Flipkart truncates long reviews with an ellipsis.
+    return review[:500] + "..." if len(review) > 500 else review
+
+
+def generate_rows(rows: int, products: int = 50, duplicate_rate: float = 0.15, seed: int = 0):
+    """Yield CSV rows shaped like flipkart_product_review.csv, including exact and near duplicates."""
+    rng = random.Random(seed)
+    catalog = make_products(products, rng)
+    ratings, weights = zip(*RATING_WEIGHTS)
+    previous: List[str] = []
+    for _ in range(rows):
+        product_id, title = catalog[min(int(rng.paretovariate(1.2)) - 1, products - 1)]
+        rating = rng.choices(ratings, weights)[0]
+        roll = rng.random()
+        if roll < duplicate_rate / 2:
+            review = rng.choice(SHORT_REVIEWS)
+        elif roll < duplicate_rate and previous:
+            review = rng.choice(previous).replace(".", "!", 1)
+        else:
+            review = make_review(rating, rng)
+            previous = (previous + [review])[-200:]
+        yield [product_id, title, rating, rng.choice(SUMMARIES[rating]), review]
+
+
+def write_csv(path: str, rows: int, products: int = 50, duplicate_rate: float = 0.15, seed: int = 0) -> str:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(COLUMNS)
+        writer.writerows(generate_rows(rows, products, duplicate_rate, seed))
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a synthetic Flipkart-style review CSV.")
+    parser.add_argument("path")
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--products", type=int, default=50)
+    parser.add_argument("--duplicate-rate", type=float, default=0.15)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    write_csv(args.path, args.rows, args.products, args.duplicate_rate, args.seed)
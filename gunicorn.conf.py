@@ -0,0 +1,19 @@
+"""
+Production server settings: gunicorn managing uvicorn workers.
+
+    gunicorn main:app -c gunicorn.conf.py
+
+preload_app imports main.py once in the master, which loads the embedding
+model, and a local index or snapshot, through ModelRegistry.preload().
+Forked workers share those copy-on-write. Each worker builds its own
+ChatHistory, with the LLM client, Pinecone connection and SQLite files, and
+warms up in the FastAPI lifespan before accepting requests.
+"""
+import os
+
+bind = os.environ.get("BIND", "0.0.0.0:8001")
+workers = int(os.environ.get("WEB_CONCURRENCY", "2"))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+timeout = 120
+graceful_timeout = 30
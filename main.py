@@ -1,15 +1,53 @@
-import uvicorn
-from fastapi import FastAPI, Request, Form
-from fastapi.responses import HTMLResponse
+import asyncio
+import json
+import uuid
+from contextlib import asynccontextmanager
+from dataclasses import asdict
+from typing import List, Optional
+from fastapi import FastAPI, HTTPException, Request, Form, Cookie
+from fastapi.responses import HTMLResponse, PlainTextResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
+from pydantic import BaseModel
 
+from rag.batch.batch_runner import BatchItem, BatchRunner
+
+from rag.logging.logger import logging
+from rag.metrics.metrics import REGISTRY
+from rag.metrics.middleware import MetricsMiddleware
+from rag.model_loaders.model_registry import ModelRegistry
 from rag.model_with_memory.memory import ChatHistory
 
-Chat_history= ChatHistory()
+# Load the fork-safe models at import so a preloading parent (see
+# gunicorn.conf.py) shares them with its workers. Each worker builds its own
+# ChatHistory, with its LLM client and session store, and warms up in
+# lifespan before serving.
+registry = ModelRegistry.get()
+registry.preload()
+_chat_history: Optional[ChatHistory] = None
+
+SESSION_COOKIE = "session_id"
+STREAM_ERROR_MESSAGE = "Sorry, something went wrong while answering. Please try again."
+
+
+def chat_history() -> ChatHistory:
+    """This worker's ChatHistory, built on first use so no connection is made before the fork."""
+    global _chat_history
+    if _chat_history is None:
+        _chat_history = ChatHistory()
+    return _chat_history
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await asyncio.to_thread(chat_history)
+    await asyncio.to_thread(registry.warmup)
+    registry.log_startup_report()
+    yield
+
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 app.mount("/static", StaticFiles(directory="static"), name="static") 
 templates = Jinja2Templates(directory="templates")
 # Allow CORS (optional for frontend)
@@ -19,7 +57,9 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Trace-Id"],
 )
+app.add_middleware(MetricsMiddleware)
 
 @app.get("/", response_class=HTMLResponse)
 async def index(request: Request):
@@ -29,7 +69,78 @@ async def index(request: Request):
     return templates.TemplateResponse("chat.html", {"request": request})
 
 @app.post("/get",response_class=HTMLResponse)
-async def chat(msg:str=Form(...)):
-    result=Chat_history.get_response(msg,"abc")
-    print(f"Response: {result}")
-    return result
\ No newline at end of file
+async def chat(msg:str=Form(...), session_id:Optional[str]=Cookie(default=None)):
+    """
+    Answer a chat message, keeping history per browser session.
+    """
+    session_id = session_id or uuid.uuid4().hex
+    result=await chat_history().aget_response(msg,session_id)
+    logging.info(f"Answered session {session_id}: {len(result)} characters")
+    logging.debug(f"Answer for session {session_id}: {result}")
+    response = HTMLResponse(content=result)
+    response.set_cookie(SESSION_COOKIE, session_id, httponly=True, samesite="lax")
+    return response
+
+@app.post("/stream")
+async def chat_stream(msg:str=Form(...), session_id:Optional[str]=Cookie(default=None)):
+    """
+    Stream the answer as server-sent events so the first tokens reach the
+    browser as soon as the LLM produces them.
+    """
+    session_id = session_id or uuid.uuid4().hex
+
+    async def event_stream():
+        try:
+            async for event, payload in chat_history().astream_response(msg, session_id):
+                yield f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+        except Exception:
+            # The 200 status is already sent, so the failure travels as an event.
+            logging.exception(f"Streaming answer for session {session_id} failed")
+            yield f"event: error\ndata: {json.dumps({'message': STREAM_ERROR_MESSAGE})}\n\n"
+
+    response = StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+    response.set_cookie(SESSION_COOKIE, session_id, httponly=True, samesite="lax")
+    return response
+
+class BatchRequest(BaseModel):
+    questions: List[str]
+
+
+@app.post("/batch")
+async def batch(request: BatchRequest):
+    """
+    Answer many standalone questions at once. Results stream back as
+    newline-delimited JSON in completion order, each with the index of its
+    question as id and its own timings.
+    """
+    config = chat_history().config.batch
+    if len(request.questions) > config.max_batch_size:
+        raise HTTPException(status_code=413, detail=f"At most {config.max_batch_size} questions per batch")
+    items = [BatchItem(id=str(index), question=question) for index, question in enumerate(request.questions)]
+    runner = BatchRunner(chat_history(), config.retrieval_concurrency, config.llm_concurrency)
+
+    async def results():
+        async for result in runner.arun(items):
+            yield json.dumps(asdict(result)) + "\n"
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+@app.get("/healthz")
+async def healthz():
+    """
+    Readiness probe. Only answers once lifespan warmup has finished, and
+    reports how long startup took.
+    """
+    return {"status": "ready", "startup": registry.startup_report()}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """
+    Prometheus scrape endpoint: stage latency histograms, HTTP request
+    metrics, token counts and cache hit counters.
+    """
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,190 @@
+import argparse
+import asyncio
+import csv
+import json
+import sys
+import time
+from dataclasses import asdict, dataclass
+from typing import AsyncIterator, Dict, Iterator, List, Optional
+
+from rag.cache.embedding_cache import CachedEmbeddings
+from rag.exception.exception import RAGException
+from rag.logging.logger import logging
+from rag.metrics.metrics import TOKENS_TOTAL, span
+from rag.model_with_memory.memory import ChatHistory
+from rag.model_with_memory.rewrite_policy import normalize_question
+from utils.tokens import count_tokens
+
+
+@dataclass
+class BatchItem:
+    id: str
+    question: str
+
+
+@dataclass
+class BatchResult:
+    id: str
+    question: str
+    answer: Optional[str] = None
+    cached: bool = False
+    duplicate_of: Optional[str] = None
+    documents: int = 0
+    retrieve_ms: float = 0.0
+    generate_ms: float = 0.0
+    total_ms: float = 0.0
+    error: Optional[str] = None
+
+
+def read_items(path: str) -> Iterator[BatchItem]:
+    """Questions from a JSONL file ({"id", "question"} per line) or a CSV with a question column."""
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.endswith(".csv"):
+            rows = csv.DictReader(f)
+        else:
+            rows = (json.loads(line) for line in f if line.strip())
+        for number, row in enumerate(rows, start=1):
+            yield BatchItem(id=str(row.get("id") or number), question=str(row["question"]).strip())
+
+
+class BatchRunner:
+    """
+    Answers many standalone questions at once through the ChatHistory chains.
+
+    Identical questions (after normalisation) are answered once. All unique
+    questions are embedded in one batched call, and those vectors serve both
+    the answer-cache lookups and the dense search, so no question is
+    embedded twice. Retrieval then runs concurrently, LLM calls go
+    through a separate, smaller concurrency limit, and results are yielded
+    as they complete, one per input item, with per-item timings.
+    """
+
+    def __init__(self, chat_history: ChatHistory, retrieval_concurrency: int = 16,
+                 llm_concurrency: int = 4):
+        self.chat_history = chat_history
+        self.retrieval_concurrency = retrieval_concurrency
+        self.llm_concurrency = llm_concurrency
+
+    async def _embed_all(self, questions: List[str]) -> Optional[List[List[float]]]:
+        embeddings = self.chat_history.retriever.embeddings
+        if not questions:
+            return None
+        # embed_queries also stores them in the embedding cache as queries.
+        embed = embeddings.embed_queries if isinstance(embeddings, CachedEmbeddings) else embeddings.embed_documents
+        with span("batch_embed"):
+            return await asyncio.to_thread(embed, questions)
+
+    async def _answer(self, item: BatchItem, query_vector: Optional[List[float]],
+                      retrieval_limit: asyncio.Semaphore, llm_limit: asyncio.Semaphore) -> BatchResult:
+        chat_history = self.chat_history
+        result = BatchResult(id=item.id, question=item.question)
+        started = time.perf_counter()
+        try:
+            if query_vector is not None and chat_history.answer_cache is not None:
+                result.answer = chat_history.answer_cache.lookup(query_vector)
+                result.cached = result.answer is not None
+
+            if result.answer is None:
+                async with retrieval_limit:
+                    retrieve_started = time.perf_counter()
+                    documents = await chat_history.retriever.acall_retriever(item.question, embedding=query_vector)
+                    result.retrieve_ms = (time.perf_counter() - retrieve_started) * 1000
+                result.documents = len(documents)
+                context = chat_history.pack_context(item.question, documents, [])
+
+                async with llm_limit:
+                    generate_started = time.perf_counter()
+                    with span("generate"):
+                        result.answer = await chat_history.qa_chain.ainvoke(
+                            {"input": item.question, "chat_history": [], "context": context}
+                        )
+                    result.generate_ms = (time.perf_counter() - generate_started) * 1000
+                TOKENS_TOTAL.inc(count_tokens(result.answer), kind="answer")
+                if query_vector is not None and chat_history.answer_cache is not None:
+                    chat_history.answer_cache.store(query_vector, result.answer)
+        except Exception as e:
+            logging.warning(f"Batch item {item.id} failed: {e}")
+            result.error = str(e)
+        result.total_ms = (time.perf_counter() - started) * 1000
+        return result
+
+    async def arun(self, items: List[BatchItem]) -> AsyncIterator[BatchResult]:
+        """Yield one result per item, in completion order; duplicates follow their first occurrence."""
+        unique: Dict[str, BatchItem] = {}
+        duplicates: Dict[str, List[BatchItem]] = {}
+        for item in items:
+            key = normalize_question(item.question)
+            if key in unique:
+                duplicates.setdefault(key, []).append(item)
+            else:
+                unique[key] = item
+        logging.info(f"Batch of {len(items)} questions, {len(unique)} unique")
+
+        keys = list(unique)
+        vectors = await self._embed_all([unique[key].question for key in keys])
+        retrieval_limit = asyncio.Semaphore(self.retrieval_concurrency)
+        llm_limit = asyncio.Semaphore(self.llm_concurrency)
+
+        async def answer(index: int):
+            key = keys[index]
+            vector = vectors[index] if vectors is not None else None
+            return key, await self._answer(unique[key], vector, retrieval_limit, llm_limit)
+
+        tasks = [asyncio.create_task(answer(index)) for index in range(len(keys))]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                key, result = await finished
+                yield result
+                for duplicate in duplicates.get(key, []):
+                    yield BatchResult(
+                        id=duplicate.id, question=duplicate.question, answer=result.answer,
+                        cached=result.cached, duplicate_of=result.id, documents=result.documents,
+                        error=result.error,
+                    )
+        finally:
+            for task in tasks:
+                task.cancel()
+
+
+async def run_file(input_path: str, output_path: str, chat_history: ChatHistory,
+                   retrieval_concurrency: int, llm_concurrency: int):
+    """
+    Answer every question in input_path, appending each result to output_path
+    as soon as it is ready. Returns (answers, failures, seconds).
+    """
+    try:
+        items = list(read_items(input_path))
+        runner = BatchRunner(chat_history, retrieval_concurrency, llm_concurrency)
+        started = time.perf_counter()
+        done = failed = 0
+        with open(output_path, "w", encoding="utf-8") as out:
+            async for result in runner.arun(items):
+                out.write(json.dumps(asdict(result)) + "\n")
+                out.flush()
+                done += 1
+                failed += result.error is not None
+                if done % 100 == 0:
+                    logging.info(f"Batch progress: {done}/{len(items)}")
+        elapsed = time.perf_counter() - started
+        logging.info(f"Batch finished: {done} answers ({failed} failed) in {elapsed:.1f}s")
+        return done, failed, elapsed
+    except Exception as e:
+        raise RAGException(f"Error running batch: {e}", sys)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Answer a JSONL or CSV file of questions in batch.")
+    parser.add_argument("input", help="JSONL with {\"id\", \"question\"} per line, or CSV with a question column")
+    parser.add_argument("output", help="JSONL file the answers are streamed to")
+    parser.add_argument("--retrieval-concurrency", type=int)
+    parser.add_argument("--llm-concurrency", type=int)
+    args = parser.parse_args()
+
+    chat_history = ChatHistory()
+    config = chat_history.config.batch
+    done, failed, elapsed = asyncio.run(run_file(
+        args.input, args.output, chat_history,
+        args.retrieval_concurrency or config.retrieval_concurrency,
+        args.llm_concurrency or config.llm_concurrency,
+    ))
+    print(f"{done} answers ({failed} failed) in {elapsed:.1f}s -> {args.output}")
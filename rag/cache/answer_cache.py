@@ -0,0 +1,124 @@
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import List, Optional
+
+import numpy as np
+
+from rag.logging.logger import logging
+
+
+class AnswerCache:
+    """
+    Semantic cache of generated answers keyed on the embedding of the
+    standalone question.
+
+    A lookup returns the stored answer of the most similar cached question
+    when its cosine similarity reaches ``similarity_threshold`` and the entry
+    is younger than ``ttl_seconds``. Entries are evicted least recently used
+    beyond ``max_entries``, and the whole cache is dropped when the index
+    version file written by ingestion changes.
+    """
+
+    def __init__(self, similarity_threshold: float = 0.95, ttl_seconds: float = 3600,
+                 max_entries: int = 5000, version_path: Optional[str] = None):
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.version_path = version_path
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._vectors = None
+        self._active = np.zeros(max_entries, dtype=bool)
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()
+        self._free_slots = list(range(max_entries - 1, -1, -1))
+        self._version = self._read_version()
+
+    @staticmethod
+    def bump_version(version_path: str):
+        """Mark the index as changed so every AnswerCache reading this file starts empty."""
+        os.makedirs(os.path.dirname(version_path) or ".", exist_ok=True)
+        with open(version_path, "w") as f:
+            f.write(uuid.uuid4().hex)
+
+    def _read_version(self):
+        if not self.version_path:
+            return None
+        try:
+            return os.stat(self.version_path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _normalize(self, vector: List[float]) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _evict(self, slot: int):
+        self._entries.pop(slot, None)
+        self._active[slot] = False
+        self._free_slots.append(slot)
+
+    def clear(self):
+        with self._lock:
+            for slot in list(self._entries):
+                self._evict(slot)
+
+    def _check_version(self):
+        version = self._read_version()
+        if version != self._version:
+            logging.info("Vector index changed, clearing answer cache")
+            for slot in list(self._entries):
+                self._evict(slot)
+            self._version = version
+
+    def lookup(self, query_vector: List[float]) -> Optional[str]:
+        with self._lock:
+            self._check_version()
+            if not self._entries:
+                self.misses += 1
+                return None
+
+            scores = self._vectors @ self._normalize(query_vector)
+            scores[~self._active] = -np.inf
+            candidates = np.flatnonzero(scores >= self.similarity_threshold)
+            now = time.time()
+            # Best match first; an expired entry is evicted and the next one tried.
+            for slot in candidates[np.argsort(-scores[candidates])].tolist():
+                answer, created = self._entries[slot]
+                if now - created > self.ttl_seconds:
+                    self._evict(slot)
+                    continue
+                self._entries.move_to_end(slot)
+                self.hits += 1
+                return answer
+
+            self.misses += 1
+            return None
+
+    def store(self, query_vector: List[float], answer: str):
+        with self._lock:
+            vector = self._normalize(query_vector)
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_entries, len(vector)), dtype=np.float32)
+            if not self._free_slots:
+                oldest = next(iter(self._entries))
+                self._evict(oldest)
+
+            slot = self._free_slots.pop()
+            self._vectors[slot] = vector
+            self._active[slot] = True
+            self._entries[slot] = (answer, time.time())
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
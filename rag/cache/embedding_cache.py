@@ -0,0 +1,161 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from rag.logging.logger import logging
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Content-addressed cache in front of an embedding model.
+
+    Vectors are keyed by sha256(model name, kind, text) and kept in an
+    in-memory LRU tier backed by a SQLite file of float32 blobs, so the same
+    review or question is only ever encoded once per model.
+
+    The SQLite connection is opened on first use in each process, so a
+    wrapper built before forking workers never shares a handle with them.
+    """
+
+    SQLITE_BATCH = 500
+
+    def __init__(self, underlying: Embeddings, model_name: str, cache_path: Optional[str] = None,
+                 max_memory_items: int = 50000):
+        self.underlying = underlying
+        self.model_name = model_name
+        self.max_memory_items = max_memory_items
+        self._memory: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self.cache_path = cache_path
+        self._db = None
+        self._db_pid = None
+
+    def _connection(self) -> Optional[sqlite3.Connection]:
+        """This process's connection to the disk tier, or None without one; call with the lock held."""
+        if not self.cache_path:
+            return None
+        if self._db_pid != os.getpid():
+            os.makedirs(os.path.dirname(self.cache_path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(self.cache_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+            )
+            self._db.commit()
+            self._db_pid = os.getpid()
+        return self._db
+
+    def _key(self, kind: str, text: str) -> str:
+        return hashlib.sha256(f"{self.model_name}\0{kind}\0{text}".encode("utf-8")).hexdigest()
+
+    def _remember(self, key: str, vector: List[float]):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    def _lookup(self, keys: List[str]) -> Dict[str, List[float]]:
+        found = {}
+        with self._lock:
+            for key in keys:
+                if key in self._memory:
+                    self._memory.move_to_end(key)
+                    found[key] = self._memory[key]
+            self.memory_hits += len(found)
+
+            missing = [key for key in dict.fromkeys(keys) if key not in found]
+            db = self._connection()
+            if db is not None and missing:
+                for start in range(0, len(missing), self.SQLITE_BATCH):
+                    batch = missing[start:start + self.SQLITE_BATCH]
+                    rows = db.execute(
+                        f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})",
+                        batch,
+                    ).fetchall()
+                    for key, blob in rows:
+                        vector = np.frombuffer(blob, dtype=np.float32).tolist()
+                        found[key] = vector
+                        self._remember(key, vector)
+                        self.disk_hits += 1
+        return found
+
+    def _store(self, vectors: Dict[str, List[float]]):
+        with self._lock:
+            for key, vector in vectors.items():
+                self._remember(key, vector)
+            db = self._connection()
+            if db is not None:
+                db.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                    [(key, np.asarray(vector, dtype=np.float32).tobytes()) for key, vector in vectors.items()],
+                )
+                db.commit()
+
+    def cached_documents(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """Cached document vectors for texts, with None where the text has not been embedded yet."""
+        keys = [self._key("document", text) for text in texts]
+        found = self._lookup(keys)
+        return [found.get(key) for key in keys]
+
+    def cache_documents(self, texts: List[str], vectors: List[List[float]]):
+        """Record document vectors computed outside this wrapper, e.g. by worker processes."""
+        self._store({self._key("document", text): list(vector) for text, vector in zip(texts, vectors)})
+        with self._lock:
+            self.misses += len(texts)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = self.cached_documents(texts)
+
+        missing = list(dict.fromkeys(text for text, vector in zip(texts, vectors) if vector is None))
+        if missing:
+            computed = dict(zip(missing, self.underlying.embed_documents(missing)))
+            self.cache_documents(missing, [computed[text] for text in missing])
+            vectors = [computed[text] if vector is None else vector for text, vector in zip(texts, vectors)]
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        key = self._key("query", text)
+        found = self._lookup([key])
+        if key in found:
+            return found[key]
+
+        vector = self.underlying.embed_query(text)
+        self._store({key: vector})
+        with self._lock:
+            self.misses += 1
+        return vector
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Embed many queries in one model call, caching them as queries so later embed_query calls hit."""
+        keys = [self._key("query", text) for text in texts]
+        found = self._lookup(keys)
+        missing = list(dict.fromkeys(text for text, key in zip(texts, keys) if key not in found))
+        if missing:
+            computed = dict(zip(missing, self.underlying.embed_documents(missing)))
+            self._store({self._key("query", text): vector for text, vector in computed.items()})
+            with self._lock:
+                self.misses += len(missing)
+            found.update({self._key("query", text): vector for text, vector in computed.items()})
+        return [found[key] for key in keys]
+
+    def stats(self) -> dict:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+        }
+
+    def log_stats(self):
+        logging.info(f"Embedding cache stats for {self.model_name}: {self.stats()}")
@@ -0,0 +1,94 @@
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Tuple
+
+
+class _Flight:
+    """One shared in-flight call and the requests waiting on it."""
+
+    def __init__(self):
+        self.task: asyncio.Task = None
+        self.waiters = 0
+        self.items: List[Any] = []
+        self.changed = asyncio.Event()
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent calls: the first caller for a key starts
+    the work, later callers with the same key await the same result instead
+    of starting their own. Nothing is kept once the call finishes, so this
+    only merges requests that overlap in time; reuse after that is the
+    answer cache's job.
+
+    The shared work runs as its own task. It keeps going when the caller
+    that started it goes away, and is cancelled only once every caller
+    waiting on it has gone. Flights are tracked per event loop, so
+    get_response() running its own loop never waits on another loop's work.
+    """
+
+    def __init__(self):
+        self._flights: Dict[Tuple[int, str], _Flight] = {}
+        self.leaders = 0
+        self.followers = 0
+
+    def _join(self, key: str, start: Callable[[_Flight], Awaitable]) -> Tuple[Tuple[int, str], _Flight, bool]:
+        flight_key = (id(asyncio.get_running_loop()), key)
+        flight = self._flights.get(flight_key)
+        shared = flight is not None
+        if shared:
+            self.followers += 1
+        else:
+            self.leaders += 1
+            flight = self._flights[flight_key] = _Flight()
+            flight.task = asyncio.create_task(start(flight))
+            flight.task.add_done_callback(lambda _: self._forget(flight_key, flight))
+        flight.waiters += 1
+        return flight_key, flight, shared
+
+    def _forget(self, flight_key: Tuple[int, str], flight: _Flight):
+        if self._flights.get(flight_key) is flight:
+            del self._flights[flight_key]
+
+    def _leave(self, flight_key: Tuple[int, str], flight: _Flight):
+        flight.waiters -= 1
+        if flight.waiters == 0 and not flight.task.done():
+            flight.task.cancel()
+            self._forget(flight_key, flight)
+
+    async def do(self, key: str, call: Callable[[], Awaitable]) -> Tuple[Any, bool]:
+        """Return (result, shared), where shared is True when another caller's call produced it."""
+        flight_key, flight, shared = self._join(key, lambda _: call())
+        try:
+            return await asyncio.shield(flight.task), shared
+        finally:
+            self._leave(flight_key, flight)
+
+    async def stream(self, key: str, call: Callable[[], AsyncIterator]) -> AsyncIterator[Tuple[Any, bool]]:
+        """
+        Stream (item, shared) pairs. Every caller sees every item the shared
+        iterator produces from the start, including the ones yielded before
+        it joined.
+        """
+        async def produce(flight: _Flight):
+            try:
+                async for item in call():
+                    flight.items.append(item)
+                    flight.changed.set()
+            finally:
+                flight.changed.set()
+
+        flight_key, flight, shared = self._join(key, produce)
+        position = 0
+        try:
+            while True:
+                while position < len(flight.items):
+                    yield flight.items[position], shared
+                    position += 1
+                if flight.task.done():
+                    # Surface the producer's exception, if any.
+                    flight.task.result()
+                    return
+                flight.changed.clear()
+                await flight.changed.wait()
+        finally:
+            self._leave(flight_key, flight)
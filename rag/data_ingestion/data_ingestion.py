@@ -1,29 +1,47 @@
-import getpass
+import hashlib
+import json
 import os
 import sys
-import time
 import pandas as pd
-from dotenv import load_dotenv
-load_dotenv()
-from typing import List
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional, Set
 from rag.exception.exception import RAGException
 from rag.logging.logger import logging
 from rag.constant import *
-from utils.config import read_yaml
-from rag.model_loaders.model_loader import ModelLoader
-from langchain_pinecone import PineconeVectorStore
+from rag.model_loaders.model_registry import ModelRegistry
+from rag.cache.answer_cache import AnswerCache
+from rag.cache.embedding_cache import CachedEmbeddings
+from rag.data_ingestion.deduplicator import ReviewDeduplicator
+from rag.data_ingestion.embedding_pipeline import EmbeddingPipeline
+from rag.data_ingestion.ingest_manifest import IngestManifest
+from rag.data_ingestion.product_catalog import ProductCatalog
+from rag.retriever.bm25 import BM25Builder
+from rag.vector_store.local_store import LocalVectorStore
+from rag.vector_store.shards import SHARD_FIELD, ShardedVectorStore
+from rag.vector_store.snapshot import SnapshotWriter
+from rag.vector_store.store_loader import VectorStoreLoader
 from langchain_core.documents import Document
-from pinecone import Pinecone, ServerlessSpec
 
 
 
+EXPECTED_COLUMNS = {'product_id', 'product_title', 'rating', 'summary', 'review'}
+
+
+def batched(iterable: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
 class DataIngestion:
     def __init__(self,config_file_path=CONFIG_FILE_PATH):
-        self.config=read_yaml(config_file_path)
-        self.model_loader=ModelLoader()
+        self.registry=ModelRegistry.get(config_file_path)
+        self.config=self.registry.config
+        self.vector_store_loader=VectorStoreLoader(self.config)
         self.csv_path=self._get_csv_path()
-        self.product_data=self._load_csv()
-        self.embeddings=self.model_loader.load_embeddings()
+        self._validate_csv()
+        self.embeddings=self.registry.embeddings()
+        self.index_changed=False
 
     def _get_csv_path(self):
         try:
@@ -40,239 +58,329 @@ class DataIngestion:
         except RAGException as e:
             raise (f"Error getting CSV path: {e,sys}")  
 
-    def _load_csv(self):
+    def _validate_csv(self):
+        """
+        Check the CSV header without loading the file.
+        """
         try:
-            """
-            Load product data from CSV.
-            """
-            df = pd.read_csv(self.csv_path)
-            expected_columns = {'product_title', 'rating', 'summary', 'review'}
+            columns = pd.read_csv(self.csv_path, nrows=0).columns
+            if not EXPECTED_COLUMNS.issubset(set(columns)):
+                raise ValueError(f"CSV must contain columns: {EXPECTED_COLUMNS}")
+        except Exception as e:
+            raise RAGException(f"Error loading CSV: {e}", sys)
 
-            if not expected_columns.issubset(set(df.columns)):
-                raise ValueError(f"CSV must contain columns: {expected_columns}")
-
-            return df 
-        except RAGException as e:
-            raise (f"Error loading CSV: {e,sys}")
+    def _read_chunks(self) -> Iterator[pd.DataFrame]:
+        chunksize = self.config.data_ingestion.csv_chunksize
+        return pd.read_csv(self.csv_path, usecols=list(EXPECTED_COLUMNS), chunksize=chunksize)
 
-    def transform_data(self):
+    def _duplicate_plan(self) -> Optional[ReviewDeduplicator]:
+        """
+        First pass over the CSV: cluster exact and near-duplicate reviews of
+        the same product and rating. The clusters are kept in a scratch
+        SQLite file under dedup.scratch_dir, so the pass streams like
+        transform_data itself.
+        """
+        config = self.config.get("dedup")
+        if not config or not config.enabled:
+            return None
         try:
-            """
-            Transform product data into list of LangChain Document objects.
-            """
-            product_list = []
-
-            for _, row in self.product_data.iterrows():
-                product_entry = {
-                    "product_name": row['product_title'],
-                    "product_rating": row['rating'],
-                    "product_summary": row['summary'],
-                    "product_review": row['review']
-                }
-                product_list.append(product_entry)
-
-            documents = []
-            for entry in product_list:
-                metadata = {
-                    "product_name": entry["product_name"],
-                    "product_rating": entry["product_rating"],
-                    "product_summary": entry["product_summary"]
-                }
-                doc = Document(page_content=entry["product_review"], metadata=metadata)
-                documents.append(doc)
-
-            print(f"Transformed {len(documents)} documents.")
-            return documents
-        except RAGException as e:
-            raise (f"Error transforming data: {e,sys}")
-    
-    def vector_store(self,documents: List[Document]):
-        ''' storing the data in vector store '''
+            dedup = ReviewDeduplicator(
+                num_perm=config.minhash_permutations,
+                bands=config.lsh_bands,
+                threshold=config.similarity_threshold,
+                shingle_size=config.shingle_size,
+                near_duplicates=config.near_duplicates,
+                scratch_dir=config.get("scratch_dir"),
+            )
+            for chunk in self._read_chunks():
+                columns = [chunk[column].tolist() for column in ('product_id', 'rating', 'review')]
+                for product_id, rating, review in zip(*columns):
+                    dedup.add((product_id, rating), review)
+            logging.info(
+                f"Collapsed {dedup.collapsed} of {dedup.rows} reviews into {dedup.representatives} representatives "
+                f"({dedup.near_duplicate_rows} near duplicates)"
+            )
+            return dedup
+        except Exception as e:
+            raise RAGException(f"Error finding duplicate reviews: {e}", sys)
+
+    def transform_data(self) -> Iterator[Document]:
+        """
+        Stream the CSV in chunks and yield one LangChain Document per review,
+        so memory stays bounded by the chunk size rather than the file size.
+        With dedup enabled only one representative per duplicate cluster is
+        yielded, carrying the cluster size as duplicate_count. With sharding
+        enabled every document carries its category shard.
+        """
+        dedup = None
         try:
-            config=self.config.data_ingestion
-
-            pinecone_api_key = os.environ.get("PINECONE_API_KEY")
-            pc = Pinecone(api_key=pinecone_api_key)
-            index_name = config.index_name
-            existing_indexes = [index_info["name"] for index_info in pc.list_indexes()]
-
-            if index_name not in existing_indexes:
-                pc.create_index(
-                    name=index_name,
-                    dimension=config.dimension,
-                    metric=config.metric,
-                    spec=ServerlessSpec(cloud=config.cloud, region=config.region),
+            classifier = self.vector_store_loader.classifier
+            dedup = self._duplicate_plan()
+            count = 0
+            row = -1
+            for chunk in self._read_chunks():
+                columns = [chunk[column].tolist() for column in ('product_id', 'product_title', 'rating', 'summary', 'review')]
+                if dedup is not None:
+                    duplicates = dedup.duplicates_between(row + 1, row + 1 + len(chunk))
+                    cluster_sizes = dedup.counts_between(row + 1, row + 1 + len(chunk))
+                for product_id, title, rating, summary, review in zip(*columns):
+                    row += 1
+                    if dedup is not None and row in duplicates:
+                        continue
+                    metadata = {
+                        "product_id": product_id,
+                        "product_name": title,
+                        "product_rating": rating,
+                        "product_summary": summary
+                    }
+                    if dedup is not None:
+                        metadata["duplicate_count"] = cluster_sizes[row]
+                    if classifier is not None:
+                        metadata[SHARD_FIELD] = classifier.shard_for_title(title)
+                    doc_id = self.document_id(product_id, title, rating, summary, review)
+                    yield Document(id=doc_id, page_content=review, metadata=metadata)
+                    count += 1
+                logging.info(f"Transformed {count} documents so far")
+
+            logging.info(f"Transformed {count} documents.")
+        except Exception as e:
+            raise RAGException(f"Error transforming data: {e}", sys)
+        finally:
+            if dedup is not None:
+                dedup.close()
+
+    @staticmethod
+    def document_id(product_id, *fields) -> str:
+        """
+        Stable id for a review row: the product id plus a hash of its content,
+        so re-ingesting an unchanged row maps onto the same vector.
+        """
+        content = "\x1f".join(str(field) for field in fields)
+        return f"{product_id}-{hashlib.md5(content.encode('utf-8')).hexdigest()}"
+
+    def _index_key(self) -> str:
+        config = self.config.data_ingestion
+        backend = self.vector_store_loader.backend
+        location = config.local_index_dir if backend == "local" else config.index_name
+        # Sharded and unsharded layouts hold different copies of the data.
+        layout = ":sharded" if self.vector_store_loader.classifier is not None else ""
+        return f"{backend}:{location}{layout}"
+
+    def _existing_ids(self, vector_store, manifest: IngestManifest, ids: List[str]) -> Set[str]:
+        """
+        Ids already in the index, checked against the local manifest or, with
+        id_existence_check: "fetch", against the index itself in batched lookups.
+        """
+        config = self.config.data_ingestion
+        if config.id_existence_check == "manifest":
+            return manifest.existing(ids)
+
+        if isinstance(vector_store, ShardedVectorStore):
+            return set().union(*(
+                self._existing_ids(shard, manifest, ids) for shard in vector_store.shards.values()
+            ))
+        if isinstance(vector_store, LocalVectorStore):
+            return set(ids) & set(vector_store.index.ids())
+
+        existing = set()
+        batch_size = config.fetch_batch_size
+        for start in range(0, len(ids), batch_size):
+            response = vector_store.index.fetch(
+                ids=ids[start:start + batch_size], namespace=getattr(vector_store, "_namespace", None)
+            )
+            existing.update(response.vectors.keys())
+        manifest.add(existing)
+        return existing
+
+    def _new_batches(self, vector_store, manifest: IngestManifest, documents: Iterable[Document],
+                     seen_ids: Optional[Set[str]], bm25: BM25Builder,
+                     catalog: ProductCatalog) -> Iterator[List[Document]]:
+        """
+        Batches of documents that are not in the index yet. Every document,
+        new or not, is added to the BM25 index and the product catalog, which
+        are rebuilt on each run.
+        """
+        self.skipped = 0
+        for batch in batched(documents, self.config.data_ingestion.embed_batch_size):
+            batch = list({doc.id: doc for doc in batch}.values())
+            ids = [doc.id for doc in batch]
+            if seen_ids is not None:
+                seen_ids.update(ids)
+            for doc in batch:
+                bm25.add(doc)
+                catalog.add(doc)
+
+            existing = self._existing_ids(vector_store, manifest, ids)
+            new_documents = [doc for doc in batch if doc.id not in existing]
+            self.skipped += len(batch) - len(new_documents)
+            if new_documents:
+                yield new_documents
+
+    def _stages_writes(self, vector_store) -> bool:
+        """True when writes only reach the index on persist(), as with the local backend."""
+        if isinstance(vector_store, ShardedVectorStore):
+            return any(self._stages_writes(shard) for shard in vector_store.shards.values())
+        return isinstance(vector_store, LocalVectorStore)
+
+    def _upsert_embeddings(self, vector_store, documents: List[Document], vectors: List[List[float]]):
+        """Write precomputed vectors to the store."""
+        config = self.config.data_ingestion
+        if isinstance(vector_store, ShardedVectorStore):
+            rows_by_shard = {}
+            for row, doc in enumerate(documents):
+                rows_by_shard.setdefault(doc.metadata.get(SHARD_FIELD, vector_store.default), []).append(row)
+            for name, rows in rows_by_shard.items():
+                self._upsert_embeddings(
+                    vector_store.shard(name), [documents[row] for row in rows], [vectors[row] for row in rows],
                 )
-                while not pc.describe_index(index_name).status[config.status]:
-                    time.sleep(1)
-                
-            index = pc.Index(index_name)
-            embeddings = self.embeddings
-            vector_store = PineconeVectorStore(index=index, embedding=embeddings)
-            inserted_ids=vector_store.add_documents(documents)
+            return
+        if isinstance(vector_store, LocalVectorStore):
+            for start in range(0, len(documents), config.upsert_batch_size):
+                batch = documents[start:start + config.upsert_batch_size]
+                vector_store.add_embeddings(
+                    [doc.page_content for doc in batch], vectors[start:start + config.upsert_batch_size],
+                    metadatas=[doc.metadata for doc in batch], ids=[doc.id for doc in batch],
+                )
+            return
+        text_key = getattr(vector_store, "_text_key", "text")
+        records = [
+            (doc.id, list(vector), {**doc.metadata, text_key: doc.page_content})
+            for doc, vector in zip(documents, vectors)
+        ]
+        for request in self._pinecone_requests(records):
+            vector_store.index.upsert(vectors=request, namespace=getattr(vector_store, "_namespace", None))
+
+    def _pinecone_requests(self, records: List[tuple]) -> Iterator[List[tuple]]:
+        """
+        Split upserts to stay under Pinecone's per-request limits: at most
+        pinecone_upsert_batch_size vectors and pinecone_upsert_max_bytes of
+        JSON, which long reviews in the metadata can reach well before the
+        count does.
+        """
+        config = self.config.data_ingestion
+        request, size = [], 0
+        for record in records:
+            record_size = len(json.dumps(record, default=str))
+            if request and (len(request) >= config.pinecone_upsert_batch_size
+                            or size + record_size > config.pinecone_upsert_max_bytes):
+                yield request
+                request, size = [], 0
+            request.append(record)
+            size += record_size
+        if request:
+            yield request
+
+    def vector_store(self,documents: Iterable[Document]):
+        ''' storing only new or changed documents in the vector store '''
+        try:
+            config=self.config.data_ingestion
+            vector_store = self.registry.vector_store()
+            manifest = IngestManifest(config.manifest_path, self._index_key())
+
+            pipeline = EmbeddingPipeline(
+                self.embeddings,
+                model_name=self.config.Model_loader.model_name,
+                workers=config.embedding_workers,
+                threads_per_worker=config.threads_per_worker,
+                upload_workers=config.upload_workers,
+                upload_queue_size=config.upload_queue_size,
+                max_retries=config.max_retries,
+                retry_backoff_seconds=config.retry_backoff_seconds,
+            )
+            seen_ids = set() if config.delete_missing else None
+            inserted_ids = []
+            # Staged writes are lost if the run dies before persist(), so their
+            # ids only go into the manifest once persist() has succeeded.
+            staged = self._stages_writes(vector_store)
+
+            def upload(batch: List[Document], vectors: List[List[float]]):
+                self._upsert_embeddings(vector_store, batch, vectors)
+                ids = [doc.id for doc in batch]
+                if not staged:
+                    manifest.add(ids)
+                inserted_ids.extend(ids)
+
+            bm25 = BM25Builder(config.bm25_index_dir)
+            catalog = ProductCatalog()
+            report = pipeline.run(
+                self._new_batches(vector_store, manifest, documents, seen_ids, bm25, catalog), upload
+            )
+            bm25.save()
+            catalog.save(config.product_catalog_path)
+            logging.info(f"{self.skipped} documents already ingested, {len(inserted_ids)} upserted: {report}")
+
+            deleted_ids = []
+            if config.delete_missing:
+                deleted_ids = sorted(manifest.ids() - seen_ids)
+                for batch_ids in batched(deleted_ids, config.upsert_batch_size):
+                    vector_store.delete(ids=batch_ids)
+                    if not staged:
+                        manifest.remove(batch_ids)
+                logging.info(f"Deleted {len(deleted_ids)} documents no longer in the CSV")
+
+            if isinstance(vector_store, (LocalVectorStore, ShardedVectorStore)):
+                vector_store.persist()
+            if staged:
+                manifest.add(inserted_ids)
+                manifest.remove(deleted_ids)
+            self.index_changed = bool(inserted_ids or deleted_ids)
+            if self.index_changed:
+                self._mark_index_changed()
+            manifest.close()
             return vector_store, inserted_ids
 
-        except RAGException as e:
-            raise (f"Error storing data in vector store: {e,sys}")
-        
-    
+        except Exception as e:
+            raise RAGException(f"Error storing data in vector store: {e}", sys)
+
+    def _mark_index_changed(self):
+        """Invalidate cached answers in every running ChatHistory."""
+        cache_config = self.config.get("answer_cache")
+        if cache_config and cache_config.enabled:
+            AnswerCache.bump_version(cache_config.version_path)
+
+    def export_snapshot(self, documents: Iterable[Document]) -> dict:
+        """
+        Write the compact vector snapshot retrievers can serve from instead of
+        the vector store. Vectors come from the embedding model, which answers
+        from the embedding cache for everything ingested before.
+        """
+        try:
+            config = self.config.snapshot
+            writer = SnapshotWriter(
+                config.path,
+                dimension=self.config.data_ingestion.dimension,
+                dtype=config.dtype,
+                rescore=config.rescore,
+                embedding_model=self.config.Model_loader.model_name,
+            )
+            for batch in batched(documents, self.config.data_ingestion.embed_batch_size):
+                writer.add(batch, self.embeddings.embed_documents([doc.page_content for doc in batch]))
+            return writer.finish()
+        except Exception as e:
+            raise RAGException(f"Error exporting vector snapshot: {e}", sys)
+
     def run_pipeline(self):
         """
         Run the full data ingestion pipeline: transform data and store into vector DB.
         """
         documents = self.transform_data()
         vstore, inserted_ids = self.vector_store(documents)
+        snapshot = self.config.get("snapshot")
+        if snapshot and snapshot.export and (self.index_changed or not os.path.exists(snapshot.path)):
+            self.export_snapshot(self.transform_data())
+        if isinstance(self.embeddings, CachedEmbeddings):
+            self.embeddings.log_stats()
 
         # Optionally do a quick search
         query = "Can you tell me the low budget headphone?"
         results = vstore.similarity_search(query)
 
-        print(f"\nSample search results for query: '{query}'")
+        logging.info(f"Sample search for '{query}' returned {len(results)} documents")
         for res in results:
-            print(f"Content: {res.page_content}\nMetadata: {res.metadata}\n")
+            logging.debug(f"Sample result: {res.page_content} {res.metadata}")
 
 # Run if this file is executed directly
 if __name__ == "__main__":
     ingestion = DataIngestion()
     ingestion.run_pipeline()
 
-
-
-
-# import os
-# import sys
-# import time
-# import pandas as pd
-# from hashlib import md5
-# from typing import List
-# from dotenv import load_dotenv
-
-# from rag.exception.exception import RAGException
-# from rag.logging.logger import logging
-# from rag.constant import *
-# from utils.config import read_yaml
-# from rag.model_loaders.model_loader import ModelLoader
-
-# from langchain_core.documents import Document
-# from langchain_pinecone import PineconeVectorStore
-# from pinecone import Pinecone, ServerlessSpec
-
-# load_dotenv()
-
-
-# class DataIngestion:
-#     def __init__(self, config_file_path=CONFIG_FILE_PATH):
-#         self.config = read_yaml(config_file_path)
-#         self.model_loader = ModelLoader()
-#         self.csv_path = self._get_csv_path()
-#         self.product_data = self._load_csv()
-#         self.embeddings = self.model_loader.load_embeddings()
-
-#     def _get_csv_path(self):
-#         try:
-#             current_dir = os.getcwd()
-#             csv_path = os.path.join(current_dir, 'data', 'flipkart_product_review.csv')
-#             if not os.path.exists(csv_path):
-#                 raise FileNotFoundError(f"CSV file not found at: {csv_path}")
-#             return csv_path
-#         except Exception as e:
-#             raise RAGException(f"Error getting CSV path: {e}", sys)
-
-#     def _load_csv(self):
-#         try:
-#             df = pd.read_csv(self.csv_path)
-#             expected_columns = {'product_title', 'rating', 'summary', 'review'}
-#             if not expected_columns.issubset(set(df.columns)):
-#                 raise ValueError(f"CSV must contain columns: {expected_columns}")
-#             return df
-#         except Exception as e:
-#             raise RAGException(f"Error loading CSV: {e}", sys)
-
-#     def transform_data(self) -> List[Document]:
-#         try:
-#             product_list = []
-#             for _, row in self.product_data.iterrows():
-#                 product_entry = {
-#                     "product_name": row['product_title'],
-#                     "product_rating": row['rating'],
-#                     "product_summary": row['summary'],
-#                     "product_review": row['review']
-#                 }
-#                 product_list.append(product_entry)
-
-#             documents = []
-#             for entry in product_list:
-#                 content = entry["product_review"]
-#                 unique_id = md5(content.encode('utf-8')).hexdigest()
-#                 metadata = {
-#                     "id": unique_id,
-#                     "product_name": entry["product_name"],
-#                     "product_rating": entry["product_rating"],
-#                     "product_summary": entry["product_summary"]
-#                 }
-#                 doc = Document(page_content=content, metadata=metadata)
-#                 documents.append(doc)
-
-#             print(f"Transformed {len(documents)} documents.")
-#             return documents
-#         except Exception as e:
-#             raise RAGException(f"Error transforming data: {e}", sys)
-
-#     def vector_store(self, documents: List[Document]):
-#         try:
-#             config = self.config.data_ingestion
-#             pinecone_api_key = os.environ.get("PINECONE_API_KEY")
-#             pc = Pinecone(api_key=pinecone_api_key)
-#             index_name = config.index_name
-#             existing_indexes = [index_info["name"] for index_info in pc.list_indexes()]
-
-#             if index_name not in existing_indexes:
-#                 pc.create_index(
-#                     name=index_name,
-#                     dimension=config.dimension,
-#                     metric=config.metric,
-#                     spec=ServerlessSpec(cloud=config.cloud, region=config.region),
-#                 )
-#                 while not pc.describe_index(index_name).status[config.status]:
-#                     time.sleep(1)
-
-#             index = pc.Index(index_name)
-#             vector_store = PineconeVectorStore(index=index, embedding=self.embeddings)
-
-#             new_docs = []
-#             new_ids = []
-
-#             for doc in documents:
-#                 doc_id = doc.metadata["id"]
-#                 # Check if doc_id exists in Pinecone
-#                 existing = index.fetch(ids=[doc_id])
-#                 if not existing.vectors:
-#                     new_docs.append(doc)
-#                     new_ids.append(doc_id)
-
-#             if new_docs:
-#                 inserted_ids = vector_store.add_documents(new_docs, ids=new_ids)
-#                 print(f"Inserted {len(inserted_ids)} new documents.")
-#             else:
-#                 print("All documents already exist in the vector store.")
-
-#             return vector_store, new_ids
-#         except Exception as e:
-#             raise RAGException(f"Error storing data in vector store: {e}", sys)
-
-#     def run_pipeline(self):
-#         documents = self.transform_data()
-#         vstore, inserted_ids = self.vector_store(documents)
-
-#         if vstore and inserted_ids:
-#             query = "Can you tell me the low budget headphone?"
-#             results = vstore.similarity_search(query)
-
-#             print(f"\nSample search results for query: '{query}'")
-#             for res in results:
-#                 print(f"Content: {res.page_content}\nMetadata: {res.metadata}\n")
-
-
-# if __name__ == "__main__":
-#     ingestion = DataIngestion()
-#     ingestion.run_pipeline()
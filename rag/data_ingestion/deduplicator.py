@@ -0,0 +1,165 @@
+import hashlib
+import os
+import re
+import sqlite3
+import tempfile
+import zlib
+from typing import Dict, Hashable, Optional, Set
+
+import numpy as np
+
+_NON_WORD_RE = re.compile(r"[^a-z0-9]+")
+
+# Mersenne prime used by the universal hash family below.
+_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase and collapse punctuation and whitespace, so trivial edits hash alike."""
+    return _NON_WORD_RE.sub(" ", str(text).lower()).strip()
+
+
+class ReviewDeduplicator:
+    """
+    Single-pass clustering of reviews into exact and near-duplicate groups.
+
+    Each row is compared only with rows that share its key (product and
+    rating), first by a hash of its normalised text, then by MinHash over
+    character shingles with LSH banding. A row joins the first earlier
+    representative whose estimated Jaccard similarity reaches the
+    threshold, otherwise it becomes a representative itself.
+
+    Text hashes, band buckets, signatures and cluster sizes live in a
+    scratch SQLite file rather than in Python containers, so memory stays
+    flat however many reviews the CSV holds. The file gets a unique name in
+    ``scratch_dir``, so concurrent runs never share one; without a directory
+    the tables are kept in an in-memory database.
+    """
+
+    def __init__(self, num_perm: int = 64, bands: int = 16, threshold: float = 0.8,
+                 shingle_size: int = 5, near_duplicates: bool = True, seed: int = 1,
+                 scratch_dir: Optional[str] = None):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows_per_band = num_perm // bands
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        self.near_duplicates = near_duplicates
+
+        generator = np.random.RandomState(seed)
+        self._a = generator.randint(1, 1 << 32, size=num_perm, dtype=np.uint64)
+        self._b = generator.randint(0, 1 << 32, size=num_perm, dtype=np.uint64)
+
+        self.rows = 0
+        self.representatives = 0
+        self.near_duplicate_rows = 0
+        self.path = None
+        if scratch_dir:
+            os.makedirs(scratch_dir, exist_ok=True)
+            descriptor, self.path = tempfile.mkstemp(prefix="dedup.", suffix=".sqlite", dir=scratch_dir)
+            os.close(descriptor)
+        self._db = self._open(self.path)
+
+    @staticmethod
+    def _open(path: Optional[str]) -> sqlite3.Connection:
+        db = sqlite3.connect(path or ":memory:")
+        # Scratch data for one run: skip durability.
+        db.execute("PRAGMA journal_mode=OFF")
+        db.execute("PRAGMA synchronous=OFF")
+        db.execute("CREATE TABLE representatives (row INTEGER PRIMARY KEY, count INTEGER NOT NULL, signature BLOB)")
+        db.execute("CREATE TABLE exact (digest BLOB PRIMARY KEY, row INTEGER NOT NULL)")
+        db.execute("CREATE TABLE buckets (bucket BLOB PRIMARY KEY, row INTEGER NOT NULL)")
+        db.execute("CREATE TABLE duplicates (row INTEGER PRIMARY KEY, owner INTEGER NOT NULL)")
+        return db
+
+    def _signature(self, text: str) -> np.ndarray:
+        size = self.shingle_size
+        shingles = {text[i:i + size] for i in range(max(len(text) - size + 1, 1))}
+        hashes = np.fromiter(
+            (zlib.crc32(shingle.encode("utf-8")) for shingle in shingles),
+            dtype=np.uint64, count=len(shingles),
+        )
+        # (a * x + b) mod p, truncated to 32 bits; one row per permutation.
+        permuted = (np.outer(self._a, hashes) + self._b[:, None]) % _PRIME & _MAX_HASH
+        return permuted.min(axis=1).astype(np.uint32)
+
+    def _buckets(self, key: str, signature: np.ndarray) -> list:
+        return [
+            hashlib.sha1(f"{key}\0{band}\0".encode("utf-8") + values.tobytes()).digest()
+            for band, values in enumerate(signature.reshape(self.bands, self.rows_per_band))
+        ]
+
+    def _near_duplicate_owner(self, buckets: list, signature: np.ndarray) -> Optional[int]:
+        rows = dict(self._db.execute(
+            f"SELECT bucket, row FROM buckets WHERE bucket IN ({','.join('?' * len(buckets))})", buckets
+        ).fetchall())
+        # Earlier bands first, as the first matching bucket decides.
+        candidates = list(dict.fromkeys(rows[bucket] for bucket in buckets if bucket in rows))
+        if not candidates:
+            return None
+        signatures = dict(self._db.execute(
+            f"SELECT row, signature FROM representatives WHERE row IN ({','.join('?' * len(candidates))})",
+            candidates,
+        ).fetchall())
+        for candidate in candidates:
+            if np.mean(np.frombuffer(signatures[candidate], dtype=np.uint32) == signature) >= self.threshold:
+                return candidate
+        return None
+
+    def add(self, key: Hashable, text: str) -> int:
+        """Register the next row and return the row number of its representative."""
+        row = self.rows
+        self.rows += 1
+        key = repr(key)
+        normalized = normalize_text(text)
+        digest = hashlib.sha1(f"{key}\0{normalized}".encode("utf-8")).digest()
+
+        found = self._db.execute("SELECT row FROM exact WHERE digest = ?", (digest,)).fetchone()
+        owner = found[0] if found else None
+        signature = buckets = None
+        if owner is None and self.near_duplicates and normalized:
+            signature = self._signature(normalized)
+            buckets = self._buckets(key, signature)
+            owner = self._near_duplicate_owner(buckets, signature)
+            if owner is not None:
+                self.near_duplicate_rows += 1
+
+        if owner is None:
+            self.representatives += 1
+            self._db.execute("INSERT INTO exact (digest, row) VALUES (?, ?)", (digest, row))
+            self._db.execute(
+                "INSERT INTO representatives (row, count, signature) VALUES (?, 1, ?)",
+                (row, signature.tobytes() if signature is not None else None),
+            )
+            if buckets is not None:
+                self._db.executemany(
+                    "INSERT OR IGNORE INTO buckets (bucket, row) VALUES (?, ?)", [(bucket, row) for bucket in buckets]
+                )
+            return row
+
+        self._db.execute("UPDATE representatives SET count = count + 1 WHERE row = ?", (owner,))
+        self._db.execute("INSERT INTO duplicates (row, owner) VALUES (?, ?)", (row, owner))
+        return owner
+
+    def duplicates_between(self, start: int, stop: int) -> Set[int]:
+        """Rows in [start, stop) that were folded into an earlier representative."""
+        rows = self._db.execute("SELECT row FROM duplicates WHERE row >= ? AND row < ?", (start, stop))
+        return {row for row, in rows}
+
+    def counts_between(self, start: int, stop: int) -> Dict[int, int]:
+        """Cluster sizes of the representatives in [start, stop)."""
+        rows = self._db.execute("SELECT row, count FROM representatives WHERE row >= ? AND row < ?", (start, stop))
+        return dict(rows.fetchall())
+
+    @property
+    def collapsed(self) -> int:
+        return self.rows - self.representatives
+
+    def close(self):
+        """Drop the scratch tables."""
+        self._db.close()
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,228 @@
+import multiprocessing
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from typing import Callable, Iterable, List, Optional
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from rag.cache.embedding_cache import CachedEmbeddings
+from rag.logging.logger import logging
+from rag.metrics.metrics import span
+
+# Model loaded once per worker process by _init_worker.
+_worker_model = None
+
+
+def _init_worker(model_name: str, threads_per_worker: int):
+    global _worker_model
+    try:
+        import torch
+        torch.set_num_threads(threads_per_worker)
+    except ImportError:
+        pass
+    from langchain_huggingface import HuggingFaceEmbeddings
+    _worker_model = HuggingFaceEmbeddings(model_name=model_name)
+
+
+def _encode(texts: List[str]) -> np.ndarray:
+    return np.asarray(_worker_model.embed_documents(texts), dtype=np.float32)
+
+
+@dataclass
+class PipelineReport:
+    documents: int = 0
+    batches: int = 0
+    cached: int = 0
+    retries: int = 0
+    seconds: float = 0.0
+
+    @property
+    def docs_per_second(self) -> float:
+        return self.documents / self.seconds if self.seconds else 0.0
+
+    def __str__(self):
+        return (
+            f"{self.documents} documents in {self.batches} batches, {self.seconds:.1f}s "
+            f"({self.docs_per_second:.1f} docs/sec, {self.cached} from cache, {self.retries} retries)"
+        )
+
+
+class EmbeddingPipeline:
+    """
+    Overlaps embedding and upload during ingestion.
+
+    Batches are encoded on a pool of worker processes, each holding its own
+    copy of the sentence-transformers model, while upload threads drain a
+    bounded queue of encoded batches, so batch N+1 is encoded while batch N
+    is being uploaded. With ``workers=0`` encoding happens in-process through
+    the given embeddings object. Both steps retry with exponential backoff;
+    when a worker process dies the pool is replaced before retrying.
+    """
+
+    def __init__(self, embeddings: Embeddings, model_name: str, workers: int = 0,
+                 threads_per_worker: int = 1, upload_workers: int = 2, upload_queue_size: int = 8,
+                 max_retries: int = 3, retry_backoff_seconds: float = 1.0):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.workers = workers
+        self.threads_per_worker = threads_per_worker
+        self.upload_workers = upload_workers
+        self.upload_queue_size = upload_queue_size
+        self.max_retries = max_retries
+        self.retry_backoff_seconds = retry_backoff_seconds
+        self.report = PipelineReport()
+        self._report_lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _backoff(self, attempt: int, action: str, error: Exception):
+        delay = self.retry_backoff_seconds * (2 ** attempt)
+        logging.warning(f"{action} failed ({error}), retrying in {delay:.1f}s")
+        with self._report_lock:
+            self.report.retries += 1
+        time.sleep(delay)
+
+    def _encode_inline(self, texts: List[str]) -> Future:
+        future = Future()
+        try:
+            with span("ingest_encode_batch"):
+                future.set_result(np.asarray(self.embeddings.embed_documents(texts), dtype=np.float32))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def _start_pool(self):
+        self._executor = None
+        if self.workers > 0:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.model_name, self.threads_per_worker),
+            )
+
+    def _restart_pool(self, broken: ProcessPoolExecutor):
+        # Every future of a broken pool fails; only the first to notice replaces it.
+        if self._executor is broken:
+            logging.warning("An embedding worker process died, restarting the pool")
+            broken.shutdown(wait=False, cancel_futures=True)
+            self._start_pool()
+
+    def _submit(self, texts: List[str]) -> Future:
+        if self._executor is None:
+            return self._encode_inline(texts)
+        return self._executor.submit(_encode, texts)
+
+    def _encode_batch(self, batch: List[Document]):
+        """Start encoding the cache misses of a batch; returns what _collect needs to finish it."""
+        texts = [doc.page_content for doc in batch]
+        cached = (
+            self.embeddings.cached_documents(texts) if isinstance(self.embeddings, CachedEmbeddings)
+            else [None] * len(texts)
+        )
+        missing = [text for text, vector in zip(texts, cached) if vector is None]
+        future = self._submit(missing) if missing else None
+        return batch, texts, cached, missing, future, self._executor
+
+    def _collect(self, pending) -> tuple:
+        batch, texts, cached, missing, future, pool = pending
+        vectors = np.zeros((0, 0), dtype=np.float32)
+        for attempt in range(self.max_retries + 1):
+            if future is None:
+                break
+            try:
+                # Inline batches are already done; with workers this is the wait for the pool.
+                with span("ingest_encode_wait"):
+                    vectors = future.result()
+                break
+            except Exception as e:
+                if isinstance(e, BrokenProcessPool):
+                    if attempt == self.max_retries:
+                        raise RuntimeError(
+                            f"Embedding worker processes kept dying ({e}); check their memory use"
+                        ) from e
+                    self._restart_pool(pool)
+                elif attempt == self.max_retries:
+                    raise
+                self._backoff(attempt, "Embedding batch", e)
+                pool = self._executor
+                future = self._submit(missing)
+
+        if missing and isinstance(self.embeddings, CachedEmbeddings):
+            self.embeddings.cache_documents(missing, vectors.tolist())
+        computed = iter(vectors.tolist())
+        result = [vector if vector is not None else next(computed) for vector in cached]
+        with self._report_lock:
+            self.report.cached += len(texts) - len(missing)
+        return batch, result
+
+    def _upload_loop(self, uploads: queue.Queue, upload: Callable, errors: list):
+        while True:
+            item = uploads.get()
+            if item is None:
+                return
+            if errors:
+                continue
+            batch, vectors = item
+            for attempt in range(self.max_retries + 1):
+                try:
+                    with span("ingest_upload_batch"):
+                        upload(batch, vectors)
+                except Exception as e:
+                    if attempt == self.max_retries:
+                        errors.append(e)
+                        break
+                    self._backoff(attempt, "Upload batch", e)
+                    continue
+                with self._report_lock:
+                    self.report.documents += len(batch)
+                    self.report.batches += 1
+                break
+
+    def run(self, batches: Iterable[List[Document]],
+            upload: Callable[[List[Document], List[List[float]]], None]) -> PipelineReport:
+        """Embed every batch and hand (documents, vectors) to upload; returns the throughput report."""
+        self.report = PipelineReport()
+        start = time.perf_counter()
+        uploads = queue.Queue(maxsize=self.upload_queue_size)
+        errors = []
+        uploaders = [
+            threading.Thread(target=self._upload_loop, args=(uploads, upload, errors), daemon=True)
+            for _ in range(self.upload_workers)
+        ]
+        for thread in uploaders:
+            thread.start()
+
+        self._start_pool()
+        try:
+            # Keep every worker busy with one batch in hand and one queued.
+            in_flight = deque()
+            max_in_flight = max(1, self.workers * 2)
+            for batch in batches:
+                if errors:
+                    break
+                in_flight.append(self._encode_batch(batch))
+                if len(in_flight) >= max_in_flight:
+                    uploads.put(self._collect(in_flight.popleft()))
+            while in_flight and not errors:
+                uploads.put(self._collect(in_flight.popleft()))
+        finally:
+            for _ in uploaders:
+                uploads.put(None)
+            for thread in uploaders:
+                thread.join()
+            if self._executor is not None:
+                self._executor.shutdown(cancel_futures=True)
+                self._executor = None
+
+        if errors:
+            raise errors[0]
+        self.report.seconds = time.perf_counter() - start
+        logging.info(f"Embedding pipeline finished: {self.report}")
+        return self.report
@@ -0,0 +1,64 @@
+import os
+import sqlite3
+import threading
+from typing import Iterable, List, Set
+
+
+class IngestManifest:
+    """
+    Local record of the document ids already written to a vector index.
+
+    Ids are scoped by index key (backend plus index name) so one manifest file
+    can track several indexes. Checking it costs no round trips to the vector
+    store, which is what makes re-running ingestion proportional to the delta.
+    """
+
+    SQLITE_BATCH = 500
+
+    def __init__(self, path: str, index_key: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.index_key = index_key
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS ingested ("
+            "index_key TEXT NOT NULL, id TEXT NOT NULL, PRIMARY KEY (index_key, id))"
+        )
+        self._db.commit()
+
+    def existing(self, ids: List[str]) -> Set[str]:
+        found = set()
+        for start in range(0, len(ids), self.SQLITE_BATCH):
+            batch = ids[start:start + self.SQLITE_BATCH]
+            with self._lock:
+                rows = self._db.execute(
+                    f"SELECT id FROM ingested WHERE index_key = ? AND id IN ({','.join('?' * len(batch))})",
+                    [self.index_key, *batch],
+                ).fetchall()
+            found.update(row[0] for row in rows)
+        return found
+
+    def add(self, ids: Iterable[str]):
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR IGNORE INTO ingested (index_key, id) VALUES (?, ?)",
+                [(self.index_key, doc_id) for doc_id in ids],
+            )
+            self._db.commit()
+
+    def remove(self, ids: Iterable[str]):
+        with self._lock:
+            self._db.executemany(
+                "DELETE FROM ingested WHERE index_key = ? AND id = ?",
+                [(self.index_key, doc_id) for doc_id in ids],
+            )
+            self._db.commit()
+
+    def ids(self) -> Set[str]:
+        with self._lock:
+            rows = self._db.execute("SELECT id FROM ingested WHERE index_key = ?", (self.index_key,))
+            return {row[0] for row in rows}
+
+    def close(self):
+        self._db.close()
@@ -0,0 +1,103 @@
+import json
+import math
+import os
+import sys
+from typing import Dict, List, Optional
+
+from langchain_core.documents import Document
+
+from rag.exception.exception import RAGException
+from rag.logging.logger import logging
+
+
+class ProductCatalog:
+    """
+    Per-product aggregates built during ingestion: title, category shard,
+    review count, mean rating and a 1-5 star histogram, keyed by product id.
+    Small enough to keep in memory and answer "highest rated" style
+    questions directly.
+    """
+
+    def __init__(self, products: Optional[Dict[str, dict]] = None):
+        self.products = products or {}
+
+    def add(self, document: Document):
+        metadata = document.metadata
+        product = self.products.setdefault(metadata["product_id"], {
+            "title": metadata["product_name"],
+            "category": metadata.get("category"),
+            "review_count": 0,
+            "rating_sum": 0.0,
+            "histogram": [0, 0, 0, 0, 0],
+        })
+        # A collapsed duplicate cluster still counts every review it stands for.
+        reviews = metadata.get("duplicate_count", 1)
+        product["review_count"] += reviews
+        rating = metadata.get("product_rating")
+        if isinstance(rating, (int, float)) and not math.isnan(rating) and 1 <= rating <= 5:
+            product["rating_sum"] += rating * reviews
+            product["histogram"][int(round(rating)) - 1] += reviews
+
+    @staticmethod
+    def mean_rating(product: dict) -> float:
+        rated = sum(product["histogram"])
+        return product["rating_sum"] / rated if rated else 0.0
+
+    def save(self, path: str):
+        try:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            with open(path + ".tmp", "w") as f:
+                json.dump(self.products, f)
+            os.replace(path + ".tmp", path)
+            logging.info(f"Product catalog with {len(self.products)} products saved to {path}")
+        except Exception as e:
+            raise RAGException(f"Error saving product catalog: {e}", sys)
+
+    @classmethod
+    def load_if_exists(cls, path: str) -> Optional["ProductCatalog"]:
+        if not os.path.exists(path):
+            logging.warning(f"No product catalog at {path}, product routing disabled")
+            return None
+        with open(path) as f:
+            return cls(json.load(f))
+
+    def ranked(self, product_ids: Optional[List[str]] = None, by: str = "rating",
+               descending: bool = True, limit: int = 5, min_reviews: int = 1) -> List[str]:
+        """
+        Product ids ordered by mean rating (ties broken by review count) or
+        by review count, among product_ids or, when it is None, the whole
+        catalog.
+        """
+        candidates = [
+            product_id for product_id in (product_ids if product_ids is not None else self.products)
+            if self.products[product_id]["review_count"] >= min_reviews
+        ]
+        if by == "reviews":
+            key = lambda product_id: self.products[product_id]["review_count"]
+        else:
+            key = lambda product_id: (self.mean_rating(self.products[product_id]), self.products[product_id]["review_count"])
+        return sorted(candidates, key=key, reverse=descending)[:limit]
+
+    def as_documents(self, product_ids: List[str]) -> List[Document]:
+        """One compact context document per product, used instead of reviews for aggregate questions."""
+        documents = []
+        for product_id in product_ids:
+            product = self.products[product_id]
+            histogram = ", ".join(
+                f"{stars} star: {count}" for stars, count in zip(range(5, 0, -1), reversed(product["histogram"]))
+            )
+            content = (
+                f"{product['title']} has {product['review_count']} reviews with an average rating of "
+                f"{self.mean_rating(product):.2f} out of 5 ({histogram})."
+            )
+            documents.append(Document(
+                id=f"catalog-{product_id}",
+                page_content=content,
+                metadata={
+                    "product_id": product_id,
+                    "product_name": product["title"],
+                    "product_rating": round(self.mean_rating(product), 2),
+                    "review_count": product["review_count"],
+                },
+            ))
+        return documents
@@ -1,16 +1,187 @@
+import atexit
+import copy
+import json
 import logging
+import logging.handlers
 import os
-from datetime import datetime
+import queue
+import random
+import zlib
+from datetime import datetime, timezone
 
-LOG_FILE=f"{datetime.now().strftime('%m_%d_%Y_%H_%M_%S')}.log"
+import yaml
 
-logs_path=os.path.join(os.getcwd(),"logs",LOG_FILE)
-os.makedirs(logs_path,exist_ok=True)
-LOG_FILE_PATH=os.path.join(logs_path,LOG_FILE)
+from rag.metrics.metrics import REGISTRY, trace_id_var
 
+CONFIG_PATH = os.path.join("config", "config.yaml")
+DEFAULT_CONFIG = {
+    "level": "INFO",
+    "file": "logs/rag.{pid}.log",
+    "max_bytes": 10 * 1024 * 1024,
+    "backup_count": 5,
+    "queue_size": 10000,
+    "debug_sample_rate": 0.01,
+    "console": False,
+}
 
-logging.basicConfig(
-    filename=LOG_FILE_PATH,
-    format="[ %(asctime)s ] %(lineno)d %(name)s - %(levelname)s - %(message)s",
-    level=logging.INFO,
-)
\ No newline at end of file
+LOG_RECORDS_DROPPED = REGISTRY.counter(
+    "rag_log_records_dropped_total", "Log records dropped because the writer thread fell behind."
+)
+
+
+def _read_config() -> dict:
+    # Read directly: utils.config logs through this module, and the rest of
+    # the app may not be importable yet.
+    config = dict(DEFAULT_CONFIG)
+    try:
+        with open(CONFIG_PATH) as f:
+            config.update((yaml.safe_load(f) or {}).get("logging") or {})
+    except FileNotFoundError:
+        pass
+    return config
+
+
+class TraceIdFilter(logging.Filter):
+    """Stamp every record with the trace id of the request being served."""
+
+    def filter(self, record):
+        record.trace_id = trace_id_var.get()
+        return True
+
+
+class DebugSampler(logging.Filter):
+    """
+    Keep DEBUG records for a ``rate`` share of requests. The decision hangs on
+    the trace id, so a sampled request keeps all of its debug lines; records
+    outside a request are sampled one by one.
+    """
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG or self.rate >= 1:
+            return True
+        trace_id = getattr(record, "trace_id", "-")
+        if trace_id == "-":
+            return random.random() < self.rate
+        return zlib.crc32(trace_id.encode("utf-8")) % 10000 < self.rate * 10000
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line."""
+
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "trace_id": getattr(record, "trace_id", "-"),
+            "pid": record.process,
+            "module": record.module,
+            "line": record.lineno,
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Never block the caller: when the queue is full the record is dropped and counted."""
+
+    def prepare(self, record):
+        # Resolve the message and traceback now, since the arguments may
+        # change after the call; the JSON formatting is left to the writer.
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc()
+
+
+_queue_handler = None
+_listener = None
+
+
+def _file_path(config: dict) -> str:
+    # "{pid}" gives every worker its own file, so rotations do not race. A
+    # path without it is shared, which is only safe with a single process.
+    path = config["file"].format(pid=os.getpid())
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    return path
+
+
+def configure_logging():
+    """
+    Route every log record through a bounded queue to a background writer
+    thread, which writes JSON lines to a size-rotated file (and plain text to
+    stderr when configured). Logging calls on the request path only format
+    the message and enqueue it.
+    """
+    global _queue_handler, _listener
+    stop_logging()
+    config = _read_config()
+
+    file_handler = logging.handlers.RotatingFileHandler(
+        _file_path(config), maxBytes=config["max_bytes"], backupCount=config["backup_count"], encoding="utf-8"
+    )
+    file_handler.setFormatter(JsonFormatter())
+    handlers = [file_handler]
+    if config["console"]:
+        console = logging.StreamHandler()
+        console.setFormatter(logging.Formatter(
+            "[ %(asctime)s ] %(name)s - %(levelname)s - trace=%(trace_id)s - %(message)s"
+        ))
+        handlers.append(console)
+
+    # The filters run in the calling thread, where the request's trace id is set.
+    _queue_handler = DroppingQueueHandler(queue.Queue(config["queue_size"]))
+    _queue_handler.addFilter(TraceIdFilter())
+    _queue_handler.addFilter(DebugSampler(config["debug_sample_rate"]))
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(_queue_handler)
+    root.setLevel(config["level"])
+    # The Groq client logs every HTTP request at INFO; the LLM metrics cover that.
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    _listener = logging.handlers.QueueListener(_queue_handler.queue, *handlers, respect_handler_level=True)
+    _listener.start()
+
+
+def stop_logging():
+    """Flush queued records and stop the writer thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+def _restart_after_fork():
+    # Threads do not survive fork, and the queue's lock may have been held by
+    # the parent's writer: a worker forked from a preloading parent drops both
+    # and starts its own writer (and, with "{pid}" in the path, its own file).
+    global _listener
+    _listener = None
+    configure_logging()
+
+
+configure_logging()
+atexit.register(stop_logging)
+os.register_at_fork(after_in_child=_restart_after_fork)
@@ -0,0 +1,65 @@
+import time
+
+from rag.logging.logger import logging
+from rag.metrics.metrics import (
+    REQUEST_SECONDS, REQUESTS_IN_FLIGHT, REQUESTS_TOTAL, format_timings, new_trace_id,
+    stage_timings_var, trace_id_var,
+)
+
+TRACE_HEADER = "x-trace-id"
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware that gives each HTTP request a trace id, tracks it in the
+    in-flight gauge and latency histogram until its body is fully sent (so
+    streamed answers count in full), and logs its per-stage timings.
+
+    An incoming X-Trace-Id header is reused so traces can span services.
+    """
+
+    def __init__(self, app, skip_paths=("/metrics", "/static")):
+        self.app = app
+        self.skip_paths = skip_paths
+        self._route_paths = None
+
+    def _path_label(self, scope) -> str:
+        """The request path for known routes; anything else shares one label to bound cardinality."""
+        if self._route_paths is None:
+            self._route_paths = {getattr(route, "path", None) for route in scope["app"].routes}
+        return scope["path"] if scope["path"] in self._route_paths else "other"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(self.skip_paths):
+            await self.app(scope, receive, send)
+            return
+
+        path = self._path_label(scope)
+        headers = dict(scope.get("headers") or [])
+        trace_id = headers.get(TRACE_HEADER.encode(), b"").decode() or new_trace_id()
+        trace_token = trace_id_var.set(trace_id)
+        timings_token = stage_timings_var.set({})
+        status = {"code": 500}
+
+        async def send_with_trace(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(TRACE_HEADER.encode(), trace_id.encode())]
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc(path=path)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_trace)
+        finally:
+            elapsed = time.perf_counter() - started
+            REQUESTS_IN_FLIGHT.dec(path=path)
+            REQUEST_SECONDS.observe(elapsed, path=path)
+            REQUESTS_TOTAL.inc(path=path, status=str(status["code"]))
+            logging.info(
+                f"{scope['method']} {scope['path']} {status['code']} in {elapsed * 1000:.1f}ms "
+                f"{format_timings(stage_timings_var.get() or {})}"
+            )
+            stage_timings_var.reset(timings_token)
+            trace_id_var.reset(trace_token)
@@ -0,0 +1,20 @@
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+
+from rag.metrics.metrics import span
+
+
+class TimedEmbeddings(Embeddings):
+    """Records every call that reaches the embedding model as an embed_query / embed_documents stage."""
+
+    def __init__(self, underlying: Embeddings):
+        self.underlying = underlying
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        with span("embed_documents"):
+            return self.underlying.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        with span("embed_query"):
+            return self.underlying.embed_query(text)
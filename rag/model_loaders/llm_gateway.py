@@ -0,0 +1,260 @@
+import asyncio
+import os
+import threading
+import weakref
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import httpx
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import PrivateAttr
+
+from rag.logging.logger import logging
+from rag.metrics.metrics import REGISTRY, span
+
+LLM_CALLS = REGISTRY.counter("rag_llm_calls_total", "LLM calls by model and outcome.", ["model", "outcome"])
+LLM_HEDGES = REGISTRY.counter(
+    "rag_llm_hedges_total", "Duplicate LLM requests sent after the hedge delay, and how many answered first.", ["result"]
+)
+LLM_FALLBACKS = REGISTRY.counter("rag_llm_fallbacks_total", "Calls handed to the fallback model, by reason.", ["reason"])
+
+_http_clients: Dict[Tuple[int, int, int], Tuple[httpx.Client, httpx.AsyncClient]] = {}
+_http_clients_lock = threading.Lock()
+
+
+def shared_http_clients(max_connections: int = 100,
+                        max_keepalive_connections: int = 20) -> Tuple[httpx.Client, httpx.AsyncClient]:
+    """
+    One sync and one async connection pool shared by every LLM client in the
+    process. Keyed by pid as well, so a forked worker builds its own pools
+    instead of reusing its parent's.
+    """
+    key = (os.getpid(), max_connections, max_keepalive_connections)
+    with _http_clients_lock:
+        if key not in _http_clients:
+            limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive_connections)
+            _http_clients[key] = (httpx.Client(limits=limits), httpx.AsyncClient(limits=limits))
+        return _http_clients[key]
+
+
+def _failure_reason(error: BaseException) -> str:
+    if isinstance(error, asyncio.TimeoutError):
+        return "timeout"
+    if getattr(error, "status_code", None) == 429:
+        return "rate_limited"
+    return "error"
+
+
+class LLMGateway(BaseChatModel):
+    """
+    Chat model that fronts a primary model (and optionally a faster fallback)
+    to keep tail latency bounded when the provider slows down.
+
+    - At most ``max_concurrency`` calls per worker are in flight; the rest
+      queue here instead of piling onto the provider.
+    - A call that has not answered after ``hedge_after_seconds`` gets a
+      duplicate request, when a concurrency slot is free, and whichever
+      answers first wins.
+    - A call that misses its deadline (``timeout_seconds`` for a full answer,
+      ``first_token_timeout_seconds`` for the first streamed token) or fails,
+      for example when rate limited, is retried once on the fallback model.
+      A stream that has already produced tokens is not retried.
+    - Deadlines cover the fallback too. With a fallback configured the
+      primary gets ``primary_deadline_share`` of each deadline and the
+      fallback whatever is left, so a call never takes longer than
+      ``timeout_seconds`` once it holds a concurrency slot.
+
+    Synchronous calls only get the concurrency limit and the fallback; their
+    deadline is the HTTP timeout of the underlying client.
+    """
+
+    primary: BaseChatModel
+    fallback: Optional[BaseChatModel] = None
+    primary_name: str = "primary"
+    fallback_name: str = "fallback"
+    max_concurrency: int = 16
+    timeout_seconds: float = 20.0
+    first_token_timeout_seconds: float = 6.0
+    hedge_after_seconds: Optional[float] = None
+    primary_deadline_share: float = 0.7
+
+    _semaphores: Any = PrivateAttr(default_factory=weakref.WeakKeyDictionary)
+    _sync_semaphore: Any = PrivateAttr(default=None)
+    _background_tasks: Any = PrivateAttr(default_factory=set)
+
+    def model_post_init(self, __context: Any):
+        self._sync_semaphore = threading.BoundedSemaphore(self.max_concurrency)
+
+    @property
+    def _llm_type(self) -> str:
+        return "llm-gateway"
+
+    def _limit(self) -> asyncio.Semaphore:
+        # asyncio primitives belong to one event loop; get_response() runs its own.
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+        return semaphore
+
+    async def _acall(self, model: BaseChatModel, name: str, messages: List[BaseMessage],
+                     stop: Optional[List[str]], **kwargs: Any) -> BaseMessage:
+        try:
+            message = await model.ainvoke(messages, stop=stop, **kwargs)
+        except asyncio.CancelledError:
+            LLM_CALLS.inc(model=name, outcome="cancelled")
+            raise
+        except Exception as e:
+            LLM_CALLS.inc(model=name, outcome=_failure_reason(e))
+            raise
+        LLM_CALLS.inc(model=name, outcome="ok")
+        return message
+
+    async def _aopen_stream(self, model: BaseChatModel, name: str, messages: List[BaseMessage],
+                            stop: Optional[List[str]], **kwargs: Any) -> Tuple[str, AsyncIterator, Any]:
+        """Start a stream and wait for its first chunk."""
+        stream = model.astream(messages, stop=stop, **kwargs)
+        try:
+            first = await stream.__anext__()
+        except asyncio.CancelledError:
+            LLM_CALLS.inc(model=name, outcome="cancelled")
+            await stream.aclose()
+            raise
+        except Exception as e:
+            LLM_CALLS.inc(model=name, outcome=_failure_reason(e))
+            await stream.aclose()
+            raise
+        return name, stream, first
+
+    @staticmethod
+    async def _aclose_stream(opened: Tuple[str, AsyncIterator, Any]):
+        await opened[1].aclose()
+
+    def _discard_when_done(self, task: asyncio.Task, discard: Callable[[Any], Awaitable]):
+        """Pass the result of a losing request to discard once it finishes, if it succeeds."""
+        def done(task: asyncio.Task):
+            if task.cancelled() or task.exception() is not None:
+                return
+            cleanup = asyncio.get_running_loop().create_task(discard(task.result()))
+            self._background_tasks.add(cleanup)
+            cleanup.add_done_callback(self._background_tasks.discard)
+        task.add_done_callback(done)
+
+    async def _ahedged(self, start: Callable[[], Awaitable],
+                       discard: Optional[Callable[[Any], Awaitable]] = None):
+        """
+        Await start(), racing it against a second start() once the hedge delay
+        passes. Results of the requests that lose, including ones that succeed
+        after the winner, are passed to ``discard``, e.g. to close their streams.
+        """
+        first = asyncio.create_task(start())
+        hedge, winner, limit = None, None, self._limit()
+        pending = {first}
+        try:
+            done, pending = await asyncio.wait(pending, timeout=self.hedge_after_seconds)
+            # Hedge only with spare capacity, never by queueing behind other calls.
+            if pending and not limit.locked():
+                await limit.acquire()
+                hedge = asyncio.create_task(start())
+                pending.add(hedge)
+                LLM_HEDGES.inc(result="started")
+            failures = []
+            while True:
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            LLM_HEDGES.inc(result="won")
+                        winner = task
+                        return task.result()
+                    failures.append(task.exception())
+                if not pending:
+                    raise failures[0]
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in (first, hedge):
+                if task is None or task is winner:
+                    continue
+                task.cancel()
+                if discard is not None:
+                    self._discard_when_done(task, discard)
+            if hedge is not None:
+                limit.release()
+
+    async def _awith_fallback(self, deadline: float, primary: Callable[[], Awaitable],
+                              fallback: Callable[[], Awaitable],
+                              discard: Optional[Callable[[Any], Awaitable]] = None):
+        """Await primary, then fallback if it fails, both within ``deadline`` seconds in total."""
+        loop = asyncio.get_running_loop()
+        expires = loop.time() + deadline
+        if self.fallback is None:
+            return await asyncio.wait_for(self._ahedged(primary, discard), deadline)
+        try:
+            return await asyncio.wait_for(self._ahedged(primary, discard), deadline * self.primary_deadline_share)
+        except Exception as e:
+            reason = _failure_reason(e)
+            logging.warning(f"LLM {self.primary_name} failed ({reason}: {e}); falling back to {self.fallback_name}")
+            LLM_FALLBACKS.inc(reason=reason)
+            return await asyncio.wait_for(fallback(), max(expires - loop.time(), 0.0))
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Optional[AsyncCallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        limit = self._limit()
+        with span("llm_queue"):
+            await limit.acquire()
+        try:
+            message = await self._awith_fallback(
+                self.timeout_seconds,
+                lambda: self._acall(self.primary, self.primary_name, messages, stop, **kwargs),
+                lambda: self._acall(self.fallback, self.fallback_name, messages, stop, **kwargs),
+            )
+        finally:
+            limit.release()
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+                       **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        limit = self._limit()
+        with span("llm_queue"):
+            await limit.acquire()
+        try:
+            # The whole answer, first token included, has timeout_seconds.
+            deadline = asyncio.get_running_loop().time() + self.timeout_seconds
+            name, stream, chunk = await self._awith_fallback(
+                self.first_token_timeout_seconds,
+                lambda: self._aopen_stream(self.primary, self.primary_name, messages, stop, **kwargs),
+                lambda: self._aopen_stream(self.fallback, self.fallback_name, messages, stop, **kwargs),
+                discard=self._aclose_stream,
+            )
+            try:
+                while True:
+                    yield ChatGenerationChunk(message=chunk)
+                    remaining = max(deadline - asyncio.get_running_loop().time(), 0.0)
+                    try:
+                        chunk = await asyncio.wait_for(stream.__anext__(), remaining)
+                    except StopAsyncIteration:
+                        break
+            except Exception as e:
+                LLM_CALLS.inc(model=name, outcome=_failure_reason(e))
+                raise
+            finally:
+                await stream.aclose()
+            LLM_CALLS.inc(model=name, outcome="ok")
+        finally:
+            limit.release()
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        with self._sync_semaphore:
+            try:
+                message = self.primary.invoke(messages, stop=stop, **kwargs)
+            except Exception as e:
+                if self.fallback is None:
+                    raise
+                reason = _failure_reason(e)
+                logging.warning(f"LLM {self.primary_name} failed ({reason}: {e}); falling back to {self.fallback_name}")
+                LLM_FALLBACKS.inc(reason=reason)
+                message = self.fallback.invoke(messages, stop=stop, **kwargs)
+        return ChatResult(generations=[ChatGeneration(message=message)])
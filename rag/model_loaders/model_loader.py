@@ -1,15 +1,13 @@
 import os
-import sys
-from langchain_groq import ChatGroq
-from langchain_huggingface import HuggingFaceEmbeddings
+from rag.cache.embedding_cache import CachedEmbeddings
 from rag.exception.exception import RAGException
 from rag.logging.logger import logging
+from rag.model_loaders.llm_gateway import LLMGateway, shared_http_clients
+from rag.metrics.timed_embeddings import TimedEmbeddings
 from rag.constant import *
 from dotenv import load_dotenv
 from utils.config import read_yaml
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class ModelLoader:
@@ -43,10 +41,23 @@ class ModelLoader:
             Load Hugging Face embeddings for vector store.
             """
             logger.info("Loading Hugging Face embedding model...")
+            # Imported on first use: sentence-transformers and torch take seconds to import.
+            from langchain_huggingface import HuggingFaceEmbeddings
             config = self.config.Model_loader
             model_name = config.model_name
-            huggingface_embeddings = HuggingFaceEmbeddings(model_name=model_name)
+            # Timed inside the cache, so only real model calls are recorded.
+            huggingface_embeddings = TimedEmbeddings(HuggingFaceEmbeddings(model_name=model_name))
             logger.info(f"Embedding model {model_name} loaded successfully")
+
+            cache_config = self.config.get("embedding_cache")
+            if cache_config and cache_config.enabled:
+                logger.info(f"Caching embeddings in {cache_config.path}")
+                return CachedEmbeddings(
+                    huggingface_embeddings,
+                    model_name=model_name,
+                    cache_path=cache_config.path,
+                    max_memory_items=cache_config.max_memory_items,
+                )
             return huggingface_embeddings
         except RAGException as e:
             logger.error(f"Error loading embeddings: {e}")
@@ -58,15 +69,54 @@ class ModelLoader:
             Load LLM via Groq API.
             """
             logger.info("Loading LLM from Groq...")
+            from langchain_groq import ChatGroq
             config = self.config.Model_loader
             model_name = config.llm_model_name
-            llm = ChatGroq(model=model_name, api_key=os.getenv("GROQ_API_KEY"))
+            gateway_config = self.config.get("llm_gateway")
+            if not gateway_config or not gateway_config.enabled:
+                llm = ChatGroq(model=model_name, api_key=os.getenv("GROQ_API_KEY"))
+            else:
+                llm = self._load_llm_gateway(ChatGroq, model_name, gateway_config)
             logger.info(f"LLM {model_name} loaded successfully")
             return llm
         except RAGException as e:
             logger.error(f"Error loading LLM: {e}")
             raise
 
+    def _load_llm_gateway(self, chat_model, model_name, gateway_config):
+        """
+        Primary and fallback Groq clients sharing one HTTP connection pool,
+        behind the LLMGateway concurrency limit, deadlines and hedging.
+        """
+        http_client, http_async_client = shared_http_clients(
+            gateway_config.max_connections, gateway_config.max_keepalive_connections
+        )
+
+        def client(name):
+            return chat_model(
+                model=name,
+                api_key=os.getenv("GROQ_API_KEY"),
+                timeout=gateway_config.timeout_seconds,
+                max_retries=gateway_config.max_retries,
+                http_client=http_client,
+                http_async_client=http_async_client,
+            )
+
+        fallback_name = gateway_config.get("fallback_model_name")
+        if fallback_name:
+            logger.info(f"LLM fallback model: {fallback_name}")
+        return LLMGateway(
+            primary=client(model_name),
+            fallback=client(fallback_name) if fallback_name else None,
+            primary_name=model_name,
+            fallback_name=fallback_name or "",
+            max_concurrency=gateway_config.max_concurrency,
+            timeout_seconds=gateway_config.timeout_seconds,
+            first_token_timeout_seconds=gateway_config.first_token_timeout_seconds,
+            hedge_after_seconds=gateway_config.get("hedge_after_seconds"),
+            primary_deadline_share=gateway_config.get("primary_deadline_share", 0.7),
+        )
+
     def run_llm(self):
         try:
             llm = self.load_llm()
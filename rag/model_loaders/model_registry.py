@@ -0,0 +1,125 @@
+import os
+import sys
+import threading
+import time
+from typing import Callable, Dict
+
+from box import ConfigBox
+
+from rag.constant import CONFIG_FILE_PATH
+from rag.exception.exception import RAGException
+from rag.logging.logger import logging
+from rag.model_loaders.model_loader import ModelLoader
+
+# Close enough to process start for the startup report: this module is
+# imported by the first component that needs a model.
+PROCESS_STARTED = time.perf_counter()
+
+
+class ModelRegistry:
+    """
+    Process-wide home of the config, embedding model, LLM client and vector
+    store handle, so DataIngestion, DataRetriever and ChatHistory share one
+    copy of each instead of loading their own.
+
+    preload() loads only what is safe to share across a fork, which is what
+    a parent process should do before forking workers: the embedding model
+    weights and, when searching a local index or snapshot, its memory-mapped
+    arrays, shared copy-on-write. Network clients (the LLM, Pinecone) and
+    SQLite connections are opened by each worker on first use. warmup()
+    runs one dummy request through each component and belongs in the
+    worker, before it reports ready.
+    """
+
+    _instances: Dict[str, "ModelRegistry"] = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, config_file_path=CONFIG_FILE_PATH):
+        self.model_loader = ModelLoader(config_file_path)
+        self.config: ConfigBox = self.model_loader.config
+        self._models = {}
+        self._lock = threading.RLock()
+        self.timings: Dict[str, float] = {}
+
+    @classmethod
+    def get(cls, config_file_path=CONFIG_FILE_PATH) -> "ModelRegistry":
+        key = os.path.abspath(config_file_path)
+        with cls._instances_lock:
+            if key not in cls._instances:
+                cls._instances[key] = cls(config_file_path)
+            return cls._instances[key]
+
+    def _load(self, name: str, factory: Callable):
+        with self._lock:
+            if name not in self._models:
+                started = time.perf_counter()
+                self._models[name] = factory()
+                self.timings[f"load_{name}"] = time.perf_counter() - started
+            return self._models[name]
+
+    def embeddings(self):
+        return self._load("embeddings", self.model_loader.load_embeddings)
+
+    def llm(self):
+        return self._load("llm", self.model_loader.load_llm)
+
+    def vector_store(self):
+        # Imported here: the vector store loader pulls in the index backends.
+        from rag.vector_store.store_loader import VectorStoreLoader
+
+        return self._load("vector_store", lambda: VectorStoreLoader(self.config).load_vector_store(self.embeddings()))
+
+    def search_store(self):
+        """
+        The store retrievers search: the vector snapshot when snapshot.serve
+        is set and one has been exported, otherwise vector_store().
+        """
+        from rag.vector_store.store_loader import VectorStoreLoader
+
+        config = self.config.get("snapshot")
+        if not config or not config.serve:
+            return self.vector_store()
+        if not os.path.exists(config.path):
+            logging.warning(f"No vector snapshot at {config.path}; searching the vector store")
+            return self.vector_store()
+        return self._load("snapshot", lambda: VectorStoreLoader(self.config).load_snapshot(self.embeddings()))
+
+    def _searches_local_files(self) -> bool:
+        config = self.config.get("snapshot")
+        if config and config.serve and os.path.exists(config.path):
+            return True
+        return self.config.data_ingestion.get("vector_backend", "pinecone") == "local"
+
+    def preload(self):
+        """Load the fork-safe components without calling them; run before forking workers."""
+        self.embeddings()
+        if self._searches_local_files():
+            self.search_store()
+
+    def _timed(self, name: str, action: Callable):
+        started = time.perf_counter()
+        try:
+            action()
+        except Exception as e:
+            logging.warning(f"Warmup of {name} failed: {e}")
+        self.timings[f"warmup_{name}"] = time.perf_counter() - started
+
+    def warmup(self):
+        """Run a dummy request through each component so the first real request does not pay for it."""
+        try:
+            config = self.config.get("startup", {})
+            self._timed("embeddings", lambda: self.embeddings().embed_query("warmup"))
+            self._timed("vector_store", lambda: self.search_store().similarity_search("warmup", k=1))
+            if config.get("warmup_llm", False):
+                self._timed("llm", lambda: self.llm().invoke("Reply with OK."))
+        except Exception as e:
+            raise RAGException(f"Error warming up models: {e}", sys)
+
+    def startup_report(self) -> dict:
+        report = {name: round(seconds, 3) for name, seconds in self.timings.items()}
+        report["since_process_start"] = round(time.perf_counter() - PROCESS_STARTED, 3)
+        report["pid"] = os.getpid()
+        return report
+
+    def log_startup_report(self):
+        logging.info(f"Startup report: {self.startup_report()}")
@@ -0,0 +1,123 @@
+import re
+from typing import Dict, List, Set
+
+from langchain_core.documents import Document
+
+from rag.logging.logger import logging
+from utils.tokens import count_tokens
+
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+|\s*\n+\s*")
+_WORD_RE = re.compile(r"[a-z0-9]+")
+# Flipkart exports cut long reviews off with these markers.
+_TRUNCATION_RE = re.compile(r"\s*(?:\.{3}|…)?\s*(?:READ MORE)?\s*$")
+
+
+def _words(text: str) -> Set[str]:
+    return set(_WORD_RE.findall(text.lower()))
+
+
+class ContextPacker:
+    """
+    Fits retrieved reviews into a fixed token budget before the QA prompt.
+
+    Passages keep their retrieval order. Each is cut down to its sentences
+    that best overlap the question, passages mostly contained in an earlier
+    one are dropped, and what fits in the budget is grouped into one
+    document per product under a short metadata header.
+    """
+
+    def __init__(self, max_tokens: int = 1200, max_passage_tokens: int = 200,
+                 overlap_threshold: float = 0.8, enabled: bool = True):
+        self.max_tokens = max_tokens
+        self.max_passage_tokens = max_passage_tokens
+        self.overlap_threshold = overlap_threshold
+        self.enabled = enabled
+
+    def trim(self, text: str, question_words: Set[str], max_tokens: int) -> str:
+        """Keep the sentences sharing most words with the question, in their original order."""
+        text = _TRUNCATION_RE.sub("", str(text)).strip()
+        if count_tokens(text) <= max_tokens:
+            return text
+        sentences = [sentence for sentence in _SENTENCE_RE.split(text) if sentence]
+        ranked = sorted(
+            range(len(sentences)),
+            key=lambda i: (len(_words(sentences[i]) & question_words), -i),
+            reverse=True,
+        )
+        kept, used = set(), 0
+        for i in ranked:
+            cost = count_tokens(sentences[i]) + 1
+            if used + cost <= max_tokens:
+                kept.add(i)
+                used += cost
+        if not kept:
+            # A single run-on sentence longer than the cap: cut it at a word boundary.
+            return text[:max_tokens * 4].rsplit(" ", 1)[0]
+        return " ".join(sentences[i] for i in sorted(kept))
+
+    @staticmethod
+    def header(metadata: dict) -> str:
+        name = metadata.get("product_name") or "Other products"
+        return f"Product: {name}"
+
+    @staticmethod
+    def snippet(metadata: dict, text: str) -> str:
+        parts = []
+        if metadata.get("product_rating") is not None:
+            parts.append(f"{metadata['product_rating']}/5")
+        if metadata.get("product_summary"):
+            parts.append(f"\"{metadata['product_summary']}\"")
+        if metadata.get("duplicate_count", 1) > 1:
+            parts.append(f"({metadata['duplicate_count']} similar reviews)")
+        prefix = " ".join(parts)
+        return f"- {prefix}: {text}" if prefix else f"- {text}"
+
+    def pack(self, question: str, documents: List[Document]) -> List[Document]:
+        if not self.enabled or not documents:
+            return documents
+
+        question_words = _words(question)
+        groups: Dict[str, List[str]] = {}
+        group_metadata: Dict[str, dict] = {}
+        kept_words: List[Set[str]] = []
+        used = skipped = 0
+
+        for doc in documents:
+            text = self.trim(doc.page_content, question_words, self.max_passage_tokens)
+            words = _words(text)
+            if not words or any(
+                len(words & other) / len(words) >= self.overlap_threshold for other in kept_words
+            ):
+                skipped += 1
+                continue
+
+            key = str(doc.metadata.get("product_id") or doc.metadata.get("product_name") or "")
+            line = self.snippet(doc.metadata, text)
+            cost = count_tokens(line) + (0 if key in groups else count_tokens(self.header(doc.metadata)) + 1)
+            if used + cost > self.max_tokens:
+                if used:
+                    skipped += 1
+                    continue
+                # Always keep the best passage, cut to whatever the budget allows.
+                line = self.snippet(doc.metadata, self.trim(text, question_words, self.max_tokens // 2))
+                cost = count_tokens(line) + count_tokens(self.header(doc.metadata)) + 1
+
+            groups.setdefault(key, []).append(line)
+            group_metadata.setdefault(key, doc.metadata)
+            kept_words.append(words)
+            used += cost
+
+        logging.info(
+            f"Packed {len(documents) - skipped} of {len(documents)} passages into "
+            f"{used}/{self.max_tokens} context tokens"
+        )
+        return [
+            Document(
+                page_content="\n".join([self.header(group_metadata[key])] + lines),
+                metadata={
+                    "product_id": group_metadata[key].get("product_id"),
+                    "product_name": group_metadata[key].get("product_name"),
+                },
+            )
+            for key, lines in groups.items()
+        ]
@@ -1,24 +1,136 @@
-from langchain_core.chat_history import BaseChatMessageHistory, InMemoryChatMessageHistory
-from langchain_core.runnables.history import RunnableWithMessageHistory
+import asyncio
+import hashlib
+import json
+import weakref
+from typing import AsyncIterator, Awaitable, Callable, List, Optional, Tuple
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.documents import Document
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, get_buffer_string
+from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from rag.prompts.prompt import PROMPT_TEMPLATES, RETRIEVER_PROMPT
-from langchain.chains import create_retrieval_chain, create_history_aware_retriever
+from rag.prompts.prompt import PROMPT_TEMPLATES, RETRIEVER_PROMPT, SUMMARY_PROMPT
 from langchain.chains.combine_documents import create_stuff_documents_chain
-from rag.model_loaders.model_loader import ModelLoader
+from rag.cache.answer_cache import AnswerCache
+from rag.cache.embedding_cache import CachedEmbeddings
+from rag.cache.single_flight import SingleFlight
+from rag.logging.logger import logging
+from rag.metrics.metrics import REGISTRY, TOKENS_TOTAL, span
+from rag.model_loaders.model_registry import ModelRegistry
+from rag.model_with_memory.context_packer import ContextPacker
+from rag.model_with_memory.rewrite_policy import RewritePolicy, normalize_question
+from rag.model_with_memory.session_store import load_session_store
 from rag.retriever.data_retriever import DataRetriever
-
-# Global store for session chat history
-store = {}
+from utils.tokens import count_tokens
 
 class ChatHistory:
     def __init__(self):
-        self.model_loader = ModelLoader()
+        self.registry = ModelRegistry.get()
+        self.config = self.registry.config
         self.retriever = DataRetriever()
+        self.llm = self.registry.llm()
+        self.answer_cache = self._load_answer_cache()
+        self.session_store = load_session_store(self.config.session)
+        self.rewrite_policy = RewritePolicy(**self.config.rewrite)
+        self.context_packer = ContextPacker(**self.config.get("context", {}))
+        self.single_flight = SingleFlight() if self.config.get("coalescing", {}).get("enabled", False) else None
+        self._retrieval_fingerprint = self._fingerprint_retrieval_config()
+        self._background_tasks = set()
+        self._compaction_locks = weakref.WeakValueDictionary()
+
+        # Build the chains once and reuse them for every turn; only the
+        # session history changes between requests.
+        self.rewrite_chain, self.qa_chain = self.chain()
+        self.summary_chain = (
+            ChatPromptTemplate.from_template(SUMMARY_PROMPT) | self.llm | StrOutputParser()
+            if self.config.session.summarize else None
+        )
+        self.retriever.load_retriever()
+        REGISTRY.register_collector(self._cache_metrics)
+
+    def _cache_metrics(self):
+        """Hit and miss counts of the answer, embedding and rerank caches, and coalesced requests, for /metrics."""
+        caches = {
+            "answer": self.answer_cache,
+            "embedding": self.retriever.embeddings if isinstance(self.retriever.embeddings, CachedEmbeddings) else None,
+            "rerank": self.retriever.reranker,
+        }
+        for name, cache in caches.items():
+            if cache is None:
+                continue
+            if name == "embedding":
+                stats = cache.stats()
+                hits, misses = stats["memory_hits"] + stats["disk_hits"], stats["misses"]
+            else:
+                hits, misses = cache.hits, cache.misses
+            for result, value in (("hit", hits), ("miss", misses)):
+                yield "rag_cache_lookups_total", "counter", "Cache lookups by cache and result.", \
+                    {"cache": name, "result": result}, value
+
+        if self.single_flight is not None:
+            for role, value in (("leader", self.single_flight.leaders), ("follower", self.single_flight.followers)):
+                yield "rag_coalesced_requests_total", "counter", \
+                    "Answer-cache misses by whether they ran retrieval and generation or shared another request's.", \
+                    {"role": role}, value
+
+    def _fingerprint_retrieval_config(self) -> str:
+        """Digest of every setting that changes what is retrieved or put in the prompt."""
+        sections = {name: self.config.get(name) for name in ("retriever", "reranker", "context")}
+        return hashlib.sha1(json.dumps(sections, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:12]
+
+    def _flight_key(self, kind: str, standalone_question: str, session_id: str,
+                    chat_history: List[BaseMessage]) -> str:
+        # The answer prompt includes the history, so turns with history only share within their session.
+        scope = session_id if chat_history else ""
+        return f"{kind}:{self._retrieval_fingerprint}:{scope}:{normalize_question(standalone_question)}"
+
+    def _load_answer_cache(self) -> Optional[AnswerCache]:
+        cache_config = self.config.get("answer_cache")
+        if not cache_config or not cache_config.enabled:
+            return None
+        return AnswerCache(
+            similarity_threshold=cache_config.similarity_threshold,
+            ttl_seconds=cache_config.ttl_seconds,
+            max_entries=cache_config.max_entries,
+            version_path=cache_config.version_path,
+        )
 
     def get_session_history(self, session_id: str) -> BaseChatMessageHistory:
-        if session_id not in store:
-            store[session_id] = InMemoryChatMessageHistory()
-        return store[session_id]
+        return self.session_store.get_history(session_id)
+
+    async def _arecord_turn(self, session_id: str, query: str, answer: str):
+        """Append the turn and compact the session in the background once it outgrows the window."""
+        await self.session_store.aappend(session_id, [HumanMessage(content=query), AIMessage(content=answer)])
+        task = asyncio.get_running_loop().create_task(self._acompact_session(session_id))
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+
+    def _compaction_lock(self, session_id: str) -> asyncio.Lock:
+        lock = self._compaction_locks.get(session_id)
+        if lock is None:
+            lock = self._compaction_locks[session_id] = asyncio.Lock()
+        return lock
+
+    async def _acompact_session(self, session_id: str):
+        # One compaction per session at a time: a second one waits and then
+        # works from the summary and messages the first left behind.
+        async with self._compaction_lock(session_id):
+            overflow, through_seq = await self.session_store.aoverflow(session_id)
+            if not overflow:
+                return
+            if self.summary_chain is None:
+                await self.session_store.aset_summary(session_id, "", through_seq)
+                return
+            # Summarise a few turns at a time rather than on every message.
+            if len(overflow) < self.config.session.summary_trigger_messages:
+                return
+            try:
+                summary = await self.summary_chain.ainvoke({
+                    "summary": await self.session_store.aget_summary(session_id) or "(none)",
+                    "conversation": get_buffer_string(overflow),
+                })
+                await self.session_store.aset_summary(session_id, summary, through_seq)
+            except Exception as e:
+                logging.warning(f"Could not summarise session {session_id}: {e}")
 
     def chain(self):
         contextualize_q_prompt = ChatPromptTemplate.from_messages([
@@ -26,47 +138,187 @@ class ChatHistory:
             MessagesPlaceholder(variable_name="chat_history"),
             ("human", "{input}"),
         ])
-        
-        history_aware_retriever = create_history_aware_retriever(
-            self.model_loader.load_llm(),
-            self.retriever.load_retriever(),
-            contextualize_q_prompt
-        )
-        
+
+        rewrite_chain = contextualize_q_prompt | self.llm | StrOutputParser()
+
         qa_prompt = ChatPromptTemplate.from_messages([
             ("system", PROMPT_TEMPLATES),
             MessagesPlaceholder("chat_history"),
             ("human", "{input}"),
         ])
-        
+
         question_answer_chain = create_stuff_documents_chain(
-            self.model_loader.load_llm(), qa_prompt
+            self.llm, qa_prompt
         )
-        
-        rag_chain = create_retrieval_chain(history_aware_retriever, question_answer_chain)
-        return rag_chain
+
+        return rewrite_chain, question_answer_chain
+
+    async def _astandalone_question(self, query: str,
+                                    chat_history: List[BaseMessage]) -> Tuple[str, Optional[asyncio.Task]]:
+        """
+        Rewrite a follow-up into a standalone question when the rewrite policy
+        asks for it. While the rewrite runs, retrieval for the raw query is
+        started speculatively; the task is returned so the caller can use it if
+        the rewrite turns out not to change the question.
+        """
+        if not self.rewrite_policy.needs_rewrite(query, chat_history):
+            return query, None
+
+        speculative = None
+        if self.rewrite_policy.speculative_retrieval:
+            speculative = asyncio.create_task(self.retriever.acall_retriever(query))
+        try:
+            with span("rewrite"):
+                standalone_question = await self.rewrite_chain.ainvoke({"input": query, "chat_history": chat_history})
+        except BaseException:
+            if speculative is not None:
+                speculative.cancel()
+            raise
+        return standalone_question, speculative
+
+    async def _aretrieve(self, query: str, standalone_question: str,
+                         speculative: Optional[asyncio.Task]) -> List[Document]:
+        with span("retrieve"):
+            if speculative is not None:
+                if normalize_question(standalone_question) == normalize_question(query):
+                    return await speculative
+                speculative.cancel()
+            return await self.retriever.acall_retriever(standalone_question)
+
+    async def _acached_answer(self, standalone_question: str) -> Tuple[Optional[str], Optional[List[float]]]:
+        """Look the standalone question up in the answer cache, returning (answer, embedding)."""
+        if self.answer_cache is None:
+            return None, None
+        with span("answer_cache"):
+            query_vector = await self.retriever.embeddings.aembed_query(standalone_question)
+            return self.answer_cache.lookup(query_vector), query_vector
+
+    def pack_context(self, standalone_question: str, documents: List[Document],
+                      chat_history: List[BaseMessage]) -> List[Document]:
+        with span("pack_context"):
+            context = self.context_packer.pack(standalone_question, documents)
+        TOKENS_TOTAL.inc(sum(count_tokens(doc.page_content) for doc in context), kind="context")
+        TOKENS_TOTAL.inc(sum(count_tokens(str(message.content)) for message in chat_history), kind="history")
+        return context
 
     def get_response(self, query: str, session_id: str) -> str:
-        rag_chain = self.chain()
-
-        conversational_rag_chain = RunnableWithMessageHistory(
-            rag_chain,
-            self.get_session_history,
-            input_messages_key="input",
-            history_messages_key="chat_history",
-            output_messages_key="answer",
-        )
+        return asyncio.run(self.aget_response(query, session_id))
 
-        result = conversational_rag_chain.invoke(
-            {"input": query},
-            config={"configurable": {"session_id": session_id}},
-        )
+    async def _agenerate(self, query: str, standalone_question: str, speculative: Optional[asyncio.Task],
+                         chat_history: List[BaseMessage], query_vector: Optional[List[float]]) -> str:
+        documents = await self._aretrieve(query, standalone_question, speculative)
+        context = self.pack_context(standalone_question, documents, chat_history)
+        with span("generate"):
+            answer = await self.qa_chain.ainvoke(
+                {"input": query, "chat_history": chat_history, "context": context}
+            )
+        TOKENS_TOTAL.inc(count_tokens(answer), kind="answer")
+        if query_vector is not None:
+            self.answer_cache.store(query_vector, answer)
+        return answer
+
+    async def _acoalesced(self, flight_key: str, speculative: Optional[asyncio.Task],
+                          generate: Callable[[], Awaitable[str]]) -> str:
+        """
+        Run generate(), or wait for the identical call already in flight.
+        Like a cache hit, a shared answer is the one produced for whichever
+        turn asked first.
+        """
+        if self.single_flight is None:
+            return await generate()
+        answer, shared = await self.single_flight.do(flight_key, generate)
+        if shared and speculative is not None:
+            speculative.cancel()
+        return answer
+
+    async def aget_response(self, query: str, session_id: str) -> str:
+        chat_history = await self.session_store.awindow(session_id)
+
+        standalone_question, speculative = await self._astandalone_question(query, chat_history)
+        answer, query_vector = await self._acached_answer(standalone_question)
+
+        # A cache hit skips both retrieval and generation.
+        if answer is None:
+            flight_key = self._flight_key("answer", standalone_question, session_id, chat_history)
+            answer = await self._acoalesced(flight_key, speculative, lambda: self._agenerate(
+                query, standalone_question, speculative, chat_history, query_vector
+            ))
+        elif speculative is not None:
+            speculative.cancel()
+
+        await self._arecord_turn(session_id, query, answer)
+        return answer
+
+    async def _astream_generate(self, query: str, standalone_question: str, speculative: Optional[asyncio.Task],
+                                chat_history: List[BaseMessage],
+                                query_vector: Optional[List[float]]) -> AsyncIterator[Tuple[str, dict]]:
+        documents = await self._aretrieve(query, standalone_question, speculative)
+        yield "retrieval", {"documents": len(documents), "cached": False}
+
+        context = self.pack_context(standalone_question, documents, chat_history)
+        answer = ""
+        # The span covers the whole stream, including time the client takes to read it.
+        with span("generate"):
+            async for token in self.qa_chain.astream(
+                {"input": query, "chat_history": chat_history, "context": context}
+            ):
+                if token:
+                    answer += token
+                    yield "token", {"token": token}
+        TOKENS_TOTAL.inc(count_tokens(answer), kind="answer")
+        if query_vector is not None:
+            self.answer_cache.store(query_vector, answer)
+
+    async def _astream_coalesced(self, session_id: str, query: str, standalone_question: str,
+                                 speculative: Optional[asyncio.Task], chat_history: List[BaseMessage],
+                                 query_vector: Optional[List[float]]) -> AsyncIterator[Tuple[str, dict]]:
+        """Stream a generation, joining an identical stream already in flight from its first event."""
+        def generate():
+            return self._astream_generate(query, standalone_question, speculative, chat_history, query_vector)
+
+        if self.single_flight is None:
+            async for event in generate():
+                yield event
+            return
+        cancelled_speculative = False
+        flight_key = self._flight_key("stream", standalone_question, session_id, chat_history)
+        async for event, shared in self.single_flight.stream(flight_key, generate):
+            if shared and speculative is not None and not cancelled_speculative:
+                speculative.cancel()
+                cancelled_speculative = True
+            yield event
+
+    async def astream_response(self, query: str, session_id: str) -> AsyncIterator[Tuple[str, dict]]:
+        """
+        Stream a turn as (event, payload) pairs: one "retrieval" event once the
+        context documents are known, then "token" events for the answer and a
+        final "done" event. The session history is written when the stream ends.
+        """
+        chat_history = await self.session_store.awindow(session_id)
+
+        standalone_question, speculative = await self._astandalone_question(query, chat_history)
+        answer, query_vector = await self._acached_answer(standalone_question)
+
+        if answer is not None:
+            if speculative is not None:
+                speculative.cancel()
+            yield "retrieval", {"documents": 0, "cached": True}
+            yield "token", {"token": answer}
+        else:
+            answer = ""
+            async for event, payload in self._astream_coalesced(
+                session_id, query, standalone_question, speculative, chat_history, query_vector
+            ):
+                if event == "token":
+                    answer += payload["token"]
+                yield event, payload
 
-        return result["answer"]
+        await self._arecord_turn(session_id, query, answer)
+        yield "done", {"answer": answer}
 
 # if __name__ == "__main__":
 #     chathistory= ChatHistory()
 #     session_id = "session_1"
 #     query="show me best headphones"
 #     response = chathistory.get_response(query, session_id)
-#     print(response)
\ No newline at end of file
+#     print(response)
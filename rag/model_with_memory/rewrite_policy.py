@@ -0,0 +1,54 @@
+import re
+from typing import List
+
+from langchain_core.messages import BaseMessage
+
+# Words that usually point back at something said earlier in the conversation.
+REFERENCE_WORDS = {
+    "it", "its", "it's", "this", "that", "these", "those", "they", "them", "their",
+    "one", "ones", "same", "above", "previous", "former", "latter", "other", "another",
+    "he", "she", "him", "her", "there", "else",
+}
+
+FOLLOW_UP_PREFIXES = (
+    "and ", "also ", "what about", "how about", "which one", "compare", "then ", "so ",
+    "but ", "why ", "more ", "any other", "anything else",
+)
+
+_WORD_RE = re.compile(r"[a-z0-9']+")
+
+
+def normalize_question(question: str) -> str:
+    return " ".join(_WORD_RE.findall(question.lower()))
+
+
+class RewritePolicy:
+    """
+    Decides whether a turn needs the history-aware rewrite LLM call.
+
+    First turns never do. With ``mode: auto`` a follow-up is rewritten only
+    when it is short, starts like a follow-up, or refers back with a pronoun;
+    otherwise it is treated as standalone. ``always`` and ``never`` force the
+    decision either way.
+    """
+
+    def __init__(self, mode: str = "auto", speculative_retrieval: bool = True, min_standalone_words: int = 4):
+        if mode not in ("auto", "always", "never"):
+            raise ValueError(f"Unknown rewrite mode: {mode}")
+        self.mode = mode
+        self.speculative_retrieval = speculative_retrieval
+        self.min_standalone_words = min_standalone_words
+
+    def needs_rewrite(self, query: str, chat_history: List[BaseMessage]) -> bool:
+        if not chat_history or self.mode == "never":
+            return False
+        if self.mode == "always":
+            return True
+
+        normalized = normalize_question(query)
+        words = normalized.split()
+        if len(words) < self.min_standalone_words:
+            return True
+        if normalized.startswith(FOLLOW_UP_PREFIXES):
+            return True
+        return any(word in REFERENCE_WORDS for word in words)
@@ -0,0 +1,294 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import List, Optional, Sequence, Tuple
+
+from langchain_core.chat_history import BaseChatMessageHistory, InMemoryChatMessageHistory
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage, messages_from_dict, message_to_dict
+
+from utils.tokens import count_tokens
+
+
+class SessionStore(ABC):
+    """
+    Bounded store of per-session chat histories.
+
+    Only the most recent turns that fit in ``max_messages`` and ``max_tokens``
+    are sent to the LLM. Older messages are either dropped or, when a
+    summariser is used, folded into a rolling per-session summary, so both
+    server memory and per-turn prompt size stay bounded.
+
+    Every stored message has a sequence number that grows within a session,
+    so compaction can drop exactly the messages it summarised even when
+    newer ones arrived meanwhile.
+
+    The ``a``-prefixed methods are what the async request path calls; for
+    backends that do blocking I/O they run in a worker thread.
+    """
+
+    # Backends that touch disk or the network set this to keep their calls off the event loop.
+    blocking = False
+
+    def __init__(self, max_sessions: int = 10000, ttl_seconds: float = 86400,
+                 max_messages: int = 10, max_tokens: int = 1500):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.max_messages = max_messages
+        self.max_tokens = max_tokens
+
+    @abstractmethod
+    def get_history(self, session_id: str) -> BaseChatMessageHistory:
+        ...
+
+    @abstractmethod
+    def get_messages(self, session_id: str) -> List[Tuple[int, BaseMessage]]:
+        """Stored messages with their sequence numbers, oldest first."""
+
+    @abstractmethod
+    def get_summary(self, session_id: str) -> str:
+        ...
+
+    @abstractmethod
+    def set_summary(self, session_id: str, summary: str, through_seq: Optional[int]):
+        """Store a new summary and drop the messages up to ``through_seq``, which it now covers."""
+
+    def append(self, session_id: str, messages: Sequence[BaseMessage]):
+        self.get_history(session_id).add_messages(messages)
+
+    def _split(self, messages: Sequence[BaseMessage]) -> Tuple[List[BaseMessage], List[BaseMessage]]:
+        """Split messages into (older overflow, recent window within the budgets)."""
+        window = []
+        tokens = 0
+        for message in reversed(messages):
+            message_tokens = count_tokens(message.content)
+            if len(window) >= self.max_messages or tokens + message_tokens > self.max_tokens:
+                break
+            window.append(message)
+            tokens += message_tokens
+        window.reverse()
+
+        # Start the window on a user turn so the LLM never sees a dangling answer.
+        while window and not isinstance(window[0], HumanMessage):
+            window.pop(0)
+        return list(messages[:len(messages) - len(window)]), window
+
+    def window(self, session_id: str) -> List[BaseMessage]:
+        """Messages to send to the LLM: the summary, if any, then the recent window."""
+        _, recent = self._split([message for _, message in self.get_messages(session_id)])
+        summary = self.get_summary(session_id)
+        if summary:
+            return [SystemMessage(content=f"Summary of the earlier conversation: {summary}"), *recent]
+        return recent
+
+    def overflow(self, session_id: str) -> Tuple[List[BaseMessage], Optional[int]]:
+        """Stored messages that no longer fit in the window, and the sequence number of the last one."""
+        entries = self.get_messages(session_id)
+        older, _ = self._split([message for _, message in entries])
+        return older, entries[len(older) - 1][0] if older else None
+
+    async def _arun(self, method, *args):
+        if self.blocking:
+            return await asyncio.to_thread(method, *args)
+        return method(*args)
+
+    async def awindow(self, session_id: str) -> List[BaseMessage]:
+        return await self._arun(self.window, session_id)
+
+    async def aoverflow(self, session_id: str) -> Tuple[List[BaseMessage], Optional[int]]:
+        return await self._arun(self.overflow, session_id)
+
+    async def aappend(self, session_id: str, messages: Sequence[BaseMessage]):
+        await self._arun(self.append, session_id, messages)
+
+    async def aget_summary(self, session_id: str) -> str:
+        return await self._arun(self.get_summary, session_id)
+
+    async def aset_summary(self, session_id: str, summary: str, through_seq: Optional[int]):
+        await self._arun(self.set_summary, session_id, summary, through_seq)
+
+
+class InMemorySessionStore(SessionStore):
+    """Process-local sessions with LRU eviction beyond max_sessions and idle expiry after ttl_seconds."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._sessions: "OrderedDict[str, list]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _evict(self, now: float):
+        while self._sessions and len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+        while self._sessions:
+            oldest_id, oldest = next(iter(self._sessions.items()))
+            if now - oldest[2] <= self.ttl_seconds:
+                break
+            del self._sessions[oldest_id]
+
+    def _session(self, session_id: str) -> list:
+        now = time.time()
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                # [history, summary, last access, sequence number of the first message]
+                session = [InMemoryChatMessageHistory(), "", now, 0]
+                self._sessions[session_id] = session
+            session[2] = now
+            self._sessions.move_to_end(session_id)
+            self._evict(now)
+            return session
+
+    def get_history(self, session_id: str) -> BaseChatMessageHistory:
+        return self._session(session_id)[0]
+
+    def get_messages(self, session_id: str) -> List[Tuple[int, BaseMessage]]:
+        history, _, _, first_seq = self._session(session_id)
+        return list(enumerate(history.messages, start=first_seq))
+
+    def get_summary(self, session_id: str) -> str:
+        return self._session(session_id)[1]
+
+    def set_summary(self, session_id: str, summary: str, through_seq: Optional[int]):
+        session = self._session(session_id)
+        session[1] = summary
+        if through_seq is not None:
+            dropped = max(through_seq - session[3] + 1, 0)
+            session[0].messages = session[0].messages[dropped:]
+            session[3] += dropped
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+
+class SQLiteChatMessageHistory(BaseChatMessageHistory):
+    """Chat history rows for one session in a SQLiteSessionStore."""
+
+    def __init__(self, store: "SQLiteSessionStore", session_id: str):
+        self.store = store
+        self.session_id = session_id
+
+    @property
+    def messages(self) -> List[BaseMessage]:
+        rows = self.store._execute(
+            "SELECT message FROM messages WHERE session_id = ? ORDER BY seq", (self.session_id,)
+        )
+        return messages_from_dict([json.loads(row[0]) for row in rows])
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        self.store.append(self.session_id, messages)
+
+    def clear(self) -> None:
+        self.store._execute("DELETE FROM messages WHERE session_id = ?", (self.session_id,))
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Sessions in a SQLite file so several uvicorn workers on one host share
+    them. Reads never write: a session's last access is the time of its last
+    appended turn. Eviction runs at most once a minute, on append, and
+    removes idle sessions and the least recently used ones beyond
+    max_sessions.
+    """
+
+    EVICTION_INTERVAL_SECONDS = 60
+    blocking = True
+
+    def __init__(self, path: str, **kwargs):
+        super().__init__(**kwargs)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "session_id TEXT PRIMARY KEY, summary TEXT NOT NULL DEFAULT '', last_access REAL NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS messages ("
+            "seq INTEGER PRIMARY KEY AUTOINCREMENT, session_id TEXT NOT NULL, message TEXT NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS messages_session ON messages (session_id, seq)")
+        self._db.commit()
+        self._last_eviction = 0.0
+
+    def _execute(self, sql: str, params: tuple = ()) -> list:
+        with self._lock:
+            rows = self._db.execute(sql, params).fetchall()
+            self._db.commit()
+            return rows
+
+    def _executemany(self, sql: str, params: list):
+        with self._lock:
+            self._db.executemany(sql, params)
+            self._db.commit()
+
+    def append(self, session_id: str, messages: Sequence[BaseMessage]):
+        now = time.time()
+        with self._lock:
+            self._db.executemany(
+                "INSERT INTO messages (session_id, message) VALUES (?, ?)",
+                [(session_id, json.dumps(message_to_dict(message))) for message in messages],
+            )
+            self._db.execute(
+                "INSERT INTO sessions (session_id, last_access) VALUES (?, ?) "
+                "ON CONFLICT(session_id) DO UPDATE SET last_access = excluded.last_access",
+                (session_id, now),
+            )
+            self._db.commit()
+        if now - self._last_eviction > self.EVICTION_INTERVAL_SECONDS:
+            self._last_eviction = now
+            self._evict(now)
+
+    def _evict(self, now: float):
+        expired = self._execute(
+            "SELECT session_id FROM sessions WHERE last_access < ?", (now - self.ttl_seconds,)
+        )
+        expired += self._execute(
+            "SELECT session_id FROM sessions ORDER BY last_access DESC LIMIT -1 OFFSET ?", (self.max_sessions,)
+        )
+        if expired:
+            ids = [(row[0],) for row in expired]
+            self._executemany("DELETE FROM messages WHERE session_id = ?", ids)
+            self._executemany("DELETE FROM sessions WHERE session_id = ?", ids)
+
+    def get_history(self, session_id: str) -> BaseChatMessageHistory:
+        return SQLiteChatMessageHistory(self, session_id)
+
+    def get_messages(self, session_id: str) -> List[Tuple[int, BaseMessage]]:
+        rows = self._execute(
+            "SELECT seq, message FROM messages WHERE session_id = ? ORDER BY seq", (session_id,)
+        )
+        messages = messages_from_dict([json.loads(row[1]) for row in rows])
+        return [(row[0], message) for row, message in zip(rows, messages)]
+
+    def get_summary(self, session_id: str) -> str:
+        rows = self._execute("SELECT summary FROM sessions WHERE session_id = ?", (session_id,))
+        return rows[0][0] if rows else ""
+
+    def set_summary(self, session_id: str, summary: str, through_seq: Optional[int]):
+        with self._lock:
+            self._db.execute("UPDATE sessions SET summary = ? WHERE session_id = ?", (summary, session_id))
+            if through_seq is not None:
+                self._db.execute(
+                    "DELETE FROM messages WHERE session_id = ? AND seq <= ?", (session_id, through_seq)
+                )
+            self._db.commit()
+
+
+def load_session_store(config) -> SessionStore:
+    """Build the session store described by the ``session`` config section."""
+    limits = dict(
+        max_sessions=config.max_sessions,
+        ttl_seconds=config.ttl_seconds,
+        max_messages=config.max_messages,
+        max_tokens=config.max_tokens,
+    )
+    if config.backend == "sqlite":
+        return SQLiteSessionStore(config.sqlite_path, **limits)
+    if config.backend == "memory":
+        return InMemorySessionStore(**limits)
+    raise ValueError(f"Unknown session backend: {config.backend}")
@@ -16,3 +16,12 @@ RETRIEVER_PROMPT = (
     "formulate a standalone question which can be understood without the chat history. "
     "Do NOT answer the question, just reformulate it if needed and otherwise return it as is."
 )
+
+# Used to fold turns that fell out of the history window into a rolling summary
+SUMMARY_PROMPT = (
+    "Summarize the conversation between a customer and a product support assistant below. "
+    "Extend the existing summary with the new messages, keep product names, ratings and the "
+    "customer's preferences, and stay under 120 words.\n\n"
+    "Existing summary: {summary}\n\n"
+    "New messages:\n{conversation}"
+)
@@ -0,0 +1,175 @@
+import json
+import mmap
+import os
+import re
+import shutil
+import sys
+from typing import List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from rag.exception.exception import RAGException
+from rag.logging.logger import logging
+from rag.vector_store.filters import matches_filter
+
+# Keep alphanumeric runs together so model numbers like "235v2" stay one token.
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall(str(text).lower())
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class BM25Builder:
+    """
+    Accumulates documents during ingestion and writes a BM25Index.
+
+    Postings are collected as flat numpy chunks of (term, doc, tf) and
+    sorted into CSR form once at save time, which keeps the build cheap even
+    for a million reviews.
+    """
+
+    def __init__(self, index_dir: str):
+        self.index_dir = index_dir
+        self.tmp_dir = index_dir + ".tmp"
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+        os.makedirs(self.tmp_dir)
+        self.vocabulary = {}
+        self.doc_lengths = []
+        self._terms, self._docs, self._tfs = [], [], []
+        self._documents = open(os.path.join(self.tmp_dir, BM25Index.DOCUMENTS_FILE), "wb")
+        self._offsets = [0]
+
+    def add(self, document: Document):
+        doc = len(self.doc_lengths)
+        tokens = tokenize(document.page_content) + tokenize(document.metadata.get("product_name", ""))
+        term_ids = np.fromiter(
+            (self.vocabulary.setdefault(token, len(self.vocabulary)) for token in tokens),
+            dtype=np.int32, count=len(tokens),
+        )
+        terms, tfs = np.unique(term_ids, return_counts=True)
+        self._terms.append(terms)
+        self._docs.append(np.full(len(terms), doc, dtype=np.int32))
+        self._tfs.append(tfs.astype(np.uint16))
+        self.doc_lengths.append(len(tokens))
+
+        record = {"id": document.id, "page_content": document.page_content, "metadata": document.metadata}
+        line = json.dumps(record, default=_json_default).encode("utf-8") + b"\n"
+        self._documents.write(line)
+        self._offsets.append(self._offsets[-1] + len(line))
+
+    def save(self):
+        try:
+            self._documents.close()
+            terms = np.concatenate(self._terms) if self._terms else np.zeros(0, dtype=np.int32)
+            docs = np.concatenate(self._docs) if self._docs else np.zeros(0, dtype=np.int32)
+            tfs = np.concatenate(self._tfs) if self._tfs else np.zeros(0, dtype=np.uint16)
+            order = np.argsort(terms, kind="stable")
+            term_offsets = np.zeros(len(self.vocabulary) + 1, dtype=np.int64)
+            term_offsets[1:] = np.cumsum(np.bincount(terms, minlength=len(self.vocabulary)))
+
+            np.savez(
+                os.path.join(self.tmp_dir, BM25Index.POSTINGS_FILE),
+                term_offsets=term_offsets,
+                docs=docs[order],
+                tfs=tfs[order],
+                doc_lengths=np.asarray(self.doc_lengths, dtype=np.int32),
+            )
+            np.save(os.path.join(self.tmp_dir, BM25Index.OFFSETS_FILE), np.asarray(self._offsets, dtype=np.int64))
+            with open(os.path.join(self.tmp_dir, BM25Index.VOCABULARY_FILE), "w") as f:
+                json.dump(self.vocabulary, f)
+
+            shutil.rmtree(self.index_dir, ignore_errors=True)
+            os.replace(self.tmp_dir, self.index_dir)
+            logging.info(
+                f"BM25 index saved to {self.index_dir}: {len(self.doc_lengths)} documents, "
+                f"{len(self.vocabulary)} terms, {len(docs)} postings"
+            )
+        except Exception as e:
+            raise RAGException(f"Error saving BM25 index: {e}", sys)
+
+
+class BM25Index:
+    """Okapi BM25 over the review corpus, searched with numpy over CSR postings."""
+
+    POSTINGS_FILE = "postings.npz"
+    VOCABULARY_FILE = "vocabulary.json"
+    DOCUMENTS_FILE = "documents.jsonl"
+    OFFSETS_FILE = "offsets.npy"
+
+    def __init__(self, index_dir: str, k1: float = 1.2, b: float = 0.75):
+        try:
+            with open(os.path.join(index_dir, self.VOCABULARY_FILE)) as f:
+                self.vocabulary = json.load(f)
+            postings = np.load(os.path.join(index_dir, self.POSTINGS_FILE))
+            self.term_offsets = postings["term_offsets"]
+            self.docs = postings["docs"]
+            self.tfs = postings["tfs"].astype(np.float32)
+            doc_lengths = postings["doc_lengths"].astype(np.float32)
+            self.offsets = np.load(os.path.join(index_dir, self.OFFSETS_FILE), mmap_mode="r")
+            self._documents = None
+            if len(doc_lengths):
+                with open(os.path.join(index_dir, self.DOCUMENTS_FILE), "rb") as f:
+                    self._documents = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception as e:
+            raise RAGException(f"Error loading BM25 index: {e}", sys)
+
+        self.k1 = k1
+        self.count = len(doc_lengths)
+        average_length = doc_lengths.mean() if self.count else 1.0
+        # Per-document part of the BM25 denominator, precomputed once.
+        self.length_norm = k1 * (1 - b + b * doc_lengths / average_length)
+        document_frequency = np.diff(self.term_offsets).astype(np.float32)
+        self.idf = np.log(1 + (self.count - document_frequency + 0.5) / (document_frequency + 0.5))
+        logging.info(f"BM25 index loaded from {index_dir} with {self.count} documents")
+
+    @classmethod
+    def load_if_exists(cls, index_dir: str) -> Optional["BM25Index"]:
+        if not os.path.exists(os.path.join(index_dir, cls.POSTINGS_FILE)):
+            logging.warning(f"No BM25 index at {index_dir}, using dense retrieval only")
+            return None
+        return cls(index_dir)
+
+    def get_document(self, doc: int) -> Document:
+        record = json.loads(self._documents[int(self.offsets[doc]):int(self.offsets[doc + 1])])
+        return Document(id=record["id"], page_content=record["page_content"], metadata=record["metadata"])
+
+    def search(self, query: str, k: int, filter: Optional[dict] = None,
+               filter_fetch_factor: int = 20) -> List[Tuple[Document, float]]:
+        """
+        Top-k documents for the query. With a metadata filter the best
+        ``k * filter_fetch_factor`` candidates are checked in score order.
+        """
+        term_ids = {self.vocabulary[token] for token in tokenize(query) if token in self.vocabulary}
+        if not term_ids or not self.count:
+            return []
+
+        scores = np.zeros(self.count, dtype=np.float32)
+        for term in term_ids:
+            start, end = self.term_offsets[term], self.term_offsets[term + 1]
+            docs = self.docs[start:end]
+            tfs = self.tfs[start:end]
+            scores[docs] += self.idf[term] * tfs * (self.k1 + 1) / (tfs + self.length_norm[docs])
+
+        fetch_k = k * filter_fetch_factor if filter else k
+        candidates = np.flatnonzero(scores)
+        if len(candidates) > fetch_k:
+            candidates = candidates[np.argpartition(-scores[candidates], fetch_k)[:fetch_k]]
+        candidates = candidates[np.argsort(-scores[candidates])]
+
+        results = []
+        for doc in candidates:
+            document = self.get_document(doc)
+            if filter and not matches_filter(document.metadata, filter):
+                continue
+            results.append((document, float(scores[doc])))
+            if len(results) == k:
+                break
+        return results
@@ -1,60 +1,155 @@
+import asyncio
 import os
-import sys
-import time
-from langchain_pinecone import PineconeVectorStore
-from pinecone import Pinecone, ServerlessSpec
-from rag.model_loaders.model_loader import ModelLoader
-from utils.config import read_yaml
-from rag.exception.exception import RAGException
+from rag.model_loaders.model_registry import ModelRegistry
+from rag.retriever.bm25 import BM25Index
+from rag.retriever.hybrid_retriever import HybridRetriever
+from rag.retriever.query_router import QueryRouter
+from rag.retriever.reranker import load_reranker
+from rag.data_ingestion.product_catalog import ProductCatalog
+from rag.vector_store.shards import ShardedVectorStore, load_category_classifier, load_shard_classifier
 from rag.logging.logger import logging
+from rag.metrics.metrics import span
 from langchain_core.documents import Document
-from typing import List
+from typing import List, Optional
 from rag.constant import CONFIG_FILE_PATH
-from dotenv import load_dotenv
-load_dotenv()
 
 class DataRetriever:
     """retrieving data from vector store"""
     def __init__(self,config_file_path=CONFIG_FILE_PATH):
-        self.config=read_yaml(config_file_path)
-        self.model_loader=ModelLoader()
-        self.embeddings=self.model_loader.load_embeddings()
+        self.registry=ModelRegistry.get(config_file_path)
+        self.config=self.registry.config
         self.vstore = None
         self.retriever = None
+        self.router = None
+        self.reranker = None
+        self.top_k = None
+        self._routing = False
+        self._catalog_version = None
+
+    @property
+    def embeddings(self):
+        return self.registry.embeddings()
 
     def load_retriever(self):
         if not self.vstore:
-            config=self.config.data_ingestion
-
-            pinecone_api_key = os.environ.get("PINECONE_API_KEY")
-            pc = Pinecone(api_key=pinecone_api_key)
-            index_name = config.index_name
-            existing_indexes = [index_info["name"] for index_info in pc.list_indexes()]
-
-            if index_name not in existing_indexes:
-                pc.create_index(
-                    name=index_name,
-                    dimension=config.dimension,
-                    metric=config.metric,
-                    spec=ServerlessSpec(cloud=config.cloud, region=config.region),
-                )
-                while not pc.describe_index(index_name).status[config.status]:
-                    time.sleep(1)
-                
-            index = pc.Index(index_name)
-            embeddings = self.embeddings
-            self.vstore = PineconeVectorStore(index=index, embedding=embeddings)
+            self.vstore = self.registry.search_store()
 
         if not self.retriever:
-            top_k =4
-            retriever = self.vstore.as_retriever(search_kwargs={"k": top_k})
-            print("Retriever loaded successfully.")
-            return retriever
-    
+            top_k = self.config.data_ingestion.top_k
+            config = self.config.retriever
+            # With a reranker the first stage over-fetches candidates for it to reorder.
+            self.reranker = load_reranker(self.config.get("reranker"), top_k)
+            if self.reranker is not None:
+                top_k = self.reranker.candidates
+            self.top_k = top_k
+            bm25 = BM25Index.load_if_exists(self.config.data_ingestion.bm25_index_dir) if config.hybrid else None
+            if bm25 is not None:
+                self.retriever = HybridRetriever(
+                    vectorstore=self.vstore,
+                    bm25=bm25,
+                    # Each leg fetches at least top_k, so a reranker gets all the candidates it asked for.
+                    dense_k=max(config.dense_k, top_k),
+                    sparse_k=max(config.sparse_k, top_k),
+                    dense_weight=config.dense_weight,
+                    sparse_weight=config.sparse_weight,
+                    rrf_k=config.rrf_k,
+                    top_k=top_k,
+                )
+            else:
+                self.retriever = self.vstore.as_retriever(search_kwargs={"k": top_k})
+            # Shard selection needs the catalog's product categories, so it routes even without product filters.
+            self._routing = bool(config.get("product_routing")) or isinstance(self.vstore, ShardedVectorStore)
+            if self._routing:
+                self._load_router()
+            logging.info("Retriever loaded successfully.")
+        return self.retriever
+
+    def _read_catalog_version(self):
+        try:
+            return os.stat(self.config.data_ingestion.product_catalog_path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _load_router(self):
+        """Build the query router over the product catalog as it is on disk now."""
+        self._catalog_version = self._read_catalog_version()
+        classifier = load_shard_classifier(self.config.get("sharding")) \
+            if isinstance(self.vstore, ShardedVectorStore) else None
+        catalog = ProductCatalog.load_if_exists(self.config.data_ingestion.product_catalog_path)
+        self.router = QueryRouter(
+            catalog, classifier=classifier, product_filters=bool(self.config.retriever.get("product_routing")),
+            categories=load_category_classifier(self.config.get("sharding")),
+        ) if catalog is not None else None
+
+    def _check_catalog_version(self):
+        # Ingestion replaces the catalog file, so a re-ingest shows up as a new mtime.
+        if self._routing and self._read_catalog_version() != self._catalog_version:
+            logging.info("Product catalog changed, reloading the query router")
+            self._load_router()
+
+    def _enough(self, output: List[Document]) -> bool:
+        return len(output) >= self.config.retriever.get("min_filtered_results", 1)
+
+    def _rerank(self, query: str, output: List[Document]) -> List[Document]:
+        if self.reranker is None:
+            return output
+        with span("rerank"):
+            return self.reranker.rerank(query, output)
+
+    def _route(self, query: str):
+        self._check_catalog_version()
+        if self.router is None:
+            return None
+        with span("route"):
+            return self.router.route(query)
+
+    @staticmethod
+    def _scoped_searches(plan) -> List[dict]:
+        """Search arguments to try before the global search, narrowest first."""
+        if plan is None:
+            return []
+        scope = {"shards": plan.shards} if plan.shards else {}
+        if plan.filter:
+            return [{"filter": plan.filter, **scope}]
+        return [scope] if scope else []
+
     def call_retriever(self,query:str)-> List[Document]:
         retriever=self.load_retriever()
-        output=retriever.invoke(query)
-        return output
+        plan = self._route(query)
+        if plan and plan.aggregate_documents:
+            return plan.aggregate_documents
+        for search_kwargs in self._scoped_searches(plan):
+            with span("search"):
+                output=retriever.invoke(query, **search_kwargs)
+            if self._enough(output):
+                return self._rerank(query, output)
+            logging.info(f"Search {search_kwargs} matched {len(output)} documents, retrying globally")
+        with span("search"):
+            output=retriever.invoke(query)
+        return self._rerank(query, output)
+
+    async def _asearch(self, query: str, embedding: Optional[List[float]], **search_kwargs) -> List[Document]:
+        if embedding is None:
+            return await self.retriever.ainvoke(query, **search_kwargs)
+        if isinstance(self.retriever, HybridRetriever):
+            return await self.retriever.ainvoke(query, embedding=embedding, **search_kwargs)
+        return await self.vstore.asimilarity_search_by_vector(embedding, k=self.top_k, **search_kwargs)
+
+    async def acall_retriever(self,query:str, embedding: Optional[List[float]] = None)-> List[Document]:
+        """Retrieve for query; pass its embedding when it is already known so it is not embedded again."""
+        self.load_retriever()
+        plan = self._route(query)
+        if plan and plan.aggregate_documents:
+            return plan.aggregate_documents
+        for search_kwargs in self._scoped_searches(plan):
+            with span("search"):
+                output=await self._asearch(query, embedding, **search_kwargs)
+            if self._enough(output):
+                return await asyncio.to_thread(self._rerank, query, output)
+            logging.info(f"Search {search_kwargs} matched {len(output)} documents, retrying globally")
+        with span("search"):
+            output=await self._asearch(query, embedding)
+        return await asyncio.to_thread(self._rerank, query, output)
 
     
 if __name__=='__main__':
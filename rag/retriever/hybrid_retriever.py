@@ -0,0 +1,83 @@
+import asyncio
+from typing import Dict, List, Optional, Sequence
+
+from langchain_core.callbacks import AsyncCallbackManagerForRetrieverRun, CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.vectorstores import VectorStore
+
+from rag.retriever.bm25 import BM25Index
+from rag.vector_store.shards import SHARD_FIELD
+
+
+def reciprocal_rank_fusion(result_lists: Sequence[List[Document]], weights: Sequence[float],
+                           rrf_k: int, top_k: int) -> List[Document]:
+    """Merge ranked lists by summing weight / (rrf_k + rank) per document."""
+    scores: Dict[str, float] = {}
+    documents: Dict[str, Document] = {}
+    for results, weight in zip(result_lists, weights):
+        for rank, doc in enumerate(results, start=1):
+            key = doc.id or doc.page_content
+            scores[key] = scores.get(key, 0.0) + weight / (rrf_k + rank)
+            documents.setdefault(key, doc)
+    ranked = sorted(scores, key=scores.get, reverse=True)[:top_k]
+    return [documents[key] for key in ranked]
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    Runs dense vector search and BM25 side by side and merges them with
+    reciprocal-rank fusion, so exact product names and model numbers that
+    the embedding model blurs still surface. A shard list limits the dense
+    leg to those shards and the BM25 leg to documents of those categories.
+    Callers that already hold the query vector pass it as ``embedding`` so
+    the dense leg does not embed the query again.
+    """
+
+    vectorstore: VectorStore
+    bm25: BM25Index
+    dense_k: int = 8
+    sparse_k: int = 8
+    dense_weight: float = 1.0
+    sparse_weight: float = 1.0
+    rrf_k: int = 60
+    top_k: int = 5
+
+    model_config = {"arbitrary_types_allowed": True}
+
+    def _sparse(self, query: str, filter: Optional[dict] = None,
+                shards: Optional[List[str]] = None) -> List[Document]:
+        if shards:
+            filter = {**(filter or {}), SHARD_FIELD: {"$in": shards}}
+        return [doc for doc, _ in self.bm25.search(query, self.sparse_k, filter=filter)]
+
+    def _fuse(self, dense: List[Document], sparse: List[Document]) -> List[Document]:
+        return reciprocal_rank_fusion(
+            [dense, sparse], [self.dense_weight, self.sparse_weight], self.rrf_k, self.top_k
+        )
+
+    @staticmethod
+    def _dense_kwargs(filter: Optional[dict], shards: Optional[List[str]]) -> dict:
+        # Only a sharded store understands shards.
+        return {"filter": filter, "shards": shards} if shards else {"filter": filter}
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun,
+                                filter: Optional[dict] = None, shards: Optional[List[str]] = None,
+                                embedding: Optional[List[float]] = None) -> List[Document]:
+        kwargs = self._dense_kwargs(filter, shards)
+        dense = (
+            self.vectorstore.similarity_search_by_vector(embedding, k=self.dense_k, **kwargs) if embedding is not None
+            else self.vectorstore.similarity_search(query, k=self.dense_k, **kwargs)
+        )
+        return self._fuse(dense, self._sparse(query, filter, shards))
+
+    async def _aget_relevant_documents(self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun,
+                                       filter: Optional[dict] = None, shards: Optional[List[str]] = None,
+                                       embedding: Optional[List[float]] = None) -> List[Document]:
+        kwargs = self._dense_kwargs(filter, shards)
+        dense, sparse = await asyncio.gather(
+            self.vectorstore.asimilarity_search_by_vector(embedding, k=self.dense_k, **kwargs) if embedding is not None
+            else self.vectorstore.asimilarity_search(query, k=self.dense_k, **kwargs),
+            asyncio.to_thread(self._sparse, query, filter, shards),
+        )
+        return self._fuse(dense, sparse)
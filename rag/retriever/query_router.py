@@ -0,0 +1,180 @@
+import math
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from langchain_core.documents import Document
+
+from rag.data_ingestion.product_catalog import ProductCatalog
+from rag.retriever.bm25 import tokenize
+from rag.vector_store.shards import ShardClassifier
+
+# Title words that never identify a product on their own, however rare they
+# are in the catalog.
+GENERIC_WORDS = {
+    "a", "an", "and", "the", "with", "for", "of", "in", "on", "to", "by",
+    "low", "price", "budget", "cheap", "best", "good", "new", "pro", "plus",
+    "version", "series", "edition", "charging", "fast", "asap",
+}
+
+_NUMBER = r"\b([1-5](?:\.\d)?)"
+_STARS = r"\s*-?\s*(?:stars?|rating)\b"
+
+# Rating constraints, tried in order. Each needs "star"/"rating" next to the
+# number, so prices like "under 1000" are never read as ratings.
+RATING_PATTERNS = [
+    ("$gte", re.compile(r"(?:at least|minimum(?: of)?|min)\s+" + _NUMBER + _STARS)),
+    ("$gte", re.compile(_NUMBER + _STARS + r"\s+(?:and|or)\s+(?:above|up|more|higher)")),
+    ("$gte", re.compile(_NUMBER + r"\s*\+\s*(?:stars?|rating)\b")),
+    ("$gte", re.compile(r"\brated\s+" + _NUMBER + r"\s*(?:\+|or (?:above|more|higher)|and (?:above|up))")),
+    ("$lte", re.compile(r"(?:at most|maximum(?: of)?|max)\s+" + _NUMBER + _STARS)),
+    ("$lte", re.compile(_NUMBER + _STARS + r"\s+(?:and|or)\s+(?:below|less|lower|under)")),
+    ("$gt", re.compile(r"(?:above|over|more than|higher than|greater than)\s+" + _NUMBER + _STARS)),
+    ("$lt", re.compile(r"(?:below|under|less than|lower than)\s+" + _NUMBER + _STARS)),
+    ("$eq", re.compile(_NUMBER + r"\s*-?\s*stars?\b")),
+    ("$eq", re.compile(r"\brated\s+" + _NUMBER + r"\b")),
+]
+
+_RATING_WORDS = re.compile(r"\b(?:stars?|rating|rated)\b")
+
+# Questions about the catalog as a whole: (pattern, ranking key, descending).
+AGGREGATE_PATTERNS = [
+    (re.compile(r"\b(?:highest|best|top)[\s-]+(?:rated|rating)\b|\bbest reviewed\b"), "rating", True),
+    (re.compile(r"\b(?:lowest|worst)[\s-]+(?:rated|rating)\b"), "rating", False),
+    (re.compile(r"\bmost (?:reviewed|reviews|popular)\b"), "reviews", True),
+]
+
+
+@dataclass
+class RoutePlan:
+    """
+    How to retrieve for one question: a metadata filter and the category
+    shards to search, or documents that answer it outright.
+    """
+
+    filter: Optional[dict] = None
+    aggregate_documents: Optional[List[Document]] = None
+    shards: Optional[List[str]] = None
+
+
+class QueryRouter:
+    """
+    Turns product mentions and rating constraints in a question into a
+    metadata filter, and answers ranking questions ("highest rated ...")
+    from the product catalog instead of a similarity search.
+
+    Products are matched on their distinctive title words, weighted by how
+    rare each word is across titles; the best-scoring products (ties
+    included, so "boat" matches every boAt model) become the filter.
+
+    With a shard classifier the plan also names the category shards to
+    search: those of the matched products, or else the categories the
+    question mentions. Without either signal, or when every shard would be
+    searched anyway, the search stays global.
+
+    Ranking questions that name a category ("highest rated earbuds") only
+    rank products in it. Categories come from ``categories``, which
+    defaults to the shard classifier but also works with sharding off.
+    """
+
+    def __init__(self, catalog: ProductCatalog, max_title_fraction: float = 0.5,
+                 aggregate_limit: int = 5, aggregate_min_reviews: int = 3,
+                 classifier: Optional[ShardClassifier] = None, product_filters: bool = True,
+                 categories: Optional[ShardClassifier] = None):
+        self.catalog = catalog
+        self.classifier = classifier
+        self.categories = categories or classifier
+        self.product_filters = product_filters
+        self.aggregate_limit = aggregate_limit
+        self.aggregate_min_reviews = aggregate_min_reviews
+
+        titles = {product_id: set(tokenize(product["title"])) for product_id, product in catalog.products.items()}
+        document_frequency: Dict[str, int] = {}
+        for tokens in titles.values():
+            for token in tokens:
+                document_frequency[token] = document_frequency.get(token, 0) + 1
+        count = max(len(titles), 1)
+        self.idf = {
+            token: math.log(1 + count / frequency)
+            for token, frequency in document_frequency.items()
+            if token not in GENERIC_WORDS and frequency / count <= max_title_fraction
+        }
+        self.titles = {
+            product_id: {token for token in tokens if token in self.idf}
+            for product_id, tokens in titles.items()
+        }
+
+    def match_products(self, question: str) -> List[str]:
+        tokens = set(tokenize(question))
+        scores = {}
+        for product_id, title_tokens in self.titles.items():
+            matched = tokens & title_tokens
+            # A bare number ("top 2") is not a product mention without a name word.
+            if any(not token.isdigit() for token in matched):
+                scores[product_id] = sum(self.idf[token] for token in matched)
+        if not scores:
+            return []
+        best = max(scores.values())
+        return sorted(product_id for product_id, score in scores.items() if score >= best - 1e-9)
+
+    @staticmethod
+    def rating_condition(question: str) -> Optional[dict]:
+        question = question.lower()
+        if not _RATING_WORDS.search(question):
+            return None
+        for operator, pattern in RATING_PATTERNS:
+            match = pattern.search(question)
+            if match:
+                return {operator: float(match.group(1))}
+        return None
+
+    def shards(self, question: str, product_ids: List[str]) -> Optional[List[str]]:
+        if self.classifier is None:
+            return None
+        if product_ids:
+            shards = {self.catalog.products[product_id].get("category") or self.classifier.default
+                      for product_id in product_ids}
+        else:
+            shards = set(self.classifier.shards_for_question(question))
+        if not shards or len(shards) >= len(self.classifier.shard_names):
+            return None
+        return sorted(shards)
+
+    def aggregate_candidates(self, question: str, product_ids: List[str]) -> Optional[List[str]]:
+        """
+        Products a ranking question ranks: the matched ones, or the whole
+        catalog (None), narrowed to the categories the question names.
+        """
+        named = set(self.categories.shards_for_question(question)) if self.categories is not None else set()
+        if not named:
+            return product_ids or None
+        return [
+            product_id for product_id in (product_ids or self.catalog.products)
+            if (self.catalog.products[product_id].get("category")
+                or self.categories.shard_for_title(self.catalog.products[product_id]["title"])) in named
+        ]
+
+    def route(self, question: str) -> RoutePlan:
+        product_ids = self.match_products(question)
+        shards = self.shards(question, product_ids)
+        if not self.product_filters:
+            return RoutePlan(shards=shards)
+
+        for pattern, by, descending in AGGREGATE_PATTERNS:
+            if pattern.search(question.lower()):
+                ranked = self.catalog.ranked(
+                    self.aggregate_candidates(question, product_ids), by=by, descending=descending,
+                    limit=self.aggregate_limit, min_reviews=self.aggregate_min_reviews,
+                )
+                if ranked:
+                    return RoutePlan(aggregate_documents=self.catalog.as_documents(ranked))
+
+        metadata_filter = {}
+        if len(product_ids) == 1:
+            metadata_filter["product_id"] = product_ids[0]
+        elif product_ids:
+            metadata_filter["product_id"] = {"$in": product_ids}
+        rating = self.rating_condition(question)
+        if rating:
+            metadata_filter["product_rating"] = rating
+        return RoutePlan(filter=metadata_filter or None, shards=shards)
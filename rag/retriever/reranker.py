@@ -0,0 +1,130 @@
+import hashlib
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, List, Optional, Sequence, Tuple
+
+from langchain_core.documents import Document
+
+from rag.exception.exception import RAGException
+from rag.logging.logger import logging
+from rag.retriever.bm25 import tokenize
+
+# Scores a batch of (query, passage) pairs; higher means more relevant.
+PairScorer = Callable[[List[Tuple[str, str]]], Sequence[float]]
+
+
+def overlap_scorer(pairs: List[Tuple[str, str]]) -> List[float]:
+    """Stand-in for the cross-encoder: share of query terms found in the passage. Runs offline."""
+    scores = []
+    for query, passage in pairs:
+        query_terms = set(tokenize(query))
+        scores.append(len(query_terms & set(tokenize(passage))) / len(query_terms) if query_terms else 0.0)
+    return scores
+
+
+def load_cross_encoder(model_name: str, max_length: int = 256) -> PairScorer:
+    """Local sentence-transformers cross-encoder on CPU, scoring a whole batch in one forward pass."""
+    try:
+        from sentence_transformers import CrossEncoder
+
+        model = CrossEncoder(model_name, max_length=max_length, device="cpu")
+        logging.info(f"Cross-encoder {model_name} loaded")
+        return lambda pairs: model.predict(pairs, batch_size=len(pairs), show_progress_bar=False).tolist()
+    except Exception as e:
+        raise RAGException(f"Error loading cross-encoder {model_name}: {e}", sys)
+
+
+class CrossEncoderReranker:
+    """
+    Reorders over-fetched candidates by cross-encoder score and keeps the top k.
+
+    Pair scores are cached by (query, passage) so repeated and speculative
+    retrievals only score new passages. The cost per uncached pair is tracked
+    as a moving average; when scoring the uncached pairs is expected to take
+    longer than the latency budget, the candidates are returned in retrieval
+    order instead.
+    """
+
+    def __init__(self, scorer: PairScorer, top_k: int = 5, candidates: int = 20,
+                 latency_budget_ms: float = 150.0, cache_size: int = 20000):
+        self.scorer = scorer
+        self.top_k = top_k
+        self.candidates = candidates
+        self.latency_budget_ms = latency_budget_ms
+        self.cache_size = cache_size
+        self.seconds_per_pair: Optional[float] = None
+        self.skipped = 0
+        self.hits = 0
+        self.misses = 0
+        self._cache: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(query: str, doc: Document) -> str:
+        passage = doc.id or doc.page_content
+        return hashlib.sha256(f"{query.strip().lower()}\x1f{passage}".encode("utf-8")).hexdigest()
+
+    def _cached(self, key: str) -> Optional[float]:
+        with self._lock:
+            score = self._cache.get(key)
+            if score is not None:
+                self._cache.move_to_end(key)
+            return score
+
+    def _store(self, keys: List[str], scores: Sequence[float]):
+        with self._lock:
+            for key, score in zip(keys, scores):
+                self._cache[key] = float(score)
+                self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def rerank(self, query: str, documents: List[Document]) -> List[Document]:
+        if len(documents) <= 1:
+            return documents[:self.top_k]
+
+        keys = [self._key(query, doc) for doc in documents]
+        scores = [self._cached(key) for key in keys]
+        missing = [i for i, score in enumerate(scores) if score is None]
+        self.hits += len(documents) - len(missing)
+        self.misses += len(missing)
+
+        if missing:
+            expected_ms = (self.seconds_per_pair or 0.0) * len(missing) * 1000
+            if expected_ms > self.latency_budget_ms:
+                self.skipped += 1
+                # Decay the estimate so one slow batch does not disable reranking for good.
+                self.seconds_per_pair *= 0.9
+                logging.info(
+                    f"Skipping rerank: {len(missing)} pairs would take ~{expected_ms:.0f}ms "
+                    f"(budget {self.latency_budget_ms:.0f}ms)"
+                )
+                return documents[:self.top_k]
+
+            started = time.perf_counter()
+            new_scores = self.scorer([(query, documents[i].page_content) for i in missing])
+            elapsed = time.perf_counter() - started
+            per_pair = elapsed / len(missing)
+            self.seconds_per_pair = per_pair if self.seconds_per_pair is None else 0.8 * self.seconds_per_pair + 0.2 * per_pair
+            self._store([keys[i] for i in missing], new_scores)
+            for i, score in zip(missing, new_scores):
+                scores[i] = float(score)
+
+        order = sorted(range(len(documents)), key=lambda i: scores[i], reverse=True)
+        return [documents[i] for i in order[:self.top_k]]
+
+
+def load_reranker(config, top_k: int) -> Optional[CrossEncoderReranker]:
+    """Build the reranker described by the ``reranker`` config section, or None when it is off."""
+    if not config or not config.enabled:
+        return None
+    scorer = overlap_scorer if config.scorer == "overlap" else load_cross_encoder(config.model_name, config.max_length)
+    return CrossEncoderReranker(
+        scorer,
+        top_k=top_k,
+        candidates=config.candidates,
+        latency_budget_ms=config.latency_budget_ms,
+        cache_size=config.cache_size,
+    )
@@ -0,0 +1,33 @@
+from typing import Any, Dict
+
+# The subset of Pinecone's metadata filter language understood by the local
+# backends, so the same filter dict can be pushed down to either store.
+OPERATORS = {
+    "$eq": lambda value, target: value == target,
+    "$ne": lambda value, target: value != target,
+    "$gt": lambda value, target: value is not None and value > target,
+    "$gte": lambda value, target: value is not None and value >= target,
+    "$lt": lambda value, target: value is not None and value < target,
+    "$lte": lambda value, target: value is not None and value <= target,
+    "$in": lambda value, target: value in target,
+    "$nin": lambda value, target: value not in target,
+}
+
+
+def conditions(field_filter: Any) -> Dict[str, Any]:
+    """Normalise a field filter, where a bare value means equality."""
+    if isinstance(field_filter, dict):
+        unknown = set(field_filter) - set(OPERATORS)
+        if unknown:
+            raise ValueError(f"Unsupported filter operators: {unknown}")
+        return field_filter
+    return {"$eq": field_filter}
+
+
+def matches_filter(metadata: Dict[str, Any], metadata_filter: Dict[str, Any]) -> bool:
+    for field, field_filter in metadata_filter.items():
+        value = metadata.get(field)
+        for operator, target in conditions(field_filter).items():
+            if not OPERATORS[operator](value, target):
+                return False
+    return True
@@ -0,0 +1,406 @@
+import json
+import mmap
+import os
+import sys
+import threading
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from rag.exception.exception import RAGException
+from rag.logging.logger import logging
+from rag.vector_store.filters import OPERATORS, conditions
+
+
+def _json_default(value):
+    """Make numpy scalars coming out of pandas JSON serialisable."""
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k largest scores, best first."""
+    if k >= len(scores):
+        return np.argsort(-scores)
+    candidates = np.argpartition(-scores, k)[:k]
+    return candidates[np.argsort(-scores[candidates])]
+
+
+NUMERIC_OPERATORS = {
+    "$eq": np.equal,
+    "$ne": np.not_equal,
+    "$gt": np.greater,
+    "$gte": np.greater_equal,
+    "$lt": np.less,
+    "$lte": np.less_equal,
+    "$in": lambda column, target: np.isin(column, list(target)),
+    "$nin": lambda column, target: ~np.isin(column, list(target)),
+}
+
+
+def column_mask(columns: dict, values: dict, metadata_filter: dict, count: int) -> np.ndarray:
+    """
+    Row mask for a metadata filter over columnar metadata: float columns, or
+    integer codes into ``values[field]`` for strings.
+    """
+    mask = np.ones(count, dtype=bool)
+    for field, field_filter in metadata_filter.items():
+        if field not in columns:
+            raise ValueError(f"Field {field} is not a filterable column of this index")
+        column = columns[field]
+        for operator, target in conditions(field_filter).items():
+            if field in values:
+                allowed = [code for code, value in enumerate(values[field]) if OPERATORS[operator](value, target)]
+                mask &= np.isin(column, allowed)
+            else:
+                with np.errstate(invalid="ignore"):
+                    mask &= NUMERIC_OPERATORS[operator](column, target)
+    return mask
+
+
+class LocalVectorIndex:
+    """
+    In-process cosine index over L2-normalised float32 vectors.
+
+    Vectors live in a memory-mapped ``.npy`` file and the document records
+    (id, text, metadata) in a JSON-lines file addressed by byte offsets, so
+    opening an index only maps the files instead of reading them. Search is
+    either exact (one matrix-vector product) or IVF, which probes the
+    ``nprobe`` closest of ``nlist`` k-means cells.
+
+    Metadata fields listed in ``filter_fields`` are also stored as columns
+    (float arrays, or integer codes into a value list for strings) so
+    metadata filters become a boolean row mask applied before scoring.
+    """
+
+    VECTORS_FILE = "vectors.npy"
+    DOCUMENTS_FILE = "documents.jsonl"
+    OFFSETS_FILE = "offsets.npy"
+    CENTROIDS_FILE = "ivf_centroids.npy"
+    LISTS_FILE = "ivf_lists.npy"
+    LIST_OFFSETS_FILE = "ivf_list_offsets.npy"
+    MANIFEST_FILE = "manifest.json"
+    PENDING_VECTORS_FILE = "pending_vectors.f32"
+    PENDING_DOCUMENTS_FILE = "pending_documents.jsonl"
+    COLUMNS_FILE = "columns.npz"
+    COLUMN_VALUES_FILE = "column_values.json"
+    VERSION = 1
+
+    def __init__(self, index_dir: str, dimension: int, index_type: str = "exact",
+                 nlist: int = 256, nprobe: int = 8,
+                 filter_fields: Sequence[str] = ("product_id", "product_rating")):
+        if index_type not in ("exact", "ivf"):
+            raise ValueError(f"Unknown local index type: {index_type}")
+        self.index_dir = index_dir
+        self.dimension = dimension
+        self.index_type = index_type
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.filter_fields = list(filter_fields)
+
+        self.vectors = np.zeros((0, dimension), dtype=np.float32)
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.centroids = None
+        self.lists = None
+        self.list_offsets = None
+        self._documents = None
+        self._ids = None
+        self._columns = None
+        self._column_values = None
+
+        # Writes are staged in append-only files next to the index and
+        # applied by save(); only their ids are kept in memory.
+        self._pending_ids: List[str] = []
+        self._deleted = set()
+        self._write_lock = threading.Lock()
+
+    @classmethod
+    def load(cls, index_dir: str, nprobe: Optional[int] = None) -> "LocalVectorIndex":
+        """Map an index written by save(); nothing is read eagerly."""
+        try:
+            with open(os.path.join(index_dir, cls.MANIFEST_FILE)) as f:
+                manifest = json.load(f)
+
+            index = cls(
+                index_dir,
+                dimension=manifest["dimension"],
+                index_type=manifest["index_type"],
+                nlist=manifest["nlist"],
+                nprobe=nprobe or manifest["nprobe"],
+                filter_fields=manifest.get("filter_fields", []),
+            )
+            index._open(manifest)
+            logging.info(f"Local vector index loaded from {index_dir} with {manifest['count']} vectors")
+            return index
+        except Exception as e:
+            raise RAGException(f"Error loading local vector index: {e}", sys)
+
+    def _open(self, manifest: dict):
+        self._columns = self._column_values = None
+        if manifest["count"]:
+            self.vectors = np.load(os.path.join(self.index_dir, self.VECTORS_FILE), mmap_mode="r")
+            self.offsets = np.load(os.path.join(self.index_dir, self.OFFSETS_FILE), mmap_mode="r")
+            with open(os.path.join(self.index_dir, self.DOCUMENTS_FILE), "rb") as f:
+                self._documents = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if manifest["index_type"] == "ivf" and manifest["count"]:
+            self.centroids = np.load(os.path.join(self.index_dir, self.CENTROIDS_FILE))
+            self.lists = np.load(os.path.join(self.index_dir, self.LISTS_FILE), mmap_mode="r")
+            self.list_offsets = np.load(os.path.join(self.index_dir, self.LIST_OFFSETS_FILE))
+
+    @classmethod
+    def load_or_create(cls, index_dir: str, dimension: int, index_type: str = "exact",
+                       nlist: int = 256, nprobe: int = 8,
+                       filter_fields: Sequence[str] = ("product_id", "product_rating")) -> "LocalVectorIndex":
+        if os.path.exists(os.path.join(index_dir, cls.MANIFEST_FILE)):
+            index = cls.load(index_dir, nprobe=nprobe)
+            index.index_type = index_type
+            index.nlist = nlist
+            index.filter_fields = list(filter_fields)
+            return index
+        return cls(index_dir, dimension, index_type=index_type, nlist=nlist, nprobe=nprobe,
+                   filter_fields=filter_fields)
+
+    def __len__(self) -> int:
+        return len(self.vectors)
+
+    def get_record(self, row: int) -> dict:
+        start, end = int(self.offsets[row]), int(self.offsets[row + 1])
+        return json.loads(self._documents[start:end])
+
+    def ids(self) -> List[str]:
+        """Ids of the stored rows, in row order."""
+        if self._ids is None:
+            self._ids = [self.get_record(row)["id"] for row in range(len(self))]
+        return self._ids
+
+    def add(self, ids: Sequence[str], vectors: np.ndarray, records: Sequence[dict]):
+        vectors = _normalize(vectors)
+        if vectors.ndim != 2 or vectors.shape[1] != self.dimension:
+            raise ValueError(f"Expected vectors of dimension {self.dimension}, got {vectors.shape}")
+
+        lines = [
+            json.dumps(dict(record, id=doc_id), default=_json_default).encode("utf-8") + b"\n"
+            for doc_id, record in zip(ids, records)
+        ]
+        with self._write_lock:
+            os.makedirs(self.index_dir, exist_ok=True)
+            # Pending files left by a process that died before save() are
+            # discarded; ingestion re-adds those rows, as their ids only reach
+            # its manifest after save().
+            mode = "ab" if self._pending_ids else "wb"
+            with open(os.path.join(self.index_dir, self.PENDING_VECTORS_FILE), mode) as f:
+                f.write(vectors.astype(np.float32).tobytes())
+            with open(os.path.join(self.index_dir, self.PENDING_DOCUMENTS_FILE), mode) as f:
+                f.writelines(lines)
+            for doc_id in ids:
+                self._deleted.discard(doc_id)
+                self._pending_ids.append(doc_id)
+
+    def delete(self, ids: Iterable[str]):
+        self._deleted.update(ids)
+
+    def _load_columns(self):
+        if self._columns is None:
+            path = os.path.join(self.index_dir, self.COLUMNS_FILE)
+            if len(self) and os.path.exists(path):
+                self._columns = dict(np.load(path))
+                with open(os.path.join(self.index_dir, self.COLUMN_VALUES_FILE)) as f:
+                    self._column_values = json.load(f)
+            else:
+                self._columns, self._column_values = {}, {}
+        return self._columns, self._column_values
+
+    def _column_as_list(self, field: str) -> list:
+        """Decode a stored column back to per-row python values (None when missing)."""
+        columns, values = self._load_columns()
+        if field not in columns:
+            return [self.get_record(row)["metadata"].get(field) for row in range(len(self))]
+        if field in values:
+            return [values[field][code] if code >= 0 else None for code in columns[field].tolist()]
+        return [None if np.isnan(value) else value for value in columns[field].tolist()]
+
+    def mask(self, metadata_filter: Optional[dict]) -> Optional[np.ndarray]:
+        """Boolean row mask for a Pinecone-style metadata filter on the indexed columns."""
+        if not metadata_filter:
+            return None
+        columns, values = self._load_columns()
+        return column_mask(columns, values, metadata_filter, len(self))
+
+    def search(self, query_vector: np.ndarray, k: int,
+               mask: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+        """Return (row, cosine similarity) pairs for the k nearest rows allowed by mask."""
+        if not len(self):
+            return []
+        query = _normalize(query_vector).reshape(-1)
+
+        rows = None
+        if self.index_type == "ivf" and self.centroids is not None:
+            probes = _top_k(self.centroids @ query, min(self.nprobe, len(self.centroids)))
+            rows = np.concatenate([
+                self.lists[self.list_offsets[cell]:self.list_offsets[cell + 1]] for cell in probes
+            ])
+            if mask is not None:
+                rows = rows[mask[rows]]
+            if len(rows) < k:
+                rows = None
+        if rows is None and mask is not None:
+            rows = np.flatnonzero(mask)
+
+        if rows is None:
+            scores = self.vectors @ query
+            best = _top_k(scores, k)
+            return [(int(row), float(scores[row])) for row in best]
+        if not len(rows):
+            return []
+
+        rows = np.sort(rows)
+        scores = self.vectors[rows] @ query
+        best = _top_k(scores, k)
+        return [(int(rows[i]), float(scores[i])) for i in best]
+
+    def save(self):
+        """Merge staged writes with the stored rows and rewrite the index files."""
+        try:
+            os.makedirs(self.index_dir, exist_ok=True)
+            pending = {doc_id: row for row, doc_id in enumerate(self._pending_ids)}
+            replaced = self._deleted | set(pending)
+            stored_ids = self.ids() if len(self) else []
+            keep = [row for row, doc_id in enumerate(stored_ids) if doc_id not in replaced]
+            new_rows = {row for doc_id, row in pending.items() if doc_id not in self._deleted}
+            count = len(keep) + len(new_rows)
+
+            vectors_path = os.path.join(self.index_dir, self.VECTORS_FILE + ".tmp")
+            documents_path = os.path.join(self.index_dir, self.DOCUMENTS_FILE + ".tmp")
+            vectors = np.lib.format.open_memmap(
+                vectors_path, mode="w+", dtype=np.float32, shape=(count, self.dimension)
+            )
+            offsets = np.zeros(count + 1, dtype=np.int64)
+            ids = []
+            column_lists = {field: [] for field in self.filter_fields}
+            for field in self.filter_fields:
+                if len(self):
+                    stored = self._column_as_list(field)
+                    column_lists[field] = [stored[row] for row in keep]
+            with open(documents_path, "wb") as documents:
+                out_row = 0
+                for row in keep:
+                    vectors[out_row] = self.vectors[row]
+                    line = self._documents[int(self.offsets[row]):int(self.offsets[row + 1])]
+                    documents.write(line)
+                    offsets[out_row + 1] = offsets[out_row] + len(line)
+                    ids.append(stored_ids[row])
+                    out_row += 1
+                if self._pending_ids:
+                    pending_vectors = np.memmap(
+                        os.path.join(self.index_dir, self.PENDING_VECTORS_FILE), dtype=np.float32, mode="r",
+                        shape=(len(self._pending_ids), self.dimension),
+                    )
+                    with open(os.path.join(self.index_dir, self.PENDING_DOCUMENTS_FILE), "rb") as pending_documents:
+                        for row, line in enumerate(pending_documents):
+                            if row not in new_rows:
+                                continue
+                            vectors[out_row] = pending_vectors[row]
+                            metadata = json.loads(line)["metadata"]
+                            for field in self.filter_fields:
+                                column_lists[field].append(metadata.get(field))
+                            documents.write(line)
+                            offsets[out_row + 1] = offsets[out_row] + len(line)
+                            ids.append(self._pending_ids[row])
+                            out_row += 1
+                    del pending_vectors
+            vectors.flush()
+            del vectors
+
+            self._close()
+            os.replace(vectors_path, os.path.join(self.index_dir, self.VECTORS_FILE))
+            os.replace(documents_path, os.path.join(self.index_dir, self.DOCUMENTS_FILE))
+            np.save(os.path.join(self.index_dir, self.OFFSETS_FILE), offsets)
+            self._save_columns(column_lists)
+            if self.index_type == "ivf" and count:
+                self._build_ivf(np.load(os.path.join(self.index_dir, self.VECTORS_FILE), mmap_mode="r"))
+
+            manifest = {
+                "version": self.VERSION,
+                "dimension": self.dimension,
+                "count": count,
+                "index_type": self.index_type,
+                "nlist": self.nlist,
+                "nprobe": self.nprobe,
+                "filter_fields": self.filter_fields,
+            }
+            with open(os.path.join(self.index_dir, self.MANIFEST_FILE), "w") as f:
+                json.dump(manifest, f)
+
+            for name in (self.PENDING_VECTORS_FILE, self.PENDING_DOCUMENTS_FILE):
+                path = os.path.join(self.index_dir, name)
+                if os.path.exists(path):
+                    os.remove(path)
+            self._pending_ids = []
+            self._deleted = set()
+            self._open(manifest)
+            self._ids = ids
+            logging.info(f"Local vector index saved to {self.index_dir} with {count} vectors")
+        except Exception as e:
+            raise RAGException(f"Error saving local vector index: {e}", sys)
+
+    def _save_columns(self, column_lists: dict):
+        """Store numeric fields as float64 (NaN when missing) and anything else as codes into a value list."""
+        columns, values = {}, {}
+        for field, column in column_lists.items():
+            if all(value is None or (isinstance(value, (int, float)) and not isinstance(value, bool)) for value in column):
+                columns[field] = np.asarray([np.nan if value is None else value for value in column], dtype=np.float64)
+            else:
+                distinct = sorted({str(value) for value in column if value is not None})
+                codes = {value: code for code, value in enumerate(distinct)}
+                columns[field] = np.asarray([codes[str(value)] if value is not None else -1 for value in column], dtype=np.int32)
+                values[field] = distinct
+        np.savez(os.path.join(self.index_dir, self.COLUMNS_FILE), **columns)
+        with open(os.path.join(self.index_dir, self.COLUMN_VALUES_FILE), "w") as f:
+            json.dump(values, f)
+
+    def _build_ivf(self, vectors: np.ndarray, iterations: int = 10, seed: int = 42):
+        """Spherical k-means over a training sample, then bucket every row by its nearest centroid."""
+        count = len(vectors)
+        nlist = max(1, min(self.nlist, count // 39 or 1))
+        rng = np.random.default_rng(seed)
+        sample_size = min(count, nlist * 256)
+        sample = np.asarray(vectors[np.sort(rng.choice(count, sample_size, replace=False))])
+        centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+
+        for _ in range(iterations):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            for cell in range(nlist):
+                members = sample[assignment == cell]
+                if len(members):
+                    centroids[cell] = members.sum(axis=0)
+            centroids = _normalize(centroids)
+
+        assignment = np.empty(count, dtype=np.int32)
+        for start in range(0, count, 65536):
+            block = np.asarray(vectors[start:start + 65536])
+            assignment[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+
+        lists = np.argsort(assignment, kind="stable").astype(np.int64)
+        list_offsets = np.zeros(nlist + 1, dtype=np.int64)
+        list_offsets[1:] = np.cumsum(np.bincount(assignment, minlength=nlist))
+
+        np.save(os.path.join(self.index_dir, self.CENTROIDS_FILE), centroids)
+        np.save(os.path.join(self.index_dir, self.LISTS_FILE), lists)
+        np.save(os.path.join(self.index_dir, self.LIST_OFFSETS_FILE), list_offsets)
+        self.nlist = nlist
+
+    def _close(self):
+        if self._documents is not None:
+            self._documents.close()
+            self._documents = None
+        self.vectors = np.zeros((0, self.dimension), dtype=np.float32)
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.centroids = self.lists = self.list_offsets = None
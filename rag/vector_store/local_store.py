@@ -0,0 +1,90 @@
+import uuid
+from typing import Any, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+from rag.vector_store.local_index import LocalVectorIndex
+
+
+class LocalVectorStore(VectorStore):
+    """
+    LangChain vector store backed by a LocalVectorIndex, so it can stand in
+    for PineconeVectorStore in ingestion and retrieval.
+    """
+
+    def __init__(self, embedding: Embeddings, index: LocalVectorIndex):
+        self.embedding = embedding
+        self.index = index
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self.embedding
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None,
+                  ids: Optional[List[str]] = None, **kwargs: Any) -> List[str]:
+        texts = list(texts)
+        vectors = self.embedding.embed_documents(texts)
+        return self.add_embeddings(texts, vectors, metadatas=metadatas, ids=ids)
+
+    def add_embeddings(self, texts: List[str], vectors: List[List[float]],
+                       metadatas: Optional[List[dict]] = None,
+                       ids: Optional[List[str]] = None) -> List[str]:
+        """Stage precomputed vectors; call persist() to write them to disk."""
+        metadatas = metadatas or [{} for _ in texts]
+        ids = ids or [uuid.uuid4().hex for _ in texts]
+        records = [
+            {"page_content": text, "metadata": metadata}
+            for text, metadata in zip(texts, metadatas)
+        ]
+        if texts:
+            self.index.add(ids, np.asarray(vectors, dtype=np.float32), records)
+        return ids
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        if ids:
+            self.index.delete(ids)
+        return True
+
+    def persist(self):
+        self.index.save()
+
+    def similarity_search_by_vector_with_score(self, embedding: List[float], k: int = 4,
+                                               filter: Optional[dict] = None,
+                                               **kwargs: Any) -> List[Tuple[Document, float]]:
+        mask = self.index.mask(filter)
+        results = []
+        for row, score in self.index.search(np.asarray(embedding, dtype=np.float32), k, mask=mask):
+            record = self.index.get_record(row)
+            results.append((
+                Document(id=record["id"], page_content=record["page_content"], metadata=record["metadata"]),
+                score,
+            ))
+        return results
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4,
+                                    **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k, **kwargs)]
+
+    def similarity_search_with_score(self, query: str, k: int = 4,
+                                     **kwargs: Any) -> List[Tuple[Document, float]]:
+        embedding = self.embedding.embed_query(query)
+        return self.similarity_search_by_vector_with_score(embedding, k, **kwargs)
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, **kwargs)]
+
+    def _select_relevance_score_fn(self):
+        return self._cosine_relevance_score_fn
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding: Embeddings,
+                   metadatas: Optional[List[dict]] = None, ids: Optional[List[str]] = None,
+                   index_dir: str = "artifacts/local_index", **kwargs: Any) -> "LocalVectorStore":
+        dimension = len(embedding.embed_query("dimension probe"))
+        store = cls(embedding, LocalVectorIndex.load_or_create(index_dir, dimension, **kwargs))
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        store.persist()
+        return store
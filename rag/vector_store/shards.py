@@ -0,0 +1,159 @@
+import asyncio
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+# Metadata field holding the shard a review was written to.
+SHARD_FIELD = "category"
+
+
+class ShardClassifier:
+    """
+    Assigns products to category shards by keywords in their titles, and
+    picks the shards a question names by the same keywords. Categories are
+    tried in order and the first match wins; products matching none go to
+    the default shard.
+    """
+
+    def __init__(self, categories: Dict[str, List[str]], default: str = "other"):
+        self.default = default
+        self.patterns = {
+            name: re.compile(r"\b(?:" + "|".join(re.escape(keyword.lower()) for keyword in keywords) + r")s?\b")
+            for name, keywords in categories.items()
+        }
+
+    @property
+    def shard_names(self) -> List[str]:
+        return list(self.patterns) + [self.default]
+
+    def shard_for_title(self, title: str) -> str:
+        title = str(title).lower()
+        for name, pattern in self.patterns.items():
+            if pattern.search(title):
+                return name
+        return self.default
+
+    def shards_for_question(self, question: str) -> List[str]:
+        question = question.lower()
+        return [name for name, pattern in self.patterns.items() if pattern.search(question)]
+
+
+def load_category_classifier(config) -> Optional[ShardClassifier]:
+    """The classifier for the categories in the sharding config section, whether or not sharding is on."""
+    if not config or not config.get("categories"):
+        return None
+    return ShardClassifier(config.categories, config.get("default_shard", "other"))
+
+
+def load_shard_classifier(config) -> Optional[ShardClassifier]:
+    """The classifier for the sharding config section, or None when sharding is off."""
+    if not config or not config.enabled:
+        return None
+    return load_category_classifier(config)
+
+
+class ShardedVectorStore(VectorStore):
+    """
+    One vector store per category shard (a Pinecone namespace or a local
+    index partition) behind a single VectorStore. Searches embed the query
+    once and fan out to the requested shards in parallel, or to all of them
+    when none are given, then merge the per-shard top-k by score.
+    """
+
+    def __init__(self, embedding: Embeddings, shards: Dict[str, VectorStore], default: str = "other"):
+        self.embedding = embedding
+        self.shards = shards
+        self.default = default
+        self._executor = None
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self.embedding
+
+    def shard(self, name: str) -> VectorStore:
+        return self.shards[name]
+
+    def _selected(self, shards: Optional[Iterable[str]]) -> List[VectorStore]:
+        if not shards:
+            return list(self.shards.values())
+        return [self.shards[name] for name in shards if name in self.shards]
+
+    @staticmethod
+    def _merge(results: Iterable[List[Tuple[Document, float]]], k: int) -> List[Tuple[Document, float]]:
+        merged = [pair for shard_results in results for pair in shard_results]
+        merged.sort(key=lambda pair: pair[1], reverse=True)
+        return merged[:k]
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None,
+                  ids: Optional[List[str]] = None, **kwargs: Any) -> List[str]:
+        texts = list(texts)
+        metadatas = metadatas or [{} for _ in texts]
+        rows_by_shard: Dict[str, List[int]] = {}
+        for row, metadata in enumerate(metadatas):
+            rows_by_shard.setdefault(metadata.get(SHARD_FIELD, self.default), []).append(row)
+        added = []
+        for name, rows in rows_by_shard.items():
+            added += self.shards.get(name, self.shards[self.default]).add_texts(
+                [texts[row] for row in rows],
+                metadatas=[metadatas[row] for row in rows],
+                ids=[ids[row] for row in rows] if ids else None,
+                **kwargs,
+            )
+        return added
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        # A document's shard is not known from its id alone; deleting an
+        # absent id is a no-op in every backend.
+        for store in self.shards.values():
+            store.delete(ids=ids, **kwargs)
+        return True
+
+    def persist(self):
+        for store in self.shards.values():
+            if hasattr(store, "persist"):
+                store.persist()
+
+    def similarity_search_by_vector_with_score(self, embedding: List[float], k: int = 4,
+                                               shards: Optional[List[str]] = None,
+                                               **kwargs: Any) -> List[Tuple[Document, float]]:
+        stores = self._selected(shards)
+        if len(stores) == 1:
+            return stores[0].similarity_search_by_vector_with_score(embedding, k=k, **kwargs)
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=len(self.shards), thread_name_prefix="shard-search")
+        futures = [
+            self._executor.submit(store.similarity_search_by_vector_with_score, embedding, k=k, **kwargs)
+            for store in stores
+        ]
+        return self._merge((future.result() for future in futures), k)
+
+    def similarity_search_with_score(self, query: str, k: int = 4,
+                                     **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.similarity_search_by_vector_with_score(self.embedding.embed_query(query), k, **kwargs)
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k, **kwargs)]
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, **kwargs)]
+
+    async def asimilarity_search(self, query: str, k: int = 4, shards: Optional[List[str]] = None,
+                                 **kwargs: Any) -> List[Document]:
+        embedding = await self.embedding.aembed_query(query)
+        results = await asyncio.gather(*(
+            asyncio.to_thread(store.similarity_search_by_vector_with_score, embedding, k=k, **kwargs)
+            for store in self._selected(shards)
+        ))
+        return [doc for doc, _ in self._merge(results, k)]
+
+    def _select_relevance_score_fn(self):
+        return self._cosine_relevance_score_fn
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding: Embeddings, metadatas: Optional[List[dict]] = None,
+                   **kwargs: Any) -> "ShardedVectorStore":
+        raise NotImplementedError("Build a ShardedVectorStore through VectorStoreLoader")
@@ -0,0 +1,347 @@
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from rag.exception.exception import RAGException
+from rag.logging.logger import logging
+from rag.vector_store.local_index import _json_default, _normalize, _top_k, column_mask
+
+MAGIC = b"RAGSNAP\x00"
+VERSION = 1
+# Every section starts on a cache-line boundary so it maps as an aligned array.
+ALIGNMENT = 64
+# Rows dequantized at a time while scoring, bounding the float32 scratch space.
+SCORE_BLOCK = 16384
+METADATA_FIELDS = ("product_id", "product_name", "product_rating", "product_summary", "duplicate_count", "category")
+
+
+def _aligned(offset: int) -> int:
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float, np.integer, np.floating)) and not isinstance(value, (bool, np.bool_))
+
+
+def quantize_int8(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Symmetric per-row int8 codes and the float32 scales that map them back: vector ~ codes * scale."""
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+class SnapshotWriter:
+    """
+    Streams documents and their vectors into a snapshot file (see
+    VectorSnapshot). Vectors and review text are spooled to temporary files
+    as they arrive, so only the ids and metadata columns are held in memory;
+    finish() quantizes block by block and swaps the file into place.
+    """
+
+    def __init__(self, path: str, dimension: int, dtype: str = "int8", rescore: bool = True,
+                 fields: Sequence[str] = METADATA_FIELDS, embedding_model: Optional[str] = None):
+        if dtype not in ("int8", "float16"):
+            raise ValueError(f"Unknown snapshot dtype: {dtype}")
+        self.path = path
+        self.dimension = dimension
+        self.dtype = dtype
+        self.rescore = rescore
+        self.fields = list(fields)
+        self.embedding_model = embedding_model
+
+        self.ids: List[str] = []
+        self._seen = set()
+        self._columns: Dict[str, list] = {field: [] for field in self.fields}
+        self._text_offsets = [0]
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._vectors_file = open(path + ".vectors.tmp", "wb")
+        self._text_file = open(path + ".text.tmp", "wb")
+
+    def add(self, documents: Sequence[Document], vectors):
+        vectors = _normalize(vectors)
+        if vectors.ndim != 2 or vectors.shape[1] != self.dimension:
+            raise ValueError(f"Expected vectors of dimension {self.dimension}, got {vectors.shape}")
+        for doc, vector in zip(documents, vectors):
+            # The index keeps one row per id, and so does the snapshot.
+            if doc.id in self._seen:
+                continue
+            self._seen.add(doc.id)
+            self.ids.append(doc.id)
+            self._vectors_file.write(vector.tobytes())
+            text = doc.page_content.encode("utf-8")
+            self._text_file.write(text)
+            self._text_offsets.append(self._text_offsets[-1] + len(text))
+            for field in self.fields:
+                self._columns[field].append(doc.metadata.get(field))
+
+    def _encode_columns(self) -> Tuple[Dict[str, np.ndarray], dict]:
+        """Numbers as float64 (NaN when missing), anything else as int32 codes into a value list."""
+        arrays, described = {}, {}
+        for field, column in self._columns.items():
+            if all(value is None for value in column):
+                continue
+            if all(value is None or _is_number(value) for value in column):
+                arrays[field] = np.asarray([np.nan if value is None else value for value in column], dtype=np.float64)
+                described[field] = {
+                    "kind": "number",
+                    "integer": all(value is None or float(value).is_integer() for value in column),
+                }
+            else:
+                distinct = sorted({str(value) for value in column if value is not None})
+                codes = {value: code for code, value in enumerate(distinct)}
+                arrays[field] = np.asarray([codes[str(value)] if value is not None else -1 for value in column], dtype=np.int32)
+                described[field] = {"kind": "codes", "values": distinct}
+        return arrays, described
+
+    def finish(self) -> dict:
+        """Write the snapshot and return its header."""
+        try:
+            self._vectors_file.close()
+            self._text_file.close()
+            count = len(self.ids)
+            vectors = np.memmap(self.path + ".vectors.tmp", dtype=np.float32, mode="r", shape=(count, self.dimension)) \
+                if count else np.zeros((0, self.dimension), dtype=np.float32)
+
+            encoded_ids = [doc_id.encode("utf-8") for doc_id in self.ids]
+            id_offsets = np.zeros(count + 1, dtype=np.int64)
+            id_offsets[1:] = np.cumsum([len(doc_id) for doc_id in encoded_ids])
+            columns, described = self._encode_columns()
+            text_size = self._text_offsets[-1]
+
+            # (name, dtype, shape, writer): every writer emits exactly the section's bytes.
+            sections = []
+            if self.dtype == "int8":
+                sections.append(("codes", "int8", [count, self.dimension],
+                                 lambda f: self._write_blocks(f, vectors, lambda block: quantize_int8(block)[0])))
+                sections.append(("scales", "float32", [count],
+                                 lambda f: self._write_blocks(f, vectors, lambda block: quantize_int8(block)[1])))
+            else:
+                sections.append(("codes", "float16", [count, self.dimension],
+                                 lambda f: self._write_blocks(f, vectors, lambda block: block.astype(np.float16))))
+            if self.rescore:
+                sections.append(("vectors", "float32", [count, self.dimension],
+                                 lambda f: self._write_blocks(f, vectors, lambda block: block)))
+            sections.append(("id_offsets", "int64", [count + 1], lambda f: f.write(id_offsets.tobytes())))
+            sections.append(("ids", "uint8", [int(id_offsets[-1])], lambda f: f.write(b"".join(encoded_ids))))
+            sections.append(("text_offsets", "int64", [count + 1],
+                             lambda f: f.write(np.asarray(self._text_offsets, dtype=np.int64).tobytes())))
+            sections.append(("text", "uint8", [text_size], self._copy_text))
+            for field, column in columns.items():
+                sections.append((f"column.{field}", column.dtype.name, [count],
+                                 lambda f, column=column: f.write(column.tobytes())))
+
+            layout, offset = {}, 0
+            for name, dtype, shape, _ in sections:
+                offset = _aligned(offset)
+                layout[name] = {"offset": offset, "dtype": dtype, "shape": shape}
+                offset += int(np.prod(shape)) * np.dtype(dtype).itemsize
+
+            header = {
+                "version": VERSION,
+                "count": count,
+                "dimension": self.dimension,
+                "dtype": self.dtype,
+                "rescore": self.rescore,
+                "embedding_model": self.embedding_model,
+                # The ids hash each review's content, so this identifies the indexed data.
+                "content_hash": hashlib.sha256(b"\n".join(encoded_ids)).hexdigest(),
+                "created_at": time.time(),
+                "columns": described,
+                "sections": layout,
+            }
+            header_bytes = json.dumps(header, default=_json_default).encode("utf-8")
+            data_start = _aligned(len(MAGIC) + 8 + len(header_bytes))
+
+            with open(self.path + ".tmp", "wb") as f:
+                f.write(MAGIC)
+                f.write(struct.pack("<Q", len(header_bytes)))
+                f.write(header_bytes)
+                for name, _, _, write in sections:
+                    f.write(b"\0" * (data_start + layout[name]["offset"] - f.tell()))
+                    write(f)
+            del vectors
+            # Readers that mapped the previous snapshot keep its inode until they reopen.
+            os.replace(self.path + ".tmp", self.path)
+            self._cleanup()
+            logging.info(
+                f"Vector snapshot written to {self.path}: {count} vectors as {self.dtype}, "
+                f"{os.path.getsize(self.path)} bytes, content {header['content_hash'][:12]}"
+            )
+            return header
+        except Exception as e:
+            self._cleanup()
+            raise RAGException(f"Error writing vector snapshot: {e}", sys)
+
+    @staticmethod
+    def _write_blocks(f, vectors: np.ndarray, convert):
+        for start in range(0, len(vectors), SCORE_BLOCK):
+            f.write(np.ascontiguousarray(convert(np.asarray(vectors[start:start + SCORE_BLOCK]))).tobytes())
+
+    def _copy_text(self, f):
+        with open(self.path + ".text.tmp", "rb") as text:
+            while chunk := text.read(1 << 20):
+                f.write(chunk)
+
+    def _cleanup(self):
+        for suffix in (".vectors.tmp", ".text.tmp"):
+            if os.path.exists(self.path + suffix):
+                os.remove(self.path + suffix)
+
+
+class VectorSnapshot:
+    """
+    Read-only, memory-mapped index over a snapshot file: one versioned file
+    holding the vectors quantized to int8 (with a float32 scale per row) or
+    float16, optional full-precision vectors for re-scoring, the metadata as
+    columns and the review text and ids as byte blobs addressed by offsets.
+
+    Loading parses the JSON header and maps the file; every section is a
+    numpy view over the mapping, so nothing is copied and pages are read on
+    first touch. Search scores the quantized vectors, then re-scores the
+    best ``k * rescore_factor`` candidates against the float32 vectors; only
+    those rows of the float32 block are ever paged in, which keeps resident
+    memory at about a quarter of the float32 index for int8.
+
+    It has the read interface of LocalVectorIndex, so a LocalVectorStore
+    can serve it.
+    """
+
+    def __init__(self, path: str, header: dict, buffer: mmap.mmap, data_start: int, rescore_factor: int = 4):
+        self.path = path
+        self.header = header
+        self.dimension = header["dimension"]
+        self.rescore_factor = rescore_factor
+        self._buffer = buffer
+        self._ids = None
+
+        def section(name: str) -> Optional[np.ndarray]:
+            spec = header["sections"].get(name)
+            if spec is None:
+                return None
+            count = int(np.prod(spec["shape"]))
+            if not count:
+                return np.zeros(spec["shape"], dtype=spec["dtype"])
+            return np.frombuffer(buffer, dtype=spec["dtype"], count=count,
+                                 offset=data_start + spec["offset"]).reshape(spec["shape"])
+
+        self.codes = section("codes")
+        self.scales = section("scales")
+        self.vectors = section("vectors")
+        self.id_offsets = section("id_offsets")
+        self.id_bytes = section("ids")
+        self.text_offsets = section("text_offsets")
+        self.text_bytes = section("text")
+        self.columns = {field: section(f"column.{field}") for field in header["columns"]}
+        self.column_values = {
+            field: described["values"] for field, described in header["columns"].items()
+            if described["kind"] == "codes"
+        }
+
+    @classmethod
+    def load(cls, path: str, rescore_factor: int = 4, embedding_model: Optional[str] = None) -> "VectorSnapshot":
+        """Map a snapshot written by SnapshotWriter; only the header is read."""
+        try:
+            with open(path, "rb") as f:
+                if f.read(len(MAGIC)) != MAGIC:
+                    raise ValueError(f"{path} is not a vector snapshot")
+                (header_size,) = struct.unpack("<Q", f.read(8))
+                header = json.loads(f.read(header_size))
+                if header["version"] != VERSION:
+                    raise ValueError(f"Unsupported snapshot version {header['version']}, expected {VERSION}")
+                if embedding_model and header.get("embedding_model") not in (None, embedding_model):
+                    raise ValueError(
+                        f"Snapshot was embedded with {header['embedding_model']}, but the model is {embedding_model}"
+                    )
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            snapshot = cls(path, header, buffer, _aligned(len(MAGIC) + 8 + header_size), rescore_factor)
+            logging.info(
+                f"Vector snapshot loaded from {path} with {header['count']} {header['dtype']} vectors, "
+                f"content {header['content_hash'][:12]}"
+            )
+            return snapshot
+        except Exception as e:
+            raise RAGException(f"Error loading vector snapshot: {e}", sys)
+
+    @property
+    def content_hash(self) -> str:
+        return self.header["content_hash"]
+
+    def __len__(self) -> int:
+        return self.header["count"]
+
+    def _id(self, row: int) -> str:
+        return self.id_bytes[self.id_offsets[row]:self.id_offsets[row + 1]].tobytes().decode("utf-8")
+
+    def ids(self) -> List[str]:
+        """Ids of the stored rows, in row order."""
+        if self._ids is None:
+            self._ids = [self._id(row) for row in range(len(self))]
+        return self._ids
+
+    def get_record(self, row: int) -> dict:
+        text = self.text_bytes[self.text_offsets[row]:self.text_offsets[row + 1]].tobytes().decode("utf-8")
+        metadata = {}
+        for field, column in self.columns.items():
+            value = column[row]
+            if field in self.column_values:
+                if value >= 0:
+                    metadata[field] = self.column_values[field][value]
+            elif not np.isnan(value):
+                metadata[field] = int(value) if self.header["columns"][field]["integer"] else float(value)
+        return {"id": self._id(row), "page_content": text, "metadata": metadata}
+
+    def mask(self, metadata_filter: Optional[dict]) -> Optional[np.ndarray]:
+        """Boolean row mask for a Pinecone-style metadata filter on the stored columns."""
+        if not metadata_filter:
+            return None
+        return column_mask(self.columns, self.column_values, metadata_filter, len(self))
+
+    def _approximate_scores(self, query: np.ndarray, rows: Optional[np.ndarray]) -> np.ndarray:
+        count = len(self) if rows is None else len(rows)
+        scores = np.empty(count, dtype=np.float32)
+        for start in range(0, count, SCORE_BLOCK):
+            stop = min(start + SCORE_BLOCK, count)
+            block = slice(start, stop) if rows is None else rows[start:stop]
+            scores[start:stop] = self.codes[block].astype(np.float32) @ query
+            if self.scales is not None:
+                scores[start:stop] *= self.scales[block]
+        return scores
+
+    def search(self, query_vector: np.ndarray, k: int,
+               mask: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+        """Return (row, cosine similarity) pairs for the k nearest rows allowed by mask."""
+        if not len(self):
+            return []
+        query = _normalize(query_vector).reshape(-1)
+        rows = np.flatnonzero(mask) if mask is not None else np.arange(len(self))
+        if not len(rows):
+            return []
+
+        scores = self._approximate_scores(query, rows if mask is not None else None)
+        if self.vectors is None:
+            best = _top_k(scores, k)
+            return [(int(rows[i]), float(scores[i])) for i in best]
+
+        # Sorted rows read the float32 block front to back.
+        candidates = np.sort(rows[_top_k(scores, k * self.rescore_factor)])
+        exact = self.vectors[candidates] @ query
+        best = _top_k(exact, k)
+        return [(int(candidates[i]), float(exact[i])) for i in best]
+
+    def add(self, *args, **kwargs):
+        raise NotImplementedError("A vector snapshot is read-only; export a new one from ingestion")
+
+    def delete(self, *args, **kwargs):
+        raise NotImplementedError("A vector snapshot is read-only; export a new one from ingestion")
+
+    def save(self):
+        raise NotImplementedError("A vector snapshot is read-only; export a new one from ingestion")
@@ -0,0 +1,111 @@
+import os
+import sys
+import time
+from box import ConfigBox
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+from rag.exception.exception import RAGException
+from rag.logging.logger import logging
+from rag.vector_store.local_index import LocalVectorIndex
+from rag.vector_store.local_store import LocalVectorStore
+from rag.vector_store.shards import ShardedVectorStore, load_shard_classifier
+from rag.vector_store.snapshot import VectorSnapshot
+
+
+class VectorStoreLoader:
+    """
+    Opens the vector store selected by ``data_ingestion.vector_backend``:
+    the hosted Pinecone index or the in-process local index. With sharding
+    enabled, every category shard gets its own Pinecone namespace or local
+    index partition, combined behind a ShardedVectorStore.
+
+    load_snapshot() opens the read-only vector snapshot exported by
+    ingestion instead, for retrievers that serve from it.
+    """
+
+    def __init__(self, config: ConfigBox):
+        self.config = config.data_ingestion
+        self.classifier = load_shard_classifier(config.get("sharding"))
+        self.snapshot_config = config.get("snapshot")
+        self.model_name = config.Model_loader.model_name
+
+    @property
+    def backend(self) -> str:
+        return self.config.get("vector_backend", "pinecone")
+
+    def load_vector_store(self, embeddings: Embeddings) -> VectorStore:
+        if self.backend == "local":
+            return self._load_local(embeddings)
+        if self.backend == "pinecone":
+            return self._load_pinecone(embeddings)
+        raise ValueError(f"Unknown vector backend: {self.backend}")
+
+    def load_snapshot(self, embeddings: Embeddings) -> VectorStore:
+        try:
+            config = self.snapshot_config
+            snapshot = VectorSnapshot.load(
+                config.path, rescore_factor=config.rescore_factor, embedding_model=self.model_name
+            )
+            return LocalVectorStore(embedding=embeddings, index=snapshot)
+        except Exception as e:
+            raise RAGException(f"Error loading vector snapshot: {e}", sys)
+
+    def _load_local(self, embeddings: Embeddings) -> VectorStore:
+        try:
+            config = self.config
+
+            def partition(index_dir: str) -> LocalVectorStore:
+                index = LocalVectorIndex.load_or_create(
+                    index_dir,
+                    dimension=config.dimension,
+                    index_type=config.local_index_type,
+                    nlist=config.ivf_nlist,
+                    nprobe=config.ivf_nprobe,
+                    filter_fields=config.filter_fields,
+                )
+                return LocalVectorStore(embedding=embeddings, index=index)
+
+            if self.classifier is None:
+                return partition(config.local_index_dir)
+            shards = {
+                name: partition(os.path.join(config.local_index_dir, "shards", name))
+                for name in self.classifier.shard_names
+            }
+            logging.info(f"Opened local index partitions {list(shards)}")
+            return ShardedVectorStore(embeddings, shards, default=self.classifier.default)
+        except Exception as e:
+            raise RAGException(f"Error loading local vector store: {e}", sys)
+
+    def _load_pinecone(self, embeddings: Embeddings) -> VectorStore:
+        try:
+            # Imported here so the local backend works without the Pinecone client.
+            from langchain_pinecone import PineconeVectorStore
+            from pinecone import Pinecone, ServerlessSpec
+
+            config = self.config
+            pinecone_api_key = os.environ.get("PINECONE_API_KEY")
+            pc = Pinecone(api_key=pinecone_api_key)
+            index_name = config.index_name
+            existing_indexes = [index_info["name"] for index_info in pc.list_indexes()]
+
+            if index_name not in existing_indexes:
+                pc.create_index(
+                    name=index_name,
+                    dimension=config.dimension,
+                    metric=config.metric,
+                    spec=ServerlessSpec(cloud=config.cloud, region=config.region),
+                )
+                while not pc.describe_index(index_name).status[config.status]:
+                    time.sleep(1)
+
+            index = pc.Index(index_name)
+            logging.info(f"Connected to Pinecone index {index_name}")
+            if self.classifier is None:
+                return PineconeVectorStore(index=index, embedding=embeddings)
+            shards = {
+                name: PineconeVectorStore(index=index, embedding=embeddings, namespace=name)
+                for name in self.classifier.shard_names
+            }
+            return ShardedVectorStore(embeddings, shards, default=self.classifier.default)
+        except Exception as e:
+            raise RAGException(f"Error connecting to Pinecone: {e}", sys)
@@ -0,0 +1,48 @@
+import os
+import shutil
+
+import pytest
+import yaml
+
+from benchmarks import fakes
+from benchmarks.run import REPO_ROOT, install_fakes
+from benchmarks.synthetic_data import write_csv
+
+
+@pytest.fixture
+def no_latency(monkeypatch):
+    """Run the benchmark fakes without their injected delays."""
+    for name in fakes.LATENCY:
+        monkeypatch.setitem(fakes.LATENCY, name, 0.0)
+
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch, no_latency):
+    """
+    A working directory laid out like the repo, with a small synthetic CSV,
+    the local vector backend and the offline fakes in place of the encoder,
+    the LLM and the network round trips. Returns a function that rewrites
+    config values: workspace(section={"key": value}).
+    """
+    from rag.model_loaders.model_registry import ModelRegistry
+
+    with open(os.path.join(REPO_ROOT, "config", "config.yaml")) as f:
+        config = yaml.safe_load(f)
+    config["data_ingestion"].update({"vector_backend": "local", "embedding_workers": 0, "retry_backoff_seconds": 0})
+    os.makedirs(tmp_path / "config")
+    write_csv(str(tmp_path / "data" / "flipkart_product_review.csv"), 300, 10, 0.1, 0)
+    shutil.copytree(os.path.join(REPO_ROOT, "templates"), tmp_path / "templates")
+    shutil.copytree(os.path.join(REPO_ROOT, "static"), tmp_path / "static")
+
+    def configure(**sections):
+        for section, values in sections.items():
+            config.setdefault(section, {}).update(values)
+        with open(tmp_path / "config" / "config.yaml", "w") as f:
+            yaml.safe_dump(config, f)
+        ModelRegistry._instances.clear()
+
+    monkeypatch.chdir(tmp_path)
+    install_fakes()
+    configure()
+    yield configure
+    ModelRegistry._instances.clear()
@@ -0,0 +1,61 @@
+import time
+
+import pytest
+
+from rag.cache.answer_cache import AnswerCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    return now
+
+
+def test_hit_above_threshold_and_miss_below(clock):
+    cache = AnswerCache(similarity_threshold=0.9, ttl_seconds=60, max_entries=4)
+    cache.store([1, 0, 0], "answer")
+
+    assert cache.lookup([1, 0.1, 0]) == "answer"
+    assert cache.lookup([0, 1, 0]) is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_expired_best_match_falls_through_to_live_entry(clock):
+    cache = AnswerCache(similarity_threshold=0.9, ttl_seconds=10, max_entries=4)
+    cache.store([1, 0, 0], "stale")
+    clock[0] += 5
+    cache.store([0.99, 0.1, 0], "fresh")
+    clock[0] += 7
+
+    assert cache.lookup([1, 0, 0]) == "fresh"
+    assert cache.stats()["entries"] == 1
+
+
+def test_expired_entries_miss(clock):
+    cache = AnswerCache(similarity_threshold=0.9, ttl_seconds=10, max_entries=4)
+    cache.store([1, 0, 0], "stale")
+    clock[0] += 11
+
+    assert cache.lookup([1, 0, 0]) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = AnswerCache(similarity_threshold=0.9, ttl_seconds=60, max_entries=2)
+    cache.store([1, 0, 0], "a")
+    cache.store([0, 1, 0], "b")
+    assert cache.lookup([1, 0, 0]) == "a"
+    cache.store([0, 0, 1], "c")
+
+    assert cache.lookup([0, 1, 0]) is None
+    assert cache.lookup([1, 0, 0]) == "a"
+
+
+def test_index_version_change_clears_cache(tmp_path, clock):
+    version_path = str(tmp_path / "index_version")
+    cache = AnswerCache(similarity_threshold=0.9, ttl_seconds=60, version_path=version_path)
+    cache.store([1, 0, 0], "answer")
+    AnswerCache.bump_version(version_path)
+
+    assert cache.lookup([1, 0, 0]) is None
@@ -0,0 +1,53 @@
+import asyncio
+
+import pytest
+
+from rag.batch.batch_runner import BatchItem, BatchRunner
+from rag.data_ingestion.data_ingestion import DataIngestion
+from rag.model_loaders.model_registry import ModelRegistry
+from rag.model_with_memory.memory import ChatHistory
+
+
+def _run(runner, questions):
+    async def collect():
+        items = [BatchItem(id=str(i), question=question) for i, question in enumerate(questions)]
+        return [result async for result in runner.arun(items)]
+    return asyncio.run(collect())
+
+
+def test_questions_are_embedded_in_one_call_without_the_embedding_cache(workspace, monkeypatch):
+    workspace(embedding_cache={"enabled": False})
+    chat_history = ChatHistory()
+    embeddings = chat_history.retriever.embeddings
+    calls = []
+    embed_documents = embeddings.embed_documents
+    monkeypatch.setattr(embeddings, "embed_documents", lambda texts: calls.append(texts) or embed_documents(texts))
+
+    questions = ["How is the bass?", "how is the bass", "Is the battery good?"]
+    results = _run(BatchRunner(chat_history), questions)
+
+    assert calls == [["How is the bass?", "Is the battery good?"]]
+    assert len(results) == 3 and all(result.answer for result in results)
+    # The batched vectors feed the answer cache, so asking again is served from it.
+    assert all(result.cached for result in _run(BatchRunner(chat_history), questions))
+
+
+@pytest.mark.parametrize("hybrid", [True, False])
+def test_retrieval_reuses_the_batched_vectors(workspace, monkeypatch, hybrid):
+    workspace(embedding_cache={"enabled": False}, answer_cache={"enabled": False}, retriever={"hybrid": hybrid})
+    ingestion = DataIngestion()
+    ingestion.vector_store(ingestion.transform_data())
+    ModelRegistry._instances.clear()
+
+    chat_history = ChatHistory()
+    embeddings = chat_history.retriever.embeddings
+    calls = []
+    embed_documents = embeddings.embed_documents
+    monkeypatch.setattr(embeddings, "embed_documents", lambda texts: calls.append(texts) or embed_documents(texts))
+    monkeypatch.setattr(embeddings, "embed_query", lambda text: pytest.fail(f"embedded {text!r} again"))
+
+    questions = ["How is the bass?", "Is the battery good?", "Does it fit well?"]
+    results = _run(BatchRunner(chat_history), questions)
+
+    assert calls == [questions]
+    assert all(result.documents and result.error is None for result in results)
@@ -0,0 +1,64 @@
+from langchain_core.documents import Document
+
+from rag.model_with_memory.context_packer import ContextPacker
+from utils.tokens import count_tokens
+
+
+def _review(product, text, **metadata):
+    return Document(page_content=text, metadata={"product_id": product, "product_name": f"Product {product}", **metadata})
+
+
+REVIEWS = [
+    _review("P1", "Battery backup is great, it lasts two full days on a single charge."),
+    _review("P2", "The bass is punchy and the sound stage is wide for this price."),
+    _review("P1", "Calls are clear and the mic picks up my voice well in traffic."),
+    _review("P3", "Pairing is quick and the bluetooth connection never drops."),
+    _review("P4", "Build quality feels cheap and the ear tips fell off in a week."),
+]
+
+
+def _tokens(documents):
+    return sum(count_tokens(doc.page_content) for doc in documents)
+
+
+def test_passages_stop_at_the_token_budget():
+    everything = ContextPacker(max_tokens=1000).pack("battery life?", REVIEWS)
+    assert "fell off" in everything[-1].page_content
+
+    packed = ContextPacker(max_tokens=60).pack("battery life?", REVIEWS)
+    text = "\n".join(doc.page_content for doc in packed)
+    assert _tokens(packed) <= 60
+    # Retrieval order wins: the first passages are kept and the rest cut off.
+    assert "Battery backup" in text and "bass is punchy" in text
+    assert "fell off" not in text
+
+
+def test_reviews_of_one_product_share_a_header():
+    packed = ContextPacker(max_tokens=1000).pack("battery", REVIEWS[:3])
+    assert [doc.metadata["product_id"] for doc in packed] == ["P1", "P2"]
+    assert packed[0].page_content.splitlines() == [
+        "Product: Product P1",
+        "- " + REVIEWS[0].page_content,
+        "- " + REVIEWS[2].page_content,
+    ]
+
+
+def test_first_passage_is_cut_to_fit_a_small_budget():
+    long_review = _review(
+        "P1", " ".join(f"Sentence {i} talks about the case and the colour." for i in range(30))
+        + " The battery lasts two days.",
+    )
+    packed = ContextPacker(max_tokens=40, max_passage_tokens=200).pack("how long does the battery last", [long_review])
+
+    assert len(packed) == 1 and _tokens(packed) <= 40
+    assert "battery lasts two days" in packed[0].page_content
+
+
+def test_near_duplicate_passages_are_dropped():
+    duplicate = _review("P5", REVIEWS[0].page_content + " Recommended.", product_rating=5)
+    packed = ContextPacker(max_tokens=1000).pack("battery", [REVIEWS[0], duplicate])
+    assert [doc.metadata["product_id"] for doc in packed] == ["P1"]
+
+
+def test_disabled_packer_returns_documents_unchanged():
+    assert ContextPacker(max_tokens=10, enabled=False).pack("battery", REVIEWS) == REVIEWS
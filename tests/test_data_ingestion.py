@@ -0,0 +1,70 @@
+import json
+
+import pytest
+
+from langchain_core.documents import Document
+
+from rag.data_ingestion.data_ingestion import DataIngestion
+from rag.exception.exception import RAGException
+from rag.model_loaders.model_registry import ModelRegistry
+
+
+def _document_ids():
+    return {doc.id for doc in DataIngestion().transform_data()}
+
+
+def test_rerun_skips_ingested_documents(workspace):
+    _, inserted = DataIngestion().vector_store(DataIngestion().transform_data())
+    assert set(inserted) == _document_ids()
+
+    ModelRegistry._instances.clear()
+    rerun = DataIngestion()
+    _, inserted = rerun.vector_store(rerun.transform_data())
+    assert inserted == [] and rerun.skipped == len(_document_ids())
+
+
+def test_run_killed_between_batches_is_recovered(workspace, monkeypatch):
+    workspace(data_ingestion={"embed_batch_size": 50, "upload_workers": 1, "max_retries": 0})
+    ingestion = DataIngestion()
+    uploads = []
+    original = DataIngestion._upsert_embeddings
+
+    def crash_after_first_batch(self, *args):
+        if uploads:
+            raise RuntimeError("killed")
+        uploads.append(args)
+        original(self, *args)
+
+    monkeypatch.setattr(DataIngestion, "_upsert_embeddings", crash_after_first_batch)
+    with pytest.raises(RAGException):
+        ingestion.vector_store(ingestion.transform_data())
+    monkeypatch.setattr(DataIngestion, "_upsert_embeddings", original)
+    assert len(uploads) == 1
+
+    # A new process: nothing of the failed run survives but its files.
+    ModelRegistry._instances.clear()
+    rerun = DataIngestion()
+    vector_store, _ = rerun.vector_store(rerun.transform_data())
+    assert set(vector_store.index.ids()) == _document_ids()
+
+
+def test_pinecone_upserts_stay_under_request_limits(workspace):
+    workspace(data_ingestion={"pinecone_upsert_batch_size": 100, "pinecone_upsert_max_bytes": 200_000})
+    requests = []
+
+    class Index:
+        def upsert(self, vectors, namespace=None):
+            requests.append(vectors)
+
+    class PineconeLike:
+        index = Index()
+
+    documents = [
+        Document(id=str(i), page_content=("long review " * 1000 if i % 10 == 0 else "short"), metadata={})
+        for i in range(250)
+    ]
+    DataIngestion()._upsert_embeddings(PineconeLike(), documents, [[0.1] * 384] * len(documents))
+
+    assert [record[0] for request in requests for record in request] == [doc.id for doc in documents]
+    assert all(len(request) <= 100 for request in requests)
+    assert all(len(json.dumps(request)) <= 200_000 for request in requests)
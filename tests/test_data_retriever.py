@@ -0,0 +1,54 @@
+import asyncio
+import os
+
+from langchain_core.documents import Document
+
+from rag.data_ingestion.data_ingestion import DataIngestion
+from rag.data_ingestion.product_catalog import ProductCatalog
+from rag.model_loaders.model_registry import ModelRegistry
+from rag.retriever.data_retriever import DataRetriever
+
+
+def _ingest():
+    ingestion = DataIngestion()
+    ingestion.vector_store(ingestion.transform_data())
+    ModelRegistry._instances.clear()
+
+
+def test_reranker_receives_every_candidate_from_hybrid_search(workspace, monkeypatch):
+    workspace(
+        reranker={"enabled": True, "scorer": "overlap", "candidates": 20},
+        retriever={"hybrid": True, "dense_k": 8, "sparse_k": 8, "product_routing": False},
+    )
+    _ingest()
+    retriever = DataRetriever()
+    retriever.load_retriever()
+    received = []
+    rerank = retriever.reranker.rerank
+    monkeypatch.setattr(retriever.reranker, "rerank", lambda query, docs: received.append(len(docs)) or rerank(query, docs))
+
+    documents = asyncio.run(retriever.acall_retriever("good sound quality and battery"))
+
+    assert received == [20]
+    assert len(documents) == retriever.reranker.top_k
+
+
+def test_router_reloads_the_catalog_after_a_reingest(workspace):
+    workspace(retriever={"product_routing": True})
+    _ingest()
+    retriever = DataRetriever()
+    retriever.load_retriever()
+    catalog_path = retriever.config.data_ingestion.product_catalog_path
+    catalog = ProductCatalog.load_if_exists(catalog_path)
+    assert "NEW1" not in retriever.router.catalog.products
+
+    catalog.add(Document(page_content="Loud and clear", metadata={
+        "product_id": "NEW1", "product_name": "Zylophonic Aurora Earbuds", "product_rating": 5,
+    }))
+    catalog.save(catalog_path)
+    stat = os.stat(catalog_path)
+    os.utime(catalog_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+    plan = retriever._route("Is the Zylophonic Aurora any good?")
+    assert "NEW1" in retriever.router.catalog.products
+    assert plan.filter == {"product_id": "NEW1"}
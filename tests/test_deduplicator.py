@@ -0,0 +1,49 @@
+import os
+
+from rag.data_ingestion.deduplicator import ReviewDeduplicator
+
+REVIEW = "The bass is deep and the battery easily lasts two full days of heavy use."
+
+
+def test_clusters_exact_and_near_duplicates_per_key(tmp_path):
+    dedup = ReviewDeduplicator(scratch_dir=str(tmp_path))
+    owners = [
+        dedup.add(("P1", 5), REVIEW),
+        dedup.add(("P1", 5), REVIEW.upper() + "!!"),
+        dedup.add(("P1", 5), REVIEW.replace("two", "2")),
+        dedup.add(("P1", 4), REVIEW),
+        dedup.add(("P1", 5), "Stopped charging after a week."),
+    ]
+
+    assert owners == [0, 0, 0, 3, 4]
+    assert (dedup.rows, dedup.representatives, dedup.collapsed, dedup.near_duplicate_rows) == (5, 3, 2, 1)
+    assert dedup.duplicates_between(0, 5) == {1, 2}
+    assert dedup.duplicates_between(2, 5) == {2}
+    assert dedup.counts_between(0, 5) == {0: 3, 3: 1, 4: 1}
+
+    dedup.close()
+    assert not os.path.exists(dedup.path)
+
+
+def test_concurrent_runs_get_their_own_scratch_files(tmp_path):
+    first = ReviewDeduplicator(scratch_dir=str(tmp_path))
+    second = ReviewDeduplicator(scratch_dir=str(tmp_path))
+    assert first.path != second.path
+    assert os.path.dirname(first.path) == str(tmp_path)
+
+    first.add("P1", REVIEW)
+    second.add("P1", REVIEW)
+    second.add("P1", REVIEW)
+    assert first.collapsed == 0 and second.collapsed == 1
+
+    first.close()
+    assert not os.path.exists(first.path) and os.path.exists(second.path)
+    assert second.add("P1", REVIEW) == 0
+    second.close()
+    assert os.listdir(tmp_path) == []
+
+
+def test_exact_only(tmp_path):
+    dedup = ReviewDeduplicator(near_duplicates=False)
+    owners = [dedup.add("P1", REVIEW), dedup.add("P1", REVIEW + "?"), dedup.add("P1", REVIEW.replace("two", "2"))]
+    assert owners == [0, 0, 2]
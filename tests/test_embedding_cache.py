@@ -0,0 +1,60 @@
+from benchmarks.fakes import FakeEmbeddings
+from rag.cache.embedding_cache import CachedEmbeddings
+
+
+class CountingEmbeddings(FakeEmbeddings):
+    def __init__(self, dimension: int = 8):
+        super().__init__(dimension=dimension)
+        self.documents = []
+        self.queries = []
+
+    def embed_documents(self, texts):
+        self.documents += texts
+        return super().embed_documents(texts)
+
+    def embed_query(self, text):
+        self.queries.append(text)
+        return super().embed_query(text)
+
+
+def test_memory_tier_falls_through_to_sqlite(tmp_path, no_latency):
+    path = str(tmp_path / "embeddings.sqlite")
+    underlying = CountingEmbeddings()
+    cache = CachedEmbeddings(underlying, "model-a", cache_path=path, max_memory_items=2)
+
+    vectors = cache.embed_documents(["bass", "battery", "mic", "bass"])
+    assert underlying.documents == ["bass", "battery", "mic"]
+    assert vectors[0] == vectors[3]
+    # The LRU tier holds the two most recent texts; the oldest is only on disk now.
+    assert len(cache._memory) == 2
+
+    assert cache.embed_documents(["mic", "bass"]) == [vectors[2], vectors[0]]
+    assert underlying.documents == ["bass", "battery", "mic"]
+    assert cache.stats()["memory_hits"] == 1 and cache.stats()["disk_hits"] == 1
+
+    # A fresh process with an empty memory tier reads everything from SQLite.
+    reopened = CachedEmbeddings(CountingEmbeddings(), "model-a", cache_path=path)
+    assert reopened.embed_documents(["battery"]) == [vectors[1]]
+    assert reopened.underlying.documents == [] and reopened.stats()["disk_hits"] == 1
+
+
+def test_keys_separate_models_and_kinds(tmp_path, no_latency):
+    path = str(tmp_path / "embeddings.sqlite")
+    model_a = CachedEmbeddings(CountingEmbeddings(), "model-a", cache_path=path)
+    model_b = CachedEmbeddings(CountingEmbeddings(), "model-b", cache_path=path)
+
+    model_a.embed_documents(["good sound"])
+    model_b.embed_documents(["good sound"])
+    assert model_b.underlying.documents == ["good sound"]
+
+    # A query is cached apart from a document with the same text.
+    model_a.embed_query("good sound")
+    assert model_a.underlying.queries == ["good sound"]
+    model_a.embed_query("good sound")
+    assert model_a.underlying.queries == ["good sound"]
+
+    # Batched queries share the query entries.
+    model_a.embed_queries(["good sound", "loud"])
+    assert model_a.underlying.documents == ["good sound", "loud"]
+    model_a.embed_query("loud")
+    assert model_a.underlying.queries == ["good sound"]
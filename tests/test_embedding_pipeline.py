@@ -0,0 +1,64 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+
+from benchmarks.fakes import FakeEmbeddings
+from rag.data_ingestion.embedding_pipeline import EmbeddingPipeline
+
+
+def _batches(count: int, size: int = 5):
+    return [[Document(id=f"{b}-{i}", page_content=f"review {b} {i}") for i in range(size)] for b in range(count)]
+
+
+def _encode_or_die(marker: str, texts):
+    # The first call kills its worker process, as an out-of-memory kill would.
+    if not os.path.exists(marker):
+        open(marker, "w").close()
+        os._exit(1)
+    return np.ones((len(texts), 4), dtype=np.float32)
+
+
+class DyingWorkerPipeline(EmbeddingPipeline):
+    marker = None
+
+    def _start_pool(self):
+        self._executor = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+
+    def _submit(self, texts):
+        return self._executor.submit(_encode_or_die, self.marker, texts)
+
+
+def test_every_batch_is_uploaded_with_its_vectors(no_latency):
+    uploaded = []
+    pipeline = EmbeddingPipeline(FakeEmbeddings(), "fake", upload_workers=2)
+    report = pipeline.run(_batches(4), lambda batch, vectors: uploaded.append((len(batch), len(vectors))))
+
+    assert sorted(uploaded) == [(5, 5)] * 4
+    assert (report.documents, report.batches) == (20, 4)
+
+
+def test_failed_uploads_are_not_counted(no_latency):
+    pipeline = EmbeddingPipeline(FakeEmbeddings(), "fake", upload_workers=1, max_retries=1,
+                                 retry_backoff_seconds=0)
+
+    def upload(batch, vectors):
+        if batch[0].id.startswith("1-"):
+            raise ConnectionError("upsert rejected")
+
+    with pytest.raises(ConnectionError):
+        pipeline.run(_batches(2), upload)
+    assert (pipeline.report.documents, pipeline.report.batches, pipeline.report.retries) == (5, 1, 1)
+
+
+def test_dead_worker_process_is_replaced(tmp_path):
+    pipeline = DyingWorkerPipeline(FakeEmbeddings(), "fake", workers=1, max_retries=2, retry_backoff_seconds=0)
+    pipeline.marker = str(tmp_path / "died")
+    uploaded = []
+    report = pipeline.run(_batches(3), lambda batch, vectors: uploaded.append(len(vectors)))
+
+    assert os.path.exists(pipeline.marker)
+    assert uploaded == [5, 5, 5] and report.documents == 15
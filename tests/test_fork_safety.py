@@ -0,0 +1,49 @@
+import importlib
+import os
+import sys
+
+from benchmarks.fakes import FakeEmbeddings
+from rag.cache.embedding_cache import CachedEmbeddings
+from rag.model_loaders.llm_gateway import shared_http_clients
+from rag.model_loaders.model_registry import ModelRegistry
+
+
+def test_embedding_cache_opens_its_own_connection_after_a_fork(tmp_path, monkeypatch):
+    cache = CachedEmbeddings(FakeEmbeddings(), "fake", cache_path=str(tmp_path / "embeddings.sqlite"))
+    assert cache._db is None
+    cache.embed_documents(["good bass"])
+    parent_db = cache._db
+
+    monkeypatch.setattr(os, "getpid", lambda: -1)
+    cache._memory.clear()
+    cache.embed_documents(["good bass"])
+
+    assert cache._db is not parent_db
+    assert cache.disk_hits == 1
+
+
+def test_http_clients_are_per_process(monkeypatch):
+    parent = shared_http_clients(10, 5)
+    assert shared_http_clients(10, 5) is parent
+    monkeypatch.setattr(os, "getpid", lambda: -1)
+    assert shared_http_clients(10, 5) is not parent
+
+
+def test_preload_skips_network_clients(workspace):
+    workspace(data_ingestion={"vector_backend": "pinecone"})
+    registry = ModelRegistry.get()
+    registry.preload()
+    assert set(registry._models) == {"embeddings"}
+
+
+def test_preload_maps_the_local_index(workspace):
+    registry = ModelRegistry.get()
+    registry.preload()
+    assert set(registry._models) == {"embeddings", "vector_store"}
+
+
+def test_app_import_builds_no_chat_history(workspace):
+    sys.modules.pop("main", None)
+    main = importlib.import_module("main")
+    assert main._chat_history is None
+    assert "llm" not in main.registry._models
@@ -0,0 +1,82 @@
+import math
+
+import pytest
+from langchain_core.documents import Document
+
+from rag.retriever.bm25 import BM25Builder, BM25Index, tokenize
+from rag.retriever.hybrid_retriever import reciprocal_rank_fusion
+
+DOCUMENTS = [
+    Document(id="a", page_content="bass is great and battery is great", metadata={"product_name": "boAt Rockerz 235v2"}),
+    Document(id="b", page_content="battery backup is average", metadata={"product_name": "realme Buds"}),
+    Document(id="c", page_content="sound quality is great for the price", metadata={"product_name": "JBL Tune"}),
+    Document(id="d", page_content="the bass boost is weak", metadata={"product_name": "boAt Rockerz 255"}),
+    Document(id="e", page_content="calls are clear and pairing is quick", metadata={"product_name": "Noise Buds"}),
+]
+
+
+@pytest.fixture
+def bm25(tmp_path):
+    builder = BM25Builder(str(tmp_path / "bm25"))
+    for doc in DOCUMENTS:
+        builder.add(doc)
+    builder.save()
+    return BM25Index(str(tmp_path / "bm25"))
+
+
+def _reference_scores(query, k1=1.2, b=0.75):
+    """Okapi BM25 computed directly from the token lists."""
+    corpus = [tokenize(doc.page_content) + tokenize(doc.metadata["product_name"]) for doc in DOCUMENTS]
+    average = sum(map(len, corpus)) / len(corpus)
+    scores = {}
+    for doc, tokens in zip(DOCUMENTS, corpus):
+        score = 0.0
+        for term in set(tokenize(query)):
+            frequency = sum(term in other for other in corpus)
+            tf = tokens.count(term)
+            if tf:
+                idf = math.log(1 + (len(corpus) - frequency + 0.5) / (frequency + 0.5))
+                score += idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * len(tokens) / average))
+        if score:
+            scores[doc.id] = score
+    return scores
+
+
+@pytest.mark.parametrize("query", ["great bass", "battery backup", "boat rockerz bass", "quick pairing calls"])
+def test_csr_scores_match_okapi_bm25(bm25, query):
+    expected = _reference_scores(query)
+    results = bm25.search(query, k=len(DOCUMENTS))
+
+    assert {doc.id: score for doc, score in results} == pytest.approx(expected, rel=1e-5)
+    assert [doc.id for doc, _ in results] == sorted(expected, key=expected.get, reverse=True)
+
+
+def test_exact_model_number_ranks_first(bm25):
+    results = bm25.search("is the 235v2 any good", k=3)
+    assert results[0][0].id == "a"
+    assert bm25.search("unknown words only", k=3) == []
+
+
+def test_filter_skips_other_products(bm25):
+    results = bm25.search("bass", k=2, filter={"product_name": "boAt Rockerz 255"})
+    assert [doc.id for doc, _ in results] == ["d"]
+
+
+def _docs(*ids):
+    return [Document(id=doc_id, page_content=doc_id) for doc_id in ids]
+
+
+def test_rrf_rewards_documents_ranked_by_both_lists():
+    fused = reciprocal_rank_fusion([_docs("a", "b", "c"), _docs("c", "d", "a")], [1.0, 1.0], rrf_k=60, top_k=4)
+    # a: 1/61 + 1/63, c: 1/63 + 1/61 tie and beat b (1/62) and d (1/62); ties keep first-seen order.
+    assert [doc.id for doc in fused] == ["a", "c", "b", "d"]
+
+
+def test_rrf_weights_shift_the_ranking():
+    dense, sparse = _docs("a", "b"), _docs("c", "d")
+    assert [doc.id for doc in reciprocal_rank_fusion([dense, sparse], [1.0, 1.0], 60, 4)] == ["a", "c", "b", "d"]
+    # Doubling the sparse weight puts both sparse results ahead: 2/62 > 1/61.
+    assert [doc.id for doc in reciprocal_rank_fusion([dense, sparse], [1.0, 2.0], 60, 4)] == ["c", "d", "a", "b"]
+    # A zero weight keeps a list's documents but ranks them last.
+    assert [doc.id for doc in reciprocal_rank_fusion([dense, sparse], [0.0, 1.0], 60, 3)] == ["c", "d", "a"]
+    assert [doc.id for doc in reciprocal_rank_fusion([dense, sparse], [1.0, 1.0], 60, 1)] == ["a"]
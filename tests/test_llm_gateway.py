@@ -0,0 +1,167 @@
+import asyncio
+import itertools
+import time
+from typing import ClassVar, List
+
+import pytest
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessageChunk
+from langchain_core.outputs import ChatResult
+
+from benchmarks import fakes
+from benchmarks.fakes import FakeChatModel
+from rag.model_loaders.llm_gateway import LLMGateway
+
+
+class RateLimitError(Exception):
+    status_code = 429
+
+
+class RateLimitedModel(BaseChatModel):
+    @property
+    def _llm_type(self) -> str:
+        return "rate-limited"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        raise RateLimitError("rate limited")
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        raise RateLimitError("rate limited")
+
+
+class RecordingStream:
+    """
+    A two-chunk stream whose first chunk takes ``delay`` seconds and which
+    records aclose(). A stubborn stream answers even when cancelled, like a
+    client finishing a read it cannot abort.
+    """
+
+    def __init__(self, delay: float, stubborn: bool):
+        self.delay = delay
+        self.stubborn = stubborn
+        self.chunks = iter(["good", " bass"])
+        self.closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            if not self.stubborn:
+                raise
+        self.delay = 0
+        try:
+            return AIMessageChunk(content=next(self.chunks))
+        except StopIteration:
+            raise StopAsyncIteration
+
+    async def aclose(self):
+        self.closed = True
+
+
+class RecordingStreamModel(FakeChatModel):
+    """Opens RecordingStreams, the n-th with the n-th of ``delays``."""
+
+    delays: ClassVar[List[float]] = []
+    stubborn: ClassVar[bool] = False
+    opened: ClassVar[List[RecordingStream]] = []
+
+    def astream(self, messages, stop=None, **kwargs):
+        stream = RecordingStream(self.delays[len(self.opened)], self.stubborn)
+        self.opened.append(stream)
+        return stream
+
+
+@pytest.fixture
+def slow_every(no_latency, monkeypatch):
+    """Make every ``every``-th fake LLM call, starting with the first, take ``seconds`` longer."""
+    def configure(every: int, seconds: float):
+        monkeypatch.setitem(fakes.LATENCY, "llm_tail_every", every)
+        monkeypatch.setitem(fakes.LATENCY, "llm_tail_ms", seconds * 1000)
+        monkeypatch.setattr(fakes, "_CALLS", itertools.count())
+    return configure
+
+
+def _gateway(**kwargs) -> LLMGateway:
+    return LLMGateway(**{"primary": FakeChatModel(model="primary"), "timeout_seconds": 1.0,
+                         "first_token_timeout_seconds": 1.0, **kwargs})
+
+
+def _timed(coroutine):
+    started = time.perf_counter()
+    result = asyncio.run(coroutine)
+    return result, time.perf_counter() - started
+
+
+def test_hedge_answers_when_the_first_request_stalls(slow_every):
+    slow_every(2, 5.0)
+    gateway = _gateway(hedge_after_seconds=0.05)
+    message, elapsed = _timed(gateway.ainvoke("How is the bass?"))
+    assert message.content
+    assert elapsed < 0.5
+
+
+def test_fallback_answers_within_the_deadline_when_the_primary_stalls(slow_every):
+    slow_every(2, 5.0)
+    gateway = _gateway(fallback=FakeChatModel(model="fallback"), primary_deadline_share=0.5)
+    message, elapsed = _timed(gateway.ainvoke("How is the bass?"))
+    assert message.content
+    assert 0.5 <= elapsed < 1.0
+
+
+def test_deadline_covers_primary_and_fallback(slow_every):
+    slow_every(1, 5.0)
+    gateway = _gateway(fallback=FakeChatModel(model="fallback"))
+    started = time.perf_counter()
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(gateway.ainvoke("How is the bass?"))
+    assert time.perf_counter() - started < 1.3
+
+
+def test_stream_deadline_covers_primary_and_fallback(slow_every):
+    slow_every(1, 5.0)
+    gateway = _gateway(fallback=FakeChatModel(model="fallback"))
+
+    async def consume():
+        return [chunk async for chunk in gateway.astream("How is the bass?")]
+
+    started = time.perf_counter()
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(consume())
+    assert time.perf_counter() - started < 1.3
+
+
+def test_rate_limited_primary_falls_back(no_latency):
+    gateway = _gateway(primary=RateLimitedModel(), fallback=FakeChatModel(model="fallback"))
+    assert asyncio.run(gateway.ainvoke("How is the bass?")).content
+    assert gateway.invoke("How is the bass?").content
+
+
+def test_without_fallback_the_primary_has_the_whole_deadline(slow_every):
+    slow_every(1, 0.8)
+    message, elapsed = _timed(_gateway().ainvoke("How is the bass?"))
+    assert message.content and elapsed >= 0.8
+
+
+@pytest.mark.parametrize("stubborn", [
+    # The stalled first request is cancelled once the hedge answers.
+    False,
+    # The first request still succeeds after losing.
+    True,
+])
+def test_hedged_streams_that_lose_are_closed(no_latency, monkeypatch, stubborn):
+    monkeypatch.setattr(RecordingStreamModel, "delays", [5.0, 0.0])
+    monkeypatch.setattr(RecordingStreamModel, "stubborn", stubborn)
+    monkeypatch.setattr(RecordingStreamModel, "opened", [])
+    gateway = _gateway(primary=RecordingStreamModel(), hedge_after_seconds=0.01)
+
+    async def consume():
+        chunks = [chunk.content async for chunk in gateway.astream("How is the bass?")]
+        await asyncio.sleep(0.01)
+        return chunks
+
+    assert "".join(asyncio.run(consume())) == "good bass"
+    assert len(RecordingStreamModel.opened) == 2
+    assert all(stream.closed for stream in RecordingStreamModel.opened)
@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+from rag.vector_store.local_index import LocalVectorIndex
+
+DIMENSION = 16
+
+
+def _records(rows):
+    return [
+        {"page_content": f"review {row}", "metadata": {"product_id": f"P{row % 7}", "product_rating": row % 5 + 1}}
+        for row in rows
+    ]
+
+
+def _build(index_dir, vectors, **kwargs):
+    index = LocalVectorIndex(str(index_dir), DIMENSION, **kwargs)
+    index.add([f"doc-{row}" for row in range(len(vectors))], vectors, _records(range(len(vectors))))
+    index.save()
+    return LocalVectorIndex.load(str(index_dir))
+
+
+@pytest.fixture(scope="module")
+def vectors():
+    return np.random.default_rng(0).standard_normal((1200, DIMENSION)).astype(np.float32)
+
+
+@pytest.fixture(scope="module")
+def queries():
+    return np.random.default_rng(1).standard_normal((10, DIMENSION)).astype(np.float32)
+
+
+def test_save_and_load_round_trip(tmp_path, vectors):
+    index = _build(tmp_path, vectors[:100])
+
+    assert len(index) == 100
+    assert index.ids() == [f"doc-{row}" for row in range(100)]
+    assert index.get_record(3) == {"id": "doc-3", **_records([3])[0]}
+    row, score = index.search(vectors[42], 1)[0]
+    assert row == 42 and score == pytest.approx(1.0)
+
+    # Staged writes replace, delete and append rows on the next save.
+    index.add(["doc-5", "doc-100"], vectors[[200, 201]], _records([5, 100]))
+    index.delete(["doc-7"])
+    index.save()
+    reloaded = LocalVectorIndex.load(str(tmp_path))
+    assert len(reloaded) == 100
+    assert "doc-7" not in reloaded.ids() and reloaded.ids()[-2:] == ["doc-5", "doc-100"]
+    row, score = reloaded.search(vectors[200], 1)[0]
+    assert reloaded.ids()[row] == "doc-5" and score == pytest.approx(1.0)
+
+
+def test_ivf_probing_every_cell_matches_exact_search(tmp_path, vectors, queries):
+    exact = _build(tmp_path / "exact", vectors)
+    ivf = _build(tmp_path / "ivf", vectors, index_type="ivf", nlist=16, nprobe=16)
+    assert ivf.centroids is not None and len(ivf.centroids) == 16
+
+    for query in queries:
+        assert ivf.search(query, 10) == pytest.approx(exact.search(query, 10))
+
+    # Fewer probes score a subset of the rows: exact scores, possibly missing neighbours.
+    narrow = LocalVectorIndex.load(str(tmp_path / "ivf"), nprobe=2)
+    exact_scores = {row: score for row, score in exact.search(queries[0], len(vectors))}
+    results = narrow.search(queries[0], 10)
+    assert len(results) == 10
+    assert all(score == pytest.approx(exact_scores[row]) for row, score in results)
+
+
+@pytest.mark.parametrize("index_type", ["exact", "ivf"])
+def test_filter_mask_limits_results(tmp_path, vectors, queries, index_type):
+    index = _build(tmp_path, vectors, index_type=index_type, nlist=16, nprobe=4)
+    metadata_filter = {"product_id": {"$in": ["P1", "P2"]}, "product_rating": {"$gte": 4}}
+
+    mask = index.mask(metadata_filter)
+    expected = np.array([row % 7 in (1, 2) and row % 5 + 1 >= 4 for row in range(len(vectors))])
+    np.testing.assert_array_equal(mask, expected)
+
+    for query in queries:
+        results = index.search(query, 5, mask=mask)
+        assert len(results) == 5 and all(mask[row] for row, _ in results)
+    # A filter matching nothing returns nothing, rather than unfiltered rows.
+    assert index.search(queries[0], 5, mask=index.mask({"product_id": "P99"})) == []
+    with pytest.raises(ValueError):
+        index.mask({"product_name": "anything"})
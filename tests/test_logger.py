@@ -0,0 +1,12 @@
+import os
+
+from rag.logging import logger
+
+
+def test_default_log_file_is_per_process(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    path = logger._file_path(logger._read_config())
+    assert os.path.basename(path) == f"rag.{os.getpid()}.log"
+
+    monkeypatch.setattr(os, "getpid", lambda: -1)
+    assert logger._file_path(logger._read_config()) != path
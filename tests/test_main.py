@@ -0,0 +1,35 @@
+import asyncio
+import importlib
+import sys
+
+import httpx
+
+
+def _app(workspace):
+    # main preloads models at import, so import it inside the workspace.
+    sys.modules.pop("main", None)
+    return importlib.import_module("main")
+
+
+def _post(main, path: str, **kwargs) -> httpx.Response:
+    async def post():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test") as client:
+            return await client.post(path, **kwargs)
+    return asyncio.run(post())
+
+
+def test_stream_failure_is_sent_as_error_event(workspace, monkeypatch):
+    main = _app(workspace)
+
+    async def failing_stream(question, session_id):
+        yield "token", {"token": "Half an"}
+        raise RuntimeError("LLM connection reset")
+
+    monkeypatch.setattr(main.chat_history(), "astream_response", failing_stream)
+    response = _post(main, "/stream", data={"msg": "How is the bass?"})
+
+    assert response.status_code == 200
+    events = [frame.split("\n")[0] for frame in response.text.strip().split("\n\n")]
+    assert events == ["event: token", "event: error"]
+    assert main.STREAM_ERROR_MESSAGE in response.text
+    assert "connection reset" not in response.text
@@ -0,0 +1,74 @@
+import asyncio
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from rag.model_with_memory.memory import ChatHistory
+
+
+class SlowSummary:
+    """Summary chain stand-in that takes a while, so compactions overlap."""
+
+    def __init__(self):
+        self.calls = []
+
+    async def ainvoke(self, inputs):
+        self.calls.append(inputs)
+        await asyncio.sleep(0.05)
+        return f"{inputs['summary']} + [{inputs['conversation']}]"
+
+
+def test_concurrent_compactions_of_a_session_do_not_double_drop(workspace):
+    workspace(session={"summarize": True, "summary_trigger_messages": 2, "max_messages": 2})
+    chat_history = ChatHistory()
+    chat_history.summary_chain = SlowSummary()
+    store = chat_history.session_store
+    for i in range(3):
+        store.get_history("s").add_messages([HumanMessage(content=f"q{i}"), AIMessage(content=f"a{i}")])
+
+    async def compact_twice():
+        await asyncio.gather(chat_history._acompact_session("s"), chat_history._acompact_session("s"))
+
+    asyncio.run(compact_twice())
+
+    assert len(chat_history.summary_chain.calls) == 1
+    assert [m.content for _, m in store.get_messages("s")] == ["q2", "a2"]
+    assert "q0" in store.get_summary("s") and "q1" in store.get_summary("s")
+
+
+class EchoHistoryChain:
+    """QA chain stand-in whose answer names the last turn of the history it was given."""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def ainvoke(self, inputs):
+        self.calls += 1
+        await asyncio.sleep(0.05)
+        history = inputs["chat_history"]
+        return f"about {history[-1].content}" if history else "fresh"
+
+
+def test_coalescing_never_shares_answers_across_histories(workspace):
+    workspace(coalescing={"enabled": True}, answer_cache={"enabled": False}, rewrite={"mode": "never"})
+    chat_history = ChatHistory()
+    chat_history.qa_chain = EchoHistoryChain()
+
+    async def no_documents(query, embedding=None):
+        return []
+
+    chat_history.retriever.acall_retriever = no_documents
+    store = chat_history.session_store
+    store.get_history("a").add_messages([HumanMessage(content="boAt Rockerz?"), AIMessage(content="rockerz")])
+    store.get_history("b").add_messages([HumanMessage(content="JBL Tune?"), AIMessage(content="tune")])
+
+    async def ask_everyone():
+        return await asyncio.gather(*(
+            chat_history.aget_response("How long does the battery last?", session_id)
+            for session_id in ("a", "b", "c", "d")
+        ))
+
+    answers = asyncio.run(ask_everyone())
+
+    assert answers == ["about rockerz", "about tune", "fresh", "fresh"]
+    # Only the two turns without history share a generation.
+    assert chat_history.qa_chain.calls == 3
@@ -0,0 +1,59 @@
+from rag.metrics.metrics import REGISTRY, Registry, span, stage_timings_var
+
+
+def test_registry_renders_prometheus_text():
+    registry = Registry()
+    requests = registry.counter("requests_total", "Requests served.", ["path", "status"])
+    in_flight = registry.gauge("in_flight", "Requests being served.")
+    latency = registry.histogram("latency_seconds", "Request latency.", ["path"], buckets=(0.1, 1.0))
+    registry.register_collector(lambda: iter([("cache_hits", "counter", "Cache hits.", {"tier": "memory"}, 3)]))
+
+    requests.inc(path="/chat", status="200")
+    requests.inc(2, path="/chat", status="200")
+    requests.inc(path="/get", status="500")
+    in_flight.inc()
+    in_flight.inc()
+    in_flight.dec()
+    latency.observe(0.05, path="/chat")
+    latency.observe(0.1, path="/chat")
+    latency.observe(2.5, path="/chat")
+
+    assert registry.render() == "\n".join([
+        "# HELP requests_total Requests served.",
+        "# TYPE requests_total counter",
+        'requests_total{path="/chat",status="200"} 3',
+        'requests_total{path="/get",status="500"} 1',
+        "# HELP in_flight Requests being served.",
+        "# TYPE in_flight gauge",
+        "in_flight 1",
+        "# HELP latency_seconds Request latency.",
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{path="/chat",le="0.1"} 2',
+        'latency_seconds_bucket{path="/chat",le="1"} 2',
+        'latency_seconds_bucket{path="/chat",le="+Inf"} 3',
+        'latency_seconds_sum{path="/chat"} 2.65',
+        'latency_seconds_count{path="/chat"} 3',
+        "# HELP cache_hits Cache hits.",
+        "# TYPE cache_hits counter",
+        'cache_hits{tier="memory"} 3',
+    ]) + "\n"
+
+
+def test_registering_a_name_twice_returns_the_same_metric():
+    registry = Registry()
+    assert registry.counter("calls_total", "Calls.") is registry.counter("calls_total", "Calls.")
+
+
+def test_span_feeds_the_stage_histogram_and_request_timings():
+    timings = {}
+    token = stage_timings_var.set(timings)
+    try:
+        with span("test_stage"):
+            pass
+        with span("test_stage"):
+            pass
+    finally:
+        stage_timings_var.reset(token)
+
+    assert list(timings) == ["test_stage"]
+    assert 'rag_stage_seconds_count{stage="test_stage"} 2' in REGISTRY.render().splitlines()
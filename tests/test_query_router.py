@@ -0,0 +1,44 @@
+from rag.data_ingestion.product_catalog import ProductCatalog
+from rag.retriever.query_router import QueryRouter
+from rag.vector_store.shards import ShardClassifier
+
+CATEGORIES = ShardClassifier({"neckband": ["neckband", "rockerz"], "earbuds": ["earbud", "airdopes"]})
+
+
+def _product(title, mean, reviews=10):
+    return {"title": title, "category": None, "review_count": reviews,
+            "rating_sum": mean * reviews, "histogram": [0, 0, 0, 0, reviews]}
+
+
+CATALOG = ProductCatalog({
+    "N1": _product("boAt Rockerz 255 Neckband", 4.9),
+    "E1": _product("boAt Airdopes 141 Earbuds", 4.5),
+    "E2": _product("Noise Buds VS104 Earbuds", 4.1),
+    "W1": _product("JBL C100SI Wired Earphones", 4.7),
+})
+
+
+def _ranked(router, question):
+    return [doc.metadata["product_id"] for doc in router.route(question).aggregate_documents]
+
+
+def test_aggregate_question_ranks_only_the_named_category():
+    router = QueryRouter(CATALOG, categories=CATEGORIES)
+    assert _ranked(router, "Which are the highest rated earbuds?") == ["E1", "E2"]
+    assert _ranked(router, "What is the highest rated product?") == ["N1", "W1", "E1", "E2"]
+
+
+def test_category_narrows_matched_products():
+    router = QueryRouter(CATALOG, categories=CATEGORIES)
+    assert _ranked(router, "highest rated boat earbuds") == ["E1"]
+
+
+def test_category_with_no_products_falls_back_to_search():
+    catalog = ProductCatalog({product_id: CATALOG.products[product_id] for product_id in ("E1", "W1")})
+    plan = QueryRouter(catalog, categories=CATEGORIES).route("best rated neckband")
+    assert plan.aggregate_documents is None
+
+
+def test_shard_classifier_is_the_default_for_categories():
+    router = QueryRouter(CATALOG, classifier=CATEGORIES)
+    assert _ranked(router, "top rated neckbands") == ["N1"]
@@ -0,0 +1,57 @@
+from langchain_core.documents import Document
+
+from rag.retriever.reranker import CrossEncoderReranker, overlap_scorer
+
+
+class CountingScorer:
+    def __init__(self):
+        self.pairs = []
+
+    def __call__(self, pairs):
+        self.pairs.extend(pairs)
+        return overlap_scorer(pairs)
+
+
+DOCS = [
+    Document(page_content="fast delivery", id="1"),
+    Document(page_content="battery life is great", id="2"),
+    Document(page_content="great battery, great sound", id="3"),
+]
+
+
+def test_orders_by_score_and_keeps_top_k():
+    reranker = CrossEncoderReranker(overlap_scorer, top_k=2, latency_budget_ms=1000)
+    assert [doc.id for doc in reranker.rerank("great battery sound", DOCS)] == ["3", "2"]
+
+
+def test_cached_pairs_are_not_scored_again():
+    scorer = CountingScorer()
+    reranker = CrossEncoderReranker(scorer, top_k=3, latency_budget_ms=1000)
+    first = reranker.rerank("battery", DOCS)
+    second = reranker.rerank("  Battery ", DOCS[:2] + [Document(page_content="new review", id="4")])
+
+    assert len(scorer.pairs) == 4
+    assert (reranker.hits, reranker.misses) == (2, 4)
+    assert first[0].id in {"2", "3"} and second[0].id == "2"
+
+
+def test_cache_is_bounded():
+    reranker = CrossEncoderReranker(overlap_scorer, latency_budget_ms=1000, cache_size=2)
+    reranker.rerank("battery", DOCS)
+    assert len(reranker._cache) == 2
+
+
+def test_over_budget_returns_retrieval_order_and_recovers():
+    scorer = CountingScorer()
+    reranker = CrossEncoderReranker(scorer, top_k=2, latency_budget_ms=100)
+    # 3 pairs at 50ms each are expected to take 150ms.
+    reranker.seconds_per_pair = 0.05
+
+    assert [doc.id for doc in reranker.rerank("great battery sound", DOCS)] == ["1", "2"]
+    assert reranker.skipped == 1 and scorer.pairs == []
+
+    # The estimate decays on every skip until scoring fits the budget again.
+    for _ in range(10):
+        reranker.rerank("great battery sound", DOCS)
+    assert scorer.pairs
+    assert [doc.id for doc in reranker.rerank("great battery sound", DOCS)] == ["3", "2"]
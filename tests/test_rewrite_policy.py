@@ -0,0 +1,38 @@
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+
+from rag.model_with_memory.rewrite_policy import RewritePolicy, normalize_question
+
+HISTORY = [HumanMessage(content="Is the boAt Rockerz 255 good?"), AIMessage(content="Yes, reviewers like its bass.")]
+
+
+@pytest.mark.parametrize("question, rewrite", [
+    ("How is the battery backup of the JBL Tune 510?", False),
+    ("Which earbuds have the best mic for calls?", False),
+    ("How is its battery?", True),
+    ("What about the mic quality on calls?", True),
+    ("And the realme Buds Wireless 2?", True),
+    ("Battery life?", True),
+    ("Do those come with a warranty card?", True),
+])
+def test_auto_mode_rewrites_only_follow_ups(question, rewrite):
+    assert RewritePolicy().needs_rewrite(question, HISTORY) is rewrite
+
+
+def test_first_turn_is_never_rewritten():
+    assert not RewritePolicy(mode="always").needs_rewrite("How is its battery?", [])
+
+
+def test_modes_force_the_decision():
+    assert RewritePolicy(mode="always").needs_rewrite("How is the battery backup of the JBL Tune 510?", HISTORY)
+    assert not RewritePolicy(mode="never").needs_rewrite("How is its battery?", HISTORY)
+    with pytest.raises(ValueError):
+        RewritePolicy(mode="sometimes")
+
+
+def test_min_standalone_words():
+    assert not RewritePolicy(min_standalone_words=2).needs_rewrite("Battery life?", HISTORY)
+
+
+def test_normalize_question():
+    assert normalize_question("  What's the BEST   earbud?? ") == "what's the best earbud"
@@ -0,0 +1,84 @@
+import asyncio
+import threading
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from rag.model_with_memory.session_store import InMemorySessionStore, SessionStore, SQLiteSessionStore
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    limits = dict(max_sessions=10, ttl_seconds=3600, max_messages=4, max_tokens=1000)
+    if request.param == "sqlite":
+        return SQLiteSessionStore(str(tmp_path / "sessions.sqlite"), **limits)
+    return InMemorySessionStore(**limits)
+
+
+def _turns(store, session_id, count, start=0):
+    for i in range(start, start + count):
+        store.get_history(session_id).add_messages([HumanMessage(content=f"q{i}"), AIMessage(content=f"a{i}")])
+
+
+def test_window_keeps_recent_turns_and_summary(store):
+    _turns(store, "s", 3)
+    assert [m.content for m in store.window("s")] == ["q1", "a1", "q2", "a2"]
+
+    overflow, through_seq = store.overflow("s")
+    store.set_summary("s", "asked q0", through_seq)
+    window = store.window("s")
+    assert isinstance(window[0], SystemMessage) and "asked q0" in window[0].content
+    assert [m.content for m in window[1:]] == ["q1", "a1", "q2", "a2"]
+    assert store.overflow("s") == ([], None)
+
+
+def test_summary_drops_only_the_messages_it_covers(store):
+    _turns(store, "s", 3)
+    overflow, through_seq = store.overflow("s")
+    assert [m.content for m in overflow] == ["q0", "a0"]
+
+    # A turn lands while the summary is being written.
+    _turns(store, "s", 1, start=3)
+    store.set_summary("s", "asked q0", through_seq)
+    # Applying the same compaction twice drops nothing more.
+    store.set_summary("s", "asked q0", through_seq)
+
+    assert [m.content for _, m in store.get_messages("s")] == ["q1", "a1", "q2", "a2", "q3", "a3"]
+
+
+def test_sessions_are_isolated(store):
+    _turns(store, "a", 1)
+    assert store.window("b") == []
+
+
+def test_backend_missing_a_method_fails_at_construction():
+    class Incomplete(SessionStore):
+        def get_history(self, session_id):
+            ...
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_sqlite_reads_do_not_write(tmp_path):
+    store = SQLiteSessionStore(str(tmp_path / "sessions.sqlite"))
+    _turns(store, "s", 2)
+    changes = store._db.total_changes
+    store.window("s")
+    store.overflow("s")
+    store.get_summary("s")
+    assert store._db.total_changes == changes
+
+
+def test_sqlite_async_methods_run_off_the_event_loop(tmp_path, monkeypatch):
+    store = SQLiteSessionStore(str(tmp_path / "sessions.sqlite"))
+    threads = []
+    window = store.window
+    monkeypatch.setattr(store, "window", lambda session_id: threads.append(threading.get_ident()) or window(session_id))
+
+    async def turn():
+        await store.aappend("s", [HumanMessage(content="q"), AIMessage(content="a")])
+        return await store.awindow("s")
+
+    assert [m.content for m in asyncio.run(turn())] == ["q", "a"]
+    assert threads and threads[0] != threading.get_ident()
@@ -0,0 +1,113 @@
+import asyncio
+
+import pytest
+
+from benchmarks.fakes import FakeEmbeddings
+from rag.data_ingestion.data_ingestion import DataIngestion
+from rag.model_loaders.model_registry import ModelRegistry
+from rag.retriever.data_retriever import DataRetriever
+from rag.vector_store.local_index import LocalVectorIndex
+from rag.vector_store.local_store import LocalVectorStore
+from rag.vector_store.shards import SHARD_FIELD, ShardClassifier, ShardedVectorStore
+
+CLASSIFIER = ShardClassifier({"wired": ["wired"], "earbuds": ["earbud", "buds"]}, default="other")
+REVIEWS = [
+    ("wired", "wired earphones with deep bass and a long cable"),
+    ("wired", "the cable broke after a month, bass was fine"),
+    ("earbuds", "earbuds with great battery backup and fast charging"),
+    ("earbuds", "buds fit well, battery lasts two days"),
+    ("earbuds", "bass is weak on these earbuds but calls are clear"),
+    ("other", "neckband battery backup is average"),
+    ("unknown", "speaker is loud with punchy bass"),
+]
+
+
+@pytest.fixture
+def stores(tmp_path, no_latency):
+    embedding = FakeEmbeddings(dimension=64)
+
+    def local(name):
+        return LocalVectorStore(embedding, LocalVectorIndex(str(tmp_path / name), 64))
+
+    sharded = ShardedVectorStore(embedding, {name: local(name) for name in CLASSIFIER.shard_names})
+    flat = local("flat")
+    texts = [text for _, text in REVIEWS]
+    metadatas = [{SHARD_FIELD: category} for category, _ in REVIEWS]
+    ids = [f"doc-{row}" for row in range(len(REVIEWS))]
+    for store in (sharded, flat):
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        store.persist()
+    return sharded, flat
+
+
+def _ranked(pairs):
+    return [(doc.id, round(score, 6)) for doc, score in pairs]
+
+
+def test_classifier_routes_titles_and_questions():
+    assert CLASSIFIER.shard_for_title("boAt Airdopes Wireless Earbuds") == "earbuds"
+    assert CLASSIFIER.shard_for_title("Bluetooth Neckband") == "other"
+    assert CLASSIFIER.shards_for_question("best earbuds or wired headsets?") == ["wired", "earbuds"]
+    assert CLASSIFIER.shards_for_question("how is the battery?") == []
+
+
+def test_documents_are_written_to_their_category_shard(stores):
+    sharded, _ = stores
+    assert {name: sorted(store.index.ids()) for name, store in sharded.shards.items()} == {
+        "wired": ["doc-0", "doc-1"],
+        "earbuds": ["doc-2", "doc-3", "doc-4"],
+        # Unknown categories fall back to the default shard.
+        "other": ["doc-5", "doc-6"],
+    }
+
+
+@pytest.mark.parametrize("k", [1, 3, 7])
+def test_fan_out_merges_shards_by_score(stores, k):
+    sharded, flat = stores
+    query = sharded.embedding.embed_query("battery backup and bass")
+
+    assert _ranked(sharded.similarity_search_by_vector_with_score(query, k=k)) == \
+        _ranked(flat.similarity_search_by_vector_with_score(query, k=k))
+
+
+def test_explicit_shards_limit_the_search(stores):
+    sharded, _ = stores
+    query = sharded.embedding.embed_query("bass")
+
+    results = sharded.similarity_search_by_vector_with_score(query, k=7, shards=["wired", "earbuds"])
+    assert {doc.metadata[SHARD_FIELD] for doc, _ in results} == {"wired", "earbuds"}
+    assert len(results) == 5
+    assert [score for _, score in results] == sorted((score for _, score in results), reverse=True)
+
+    only_wired = sharded.similarity_search("bass", k=7, shards=["wired", "missing"])
+    assert sorted(doc.id for doc in only_wired) == ["doc-0", "doc-1"]
+
+    async_results = asyncio.run(sharded.asimilarity_search("bass", k=7, shards=["wired", "earbuds"]))
+    assert [doc.id for doc in async_results] == [doc.id for doc, _ in results]
+
+
+def test_retriever_searches_only_the_shard_a_question_names(workspace, monkeypatch):
+    workspace(
+        sharding={"enabled": True},
+        retriever={"hybrid": False, "product_routing": False},
+    )
+    ingestion = DataIngestion()
+    ingestion.vector_store(ingestion.transform_data())
+    ModelRegistry._instances.clear()
+    retriever = DataRetriever()
+    retriever.load_retriever()
+    searched = []
+    for name, store in retriever.vstore.shards.items():
+        search = store.similarity_search_by_vector_with_score
+        monkeypatch.setattr(
+            store, "similarity_search_by_vector_with_score",
+            lambda *args, _name=name, _search=search, **kwargs: searched.append(_name) or _search(*args, **kwargs),
+        )
+
+    documents = retriever.call_retriever("which earbuds have the best battery backup?")
+    assert searched == ["earbuds"]
+    assert documents and all(doc.metadata[SHARD_FIELD] == "earbuds" for doc in documents)
+
+    searched.clear()
+    retriever.call_retriever("how is the battery backup?")
+    assert sorted(searched) == sorted(retriever.vstore.shards)
@@ -0,0 +1,113 @@
+import asyncio
+
+from rag.cache.single_flight import SingleFlight
+
+
+class Work:
+    """Counts calls and finishes when released."""
+
+    def __init__(self, result="answer"):
+        self.calls = 0
+        self.cancelled = False
+        self.result = result
+        self.release = asyncio.Event()
+
+    async def __call__(self):
+        self.calls += 1
+        try:
+            await self.release.wait()
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        if isinstance(self.result, Exception):
+            raise self.result
+        return self.result
+
+
+def test_concurrent_calls_with_one_key_share_one_call():
+    async def run():
+        flights, work = SingleFlight(), Work()
+        callers = [asyncio.create_task(flights.do("q", work)) for _ in range(3)]
+        other = asyncio.create_task(flights.do("other", work))
+        await asyncio.sleep(0)
+        work.release.set()
+        results = await asyncio.gather(*callers, other)
+        # Once the call is over, the next caller starts a new one.
+        await flights.do("q", work)
+        return flights, work, results
+
+    flights, work, results = asyncio.run(run())
+    assert work.calls == 3
+    assert [shared for _, shared in results] == [False, True, True, False]
+    assert {answer for answer, _ in results} == {"answer"}
+    assert (flights.leaders, flights.followers) == (3, 2)
+
+
+def test_errors_reach_every_caller():
+    async def run():
+        flights, work = SingleFlight(), Work(result=ValueError("boom"))
+        callers = [asyncio.create_task(flights.do("q", work)) for _ in range(2)]
+        await asyncio.sleep(0)
+        work.release.set()
+        return await asyncio.gather(*callers, return_exceptions=True)
+
+    assert [type(result) for result in asyncio.run(run())] == [ValueError, ValueError]
+
+
+def test_work_outlives_the_caller_that_started_it():
+    async def run():
+        flights, work = SingleFlight(), Work()
+        leader = asyncio.create_task(flights.do("q", work))
+        follower = asyncio.create_task(flights.do("q", work))
+        await asyncio.sleep(0)
+        leader.cancel()
+        await asyncio.sleep(0)
+        work.release.set()
+        return work, await follower
+
+    work, (answer, shared) = asyncio.run(run())
+    assert (answer, shared) == ("answer", True)
+    assert not work.cancelled
+
+
+def test_work_is_cancelled_once_every_caller_is_gone():
+    async def run():
+        flights, work = SingleFlight(), Work()
+        callers = [asyncio.create_task(flights.do("q", work)) for _ in range(2)]
+        await asyncio.sleep(0)
+        for caller in callers:
+            caller.cancel()
+        await asyncio.gather(*callers, return_exceptions=True)
+        await asyncio.sleep(0)
+        return flights, work
+
+    flights, work = asyncio.run(run())
+    assert work.cancelled
+    assert flights._flights == {}
+
+
+def test_late_stream_joiner_sees_every_item():
+    async def run():
+        flights = SingleFlight()
+        calls, more = [], asyncio.Event()
+
+        async def tokens():
+            calls.append(1)
+            yield "Good"
+            await more.wait()
+            yield " bass"
+
+        async def consume():
+            return [item async for item in flights.stream("q", tokens)]
+
+        first = asyncio.create_task(consume())
+        await asyncio.sleep(0.01)
+        second = asyncio.create_task(consume())
+        await asyncio.sleep(0.01)
+        more.set()
+        return calls, await first, await second
+
+    calls, first, second = asyncio.run(run())
+    assert len(calls) == 1
+    assert first == [("Good", False), (" bass", False)]
+    assert second == [("Good", True), (" bass", True)]
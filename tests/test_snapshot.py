@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+
+from rag.vector_store.local_index import LocalVectorIndex
+from rag.vector_store.snapshot import SnapshotWriter, VectorSnapshot
+
+DIMENSION = 32
+K = 10
+
+
+@pytest.fixture(scope="module")
+def corpus():
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((1000, DIMENSION)).astype(np.float32)
+    documents = [
+        Document(
+            id=f"doc-{row}",
+            page_content=f"review {row}",
+            metadata={"product_id": f"P{row % 20}", "product_rating": float(row % 5 + 1)},
+        )
+        for row in range(len(vectors))
+    ]
+    queries = rng.standard_normal((20, DIMENSION)).astype(np.float32)
+    return documents, vectors, queries
+
+
+@pytest.fixture(scope="module")
+def exact_index(corpus, tmp_path_factory):
+    documents, vectors, _ = corpus
+    index = LocalVectorIndex(str(tmp_path_factory.mktemp("index")), DIMENSION)
+    index.add(
+        [doc.id for doc in documents], vectors,
+        [{"page_content": doc.page_content, "metadata": doc.metadata} for doc in documents],
+    )
+    index.save()
+    return LocalVectorIndex.load(index.index_dir)
+
+
+def _snapshot(corpus, path, dtype, rescore):
+    documents, vectors, _ = corpus
+    writer = SnapshotWriter(str(path), DIMENSION, dtype=dtype, rescore=rescore)
+    # Two batches, to exercise the spooled writes.
+    writer.add(documents[:400], vectors[:400])
+    writer.add(documents[400:], vectors[400:])
+    writer.finish()
+    return VectorSnapshot.load(str(path))
+
+
+def _ranked(index, query, mask=None):
+    results = index.search(query, K, mask=mask)
+    ids = index.ids()
+    return [ids[row] for row, _ in results], np.array([score for _, score in results])
+
+
+@pytest.mark.parametrize("dtype", ["int8", "float16"])
+def test_rescored_search_matches_exact_index(corpus, exact_index, tmp_path, dtype):
+    snapshot = _snapshot(corpus, tmp_path / "snapshot.bin", dtype, rescore=True)
+
+    for query in corpus[2]:
+        expected_ids, expected_scores = _ranked(exact_index, query)
+        ids, scores = _ranked(snapshot, query)
+        assert ids == expected_ids
+        np.testing.assert_allclose(scores, expected_scores, atol=1e-5)
+
+
+@pytest.mark.parametrize("dtype, atol, min_recall", [("int8", 0.02, 0.8), ("float16", 1e-3, 0.95)])
+def test_quantized_search_approximates_exact_index(corpus, exact_index, tmp_path, dtype, atol, min_recall):
+    snapshot = _snapshot(corpus, tmp_path / "snapshot.bin", dtype, rescore=False)
+    assert snapshot.vectors is None
+
+    recalls = []
+    for query in corpus[2]:
+        expected_ids, expected_scores = _ranked(exact_index, query)
+        ids, scores = _ranked(snapshot, query)
+        recalls.append(len(set(ids) & set(expected_ids)) / K)
+        # The best quantized score is close to the true best, and the ranking is by quantized score.
+        assert abs(scores[0] - expected_scores[0]) <= atol
+        assert list(scores) == sorted(scores, reverse=True)
+    assert np.mean(recalls) >= min_recall
+
+
+@pytest.mark.parametrize("dtype", ["int8", "float16"])
+def test_filtered_search_and_records_round_trip(corpus, exact_index, tmp_path, dtype):
+    documents = corpus[0]
+    snapshot = _snapshot(corpus, tmp_path / "snapshot.bin", dtype, rescore=True)
+    metadata_filter = {"product_id": "P3", "product_rating": {"$gte": 4}}
+
+    mask = snapshot.mask(metadata_filter)
+    assert mask.sum() == exact_index.mask(metadata_filter).sum() > 0
+    for query in corpus[2][:5]:
+        ids, _ = _ranked(snapshot, query, mask)
+        assert ids == _ranked(exact_index, query, exact_index.mask(metadata_filter))[0]
+        assert all(documents[int(doc_id.split("-")[1])].metadata["product_id"] == "P3" for doc_id in ids)
+
+    assert snapshot.ids() == [doc.id for doc in documents]
+    record = snapshot.get_record(7)
+    assert record == {"id": "doc-7", "page_content": "review 7",
+                      "metadata": {"product_id": "P7", "product_rating": 3}}
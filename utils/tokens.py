@@ -0,0 +1,9 @@
+def count_tokens(text: str) -> int:
+    """
+    Cheap token estimate used for prompt budgets: roughly four characters per
+    token for English text, which is close enough for Gemma/Llama tokenizers
+    without loading one on the request path.
+    """
+    if not text:
+        return 0
+    return max(1, (len(text) + 3) // 4)